@@ -0,0 +1,76 @@
+import numpy as np
+
+
+ALIGN_DIRECTIONS = ('nearest', 'backward', 'forward')
+
+
+def _first_of_run(values, index):
+    # Среди одинаковых отметок времени берётся первая, как idxmin по отсортированному ряду
+    return np.searchsorted(values, values[index], side='left')
+
+
+def align_nearest(left_time, right_time, tolerance=1.0, direction='nearest', one_to_one=False):
+    """Сопоставление отсчётов двух отсортированных рядов времени слиянием.
+
+    Для каждого отсчёта ``left_time`` ищется отсчёт ``right_time``:
+    ближайший (``nearest``, при равенстве расстояний — более ранний), не
+    позже (``backward``) или не раньше (``forward``). Пара принимается, если
+    расстояние строго меньше ``tolerance``. Поиск — ``np.searchsorted``,
+    O((n + m) log m) вместо перебора всего второго ряда для каждого отсчёта.
+    С ``one_to_one`` отсчёт ``right_time`` достаётся только ближайшему из
+    претендентов (при равенстве — более раннему), остальные остаются без пары.
+
+    Возвращает (индексы left, индексы right, статистика): сколько отсчётов
+    left отброшено без пары, сколько отсчётов right не использовано и
+    сколько раз отсчёты right повторно использованы в нескольких парах.
+    """
+    if direction not in ALIGN_DIRECTIONS:
+        raise ValueError(f"Неизвестное направление сопоставления: {direction}")
+
+    left_time = np.asarray(left_time, dtype=float)
+    right_time = np.asarray(right_time, dtype=float)
+    n_left, n_right = len(left_time), len(right_time)
+
+    if n_left == 0 or n_right == 0:
+        left_index = np.array([], dtype=np.intp)
+        right_index = np.array([], dtype=np.intp)
+    else:
+        after = np.searchsorted(right_time, left_time, side='left')
+        before = np.searchsorted(right_time, left_time, side='right') - 1
+        has_after = after < n_right
+        has_before = before >= 0
+        after = np.minimum(after, n_right - 1)
+        before = _first_of_run(right_time, np.maximum(before, 0))
+
+        if direction == 'backward':
+            candidate, valid = before, has_before
+        elif direction == 'forward':
+            candidate, valid = after, has_after
+        else:
+            distance_before = np.where(has_before, left_time - right_time[before], np.inf)
+            distance_after = np.where(has_after, right_time[after] - left_time, np.inf)
+            candidate = np.where(distance_after < distance_before, after, before)
+            valid = has_before | has_after
+
+        distance = np.abs(right_time[candidate] - left_time)
+        matched = valid & (distance < tolerance)
+        left_index = np.flatnonzero(matched)
+        right_index = candidate[matched]
+
+        # Ряды отсортированы, поэтому right_index не убывает: повторы идут подряд
+        if one_to_one and np.any(right_index[1:] == right_index[:-1]):
+            # Порядок: отсчёт right, расстояние, отсчёт left — первый в группе выигрывает
+            order = np.lexsort((left_index, distance[matched], right_index))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = right_index[order][1:] != right_index[order][:-1]
+            winners = np.sort(order[first])
+            left_index, right_index = left_index[winners], right_index[winners]
+
+    used = int(np.count_nonzero(right_index[1:] != right_index[:-1])) + (len(right_index) > 0)
+    stats = {
+        'paired': len(left_index),
+        'dropped_left': n_left - len(left_index),
+        'unused_right': n_right - used,
+        'duplicated_right': len(right_index) - used
+    }
+    return left_index, right_index, stats
@@ -0,0 +1,174 @@
+import os
+import glob
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+
+# Расширения, которые берутся из каталогов (явно указанные файлы принимаются любые)
+BATCH_EXTENSIONS = ('.log', '.txt')
+OUTPUT_PREFIX = 'analysis_results_'
+SUMMARY_FILE = 'batch_summary.csv'
+
+# Заголовки ключей статистики ``stats`` результатов; неизвестные ключи идут под своим именем
+SUMMARY_COLUMNS = [
+    ('time_range', 'Диапазон времени'),
+    ('duration', 'Длительность'),
+    ('mean_saturation', 'Ср. сатурация'),
+    ('min_saturation', 'Мин.'),
+    ('max_saturation', 'Макс.'),
+    ('std_saturation', 'Ст. откл.'),
+    ('data_points', 'Точек'),
+    ('channels', 'Каналов')
+]
+
+
+def collect_files(inputs, extensions=BATCH_EXTENSIONS):
+    """Список файлов из путей, масок и каталогов (рекурсивно), без повторов, в порядке указания."""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            found = sorted(str(path) for path in Path(item).rglob('*')
+                           if path.is_file() and path.suffix.lower() in extensions
+                           and not path.name.startswith(OUTPUT_PREFIX))
+        elif glob.has_magic(item):
+            found = sorted(path for path in glob.glob(item, recursive=True) if os.path.isfile(path))
+        else:
+            found = [item] if os.path.isfile(item) else []
+        files.extend(found)
+
+    seen = set()
+    unique = []
+    for filename in files:
+        key = os.path.realpath(filename)
+        if key not in seen:
+            seen.add(key)
+            unique.append(filename)
+    return unique
+
+
+def output_paths(files, output_dir='.'):
+    """Имена файлов результатов ``analysis_results_<имя>.csv``; одинаковые имена получают номер."""
+    counts = {}
+    paths = []
+    for filename in files:
+        stem = Path(filename).stem
+        counts[stem] = counts.get(stem, 0) + 1
+        suffix = '' if counts[stem] == 1 else f'_{counts[stem]}'
+        paths.append(os.path.join(output_dir, f'{OUTPUT_PREFIX}{stem}{suffix}.csv'))
+    return paths
+
+
+def analyze_one(filename, output_file, chunked=False):
+    """Анализ одного файла в процессе-исполнителе; ошибки возвращаются, а не выбрасываются."""
+    started = time.perf_counter()
+    try:
+        if chunked:
+            from .chunked import analyze_file_chunked
+            stats = analyze_file_chunked(filename, output_file)
+        else:
+            from .data_processor import DataProcessor
+            processor = DataProcessor()
+            data = processor.read_and_interpolate_data(filename)
+            results = processor.process_data(data)
+            processor.save_results(output_file)
+            stats = results.get('stats', {})
+        error = None
+    except Exception as e:
+        stats = {}
+        error = str(e)
+
+    return {
+        'file': filename,
+        'output': output_file if error is None else None,
+        'stats': stats,
+        'error': error,
+        'elapsed': time.perf_counter() - started
+    }
+
+
+def run_batch(inputs, output_dir='.', workers=None, chunked=False, progress=None):
+    """Пакетный анализ на пуле процессов; ``progress(done, total, record)`` — после каждого файла.
+
+    Каждый исполнитель импортирует pandas/scipy один раз и обрабатывает
+    файлы по очереди, так что время масштабируется с числом ядер.
+    Записи возвращаются в порядке входных файлов.
+    """
+    files = collect_files(inputs)
+    if not files:
+        return []
+
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = output_paths(files, output_dir)
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    records = [None] * len(files)
+
+    if workers == 1:
+        for index, (filename, output_file) in enumerate(zip(files, outputs)):
+            records[index] = analyze_one(filename, output_file, chunked)
+            if progress is not None:
+                progress(index + 1, len(files), records[index])
+        return records
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(analyze_one, filename, output_file, chunked): index
+                   for index, (filename, output_file) in enumerate(zip(files, outputs))}
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            try:
+                records[index] = future.result()
+            except Exception as e:
+                # Исполнитель упал целиком (например, нехватка памяти)
+                records[index] = {'file': files[index], 'output': None, 'stats': {},
+                                  'error': f"Сбой процесса-исполнителя: {e}", 'elapsed': 0.0}
+            if progress is not None:
+                progress(done, len(files), records[index])
+
+    return records
+
+
+def _summary_title(key):
+    titles = dict(SUMMARY_COLUMNS)
+    if key in titles:
+        return titles[key]
+    if key.startswith('intensity_') and key.endswith('_range'):
+        return f"Интенсивность {key[len('intensity_'):-len('_range')]} нм"
+    return key
+
+
+def _summary_values(stats):
+    # Вложенные словари (средняя сатурация по парам) — отдельным столбцом на пару
+    values = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            for label, item in value.items():
+                values[f'Ср. сатурация {label}' if key == 'pair_mean_saturation' else f'{key} {label}'] = item
+        else:
+            values[_summary_title(key)] = value
+    return values
+
+
+def summary_frame(records):
+    """Сводка пакета: строка на файл со всеми ключами ``stats`` его результатов.
+
+    Столбцы идут в порядке первого появления ключа; значения, которых нет у
+    файла (другой монтаж, ошибка), остаются пустыми.
+    """
+    rows = []
+    titles = []
+    for record in records:
+        values = _summary_values(record['stats'])
+        titles.extend(title for title in values if title not in titles)
+        row = {'Файл': record['file'], **values}
+        row['Время, с'] = round(record['elapsed'], 2)
+        row['Статус'] = 'ошибка: ' + record['error'] if record['error'] else 'ok'
+        rows.append(row)
+    columns = ['Файл'] + titles + ['Время, с', 'Статус']
+    return pd.DataFrame([[row.get(column, '') for column in columns] for row in rows], columns=columns)
+
+
+def write_summary(records, filename):
+    summary_frame(records).to_csv(filename, index=False)
+    return filename
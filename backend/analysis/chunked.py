@@ -0,0 +1,397 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .data_processor import DataProcessor
+from .hb_calculations import (calculate_od, extinction_inverse, filter_data,
+                              saturation_from_concentrations, solve_pairs)
+from .log_parser import DEFAULT_BLOCK_SIZE, iter_raw_blocks, parse_log_bytes, read_raw_block
+from .montage import Montage
+from .resampling import interpolate_segments, uniform_grid
+from .results import result_columns
+
+
+logger = logging.getLogger(__name__)
+
+
+def _group_by_row(time, rows, values, n_rows):
+    # Канал за каналом с сохранением порядка отсчётов внутри канала
+    order = np.argsort(rows, kind='stable')
+    counts = np.bincount(rows, minlength=n_rows)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return time[order], rows[order], values[order], starts, counts
+
+
+class _ChannelScan:
+    """Сводка сразу по всем каналам: число отсчётов, первый, последний, минимум, максимум, монотонность."""
+
+    def __init__(self, n_channels):
+        self.count = np.zeros(n_channels, dtype=np.int64)
+        self.first = np.full(n_channels, np.nan)
+        self.last = np.full(n_channels, np.nan)
+        self.min = np.full(n_channels, np.inf)
+        self.max = np.full(n_channels, -np.inf)
+        self.monotonic = np.ones(n_channels, dtype=bool)
+
+    def update(self, time, rows):
+        if len(time) == 0:
+            return
+        n_channels = len(self.count)
+        time, rows, _, starts, counts = _group_by_row(time, rows, time, n_channels)
+        present = counts > 0
+        head = time[np.minimum(starts, len(time) - 1)]
+        tail = time[np.maximum(starts + counts - 1, 0)]
+
+        # Убывание времени внутри блока или относительно конца предыдущего блока
+        decreasing = (np.diff(time) < 0) & (rows[1:] == rows[:-1])
+        self.monotonic[rows[1:][decreasing]] = False
+        self.monotonic[present & (head < self.last)] = False
+
+        started = present & np.isnan(self.first)
+        self.first[started] = head[started]
+        self.last[present] = tail[present]
+        self.count += counts
+        np.minimum.at(self.min, rows, time)
+        np.maximum.at(self.max, rows, time)
+
+    @property
+    def mean_interval(self):
+        # Совпадает с diff().mean() по порядку строк в файле
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.count > 1, (self.last - self.first) / (self.count - 1), np.nan)
+
+
+class _GridInterpolator:
+    """Линейная интерполяция всех каналов на равномерную сетку с переносом хвостов между блоками."""
+
+    def __init__(self, montage, start, step, n_points):
+        self.montage = montage
+        self.start = start
+        self.step = step
+        self.n_points = n_points
+        self.next_index = 0
+        self.tail = (np.array([]), np.array([], dtype=np.intp), np.array([]))
+
+    def feed(self, time, pin, intensity, final=False):
+        rows = self.montage.rows(pin)
+        known = rows >= 0
+        tail_time, tail_rows, tail_values = self.tail
+        time, rows, values, starts, counts = _group_by_row(
+            np.concatenate([tail_time, time[known]]),
+            np.concatenate([tail_rows, rows[known]]),
+            np.concatenate([tail_values, intensity[known]]),
+            self.montage.n_channels)
+
+        if (counts == 0).any():
+            self.tail = (time, rows, values)
+            return None
+
+        if final:
+            end_index = self.n_points
+        else:
+            limit = np.min(time[starts + counts - 1])
+            end_index = min(self.n_points, int(np.floor((limit - self.start) / self.step)) + 1)
+            while end_index > self.next_index and self.start + (end_index - 1) * self.step > limit:
+                end_index -= 1
+            # От каждого канала остаётся последний отсчёт не позже limit и всё после него
+            not_after = np.bincount(rows[time <= limit], minlength=self.montage.n_channels)
+            keep_from = starts + np.maximum(not_after - 1, 0)
+            keep = np.arange(len(time)) >= keep_from[rows]
+            self.tail = (time[keep], rows[keep], values[keep])
+
+        if end_index <= self.next_index:
+            return None
+
+        index = np.arange(self.next_index, end_index)
+        grid = self.start + index * self.step
+        self.next_index = end_index
+
+        return index, grid, interpolate_segments(grid, time, values, starts, counts)
+
+
+class _OverlapFilter:
+    """Нуль-фазовая фильтрация по кускам с перекрытием на границах.
+
+    Строки куска: время, интенсивности каналов, Hb, HbO2 и сатурация по
+    парам. Фильтруются строки пар; на выходе строки идут в порядке
+    ``result_columns`` (для каждой пары Hb, HbO2, сатурация, общий Hb).
+    """
+
+    def __init__(self, chunk_size, overlap, n_channels, fs=None, config=None):
+        self.chunk_size = chunk_size
+        self.fs = fs
+        self.config = config
+        self.overlap = overlap
+        self.n_channels = n_channels
+        self.pending = None
+        self.pending_start = 0
+        self.emitted = 0
+
+    def push(self, block):
+        if self.pending is None:
+            self.pending = block
+        else:
+            self.pending = np.hstack([self.pending, block])
+
+        outputs = []
+        while self._pending_end() - self.emitted >= self.chunk_size + self.overlap:
+            core_end = self.emitted + self.chunk_size
+            outputs.append(self._emit(core_end, core_end + self.overlap))
+        return outputs
+
+    def finish(self):
+        if self.pending is None or self._pending_end() <= self.emitted:
+            return None
+        end = self._pending_end()
+        return self._emit(end, end)
+
+    def _pending_end(self):
+        return self.pending_start + (0 if self.pending is None else self.pending.shape[1])
+
+    def _emit(self, core_end, segment_end):
+        segment_start = max(self.pending_start, self.emitted - self.overlap)
+        segment = self.pending[:, segment_start - self.pending_start:segment_end - self.pending_start]
+
+        first = 1 + self.n_channels
+        Hb, HbO2, saturation = np.split(filter_data(segment[first:], fs=self.fs, config=self.config), 3)
+        saturation = np.clip(saturation, 0, 100)
+
+        core = slice(self.emitted - segment_start, core_end - segment_start)
+        per_pair = np.stack([Hb[:, core], HbO2[:, core], saturation[:, core],
+                             HbO2[:, core] + Hb[:, core]], axis=1)
+        output = np.vstack([segment[:first, core], per_pair.reshape(-1, per_pair.shape[-1])])
+
+        self.emitted = core_end
+        drop = max(0, self.emitted - self.overlap - self.pending_start)
+        self.pending = self.pending[:, drop:]
+        self.pending_start += drop
+        return output
+
+
+class _StatsAccumulator:
+
+    def __init__(self, montage, saturation_start):
+        self.montage = montage
+        self.saturation_start = saturation_start
+        self.position = 0
+        self.time_first = None
+        self.time_last = None
+        self.intensity_min = np.full(montage.n_channels, np.inf)
+        self.intensity_max = np.full(montage.n_channels, -np.inf)
+        # Строки сатурации пар в выходном куске
+        self.saturation_rows = 1 + montage.n_channels + 4 * np.arange(montage.n_pairs) + 2
+        self.count = 0
+        self.mean = np.zeros(montage.n_pairs)
+        self.m2 = np.zeros(montage.n_pairs)
+        self.saturation_min = np.inf
+        self.saturation_max = -np.inf
+
+    def update(self, block):
+        n = block.shape[1]
+        if n == 0:
+            return
+        if self.time_first is None:
+            self.time_first = block[0, 0]
+        self.time_last = block[0, -1]
+        intensities = block[1:1 + self.montage.n_channels]
+        self.intensity_min = np.minimum(self.intensity_min, np.min(intensities, axis=1))
+        self.intensity_max = np.maximum(self.intensity_max, np.max(intensities, axis=1))
+
+        saturation = block[self.saturation_rows, max(0, self.saturation_start - self.position):]
+        self.position += n
+        if saturation.shape[1] == 0:
+            return
+
+        # Объединение моментов по кускам (формула Чана), для всех пар сразу
+        chunk_count = saturation.shape[1]
+        chunk_mean = np.mean(saturation, axis=1)
+        chunk_m2 = np.sum((saturation - chunk_mean[:, np.newaxis]) ** 2, axis=1)
+        total = self.count + chunk_count
+        delta = chunk_mean - self.mean
+        self.mean += delta * chunk_count / total
+        self.m2 += chunk_m2 + delta ** 2 * self.count * chunk_count / total
+        self.count = total
+        self.saturation_min = min(self.saturation_min, np.min(saturation[0]))
+        self.saturation_max = max(self.saturation_max, np.max(saturation[0]))
+
+    def as_stats(self):
+        if self.time_first is None:
+            return {}
+
+        montage = self.montage
+        stats = {
+            'time_range': f"{self.time_first:.2f} - {self.time_last:.2f} с",
+            'duration': f"{self.time_last - self.time_first:.2f} с"
+        }
+        # Как в DataProcessor: интенсивности и сатурация — по первой паре монтажа
+        for wavelength in montage.wavelengths:
+            row = montage.row(0, wavelength)
+            stats[f'intensity_{wavelength}_range'] = f"{self.intensity_min[row]:.3f} - {self.intensity_max[row]:.3f}"
+        stats.update({
+            'mean_saturation': f"{self.mean[0]:.2f}%",
+            'min_saturation': f"{self.saturation_min:.2f}%",
+            'max_saturation': f"{self.saturation_max:.2f}%",
+            'std_saturation': f"{np.sqrt(self.m2[0] / self.count):.2f}%",
+            'data_points': self.position,
+            'channels': montage.n_channels
+        })
+        if montage.n_pairs > 1:
+            stats['pair_mean_saturation'] = {
+                montage.pair_label(pair): f"{mean:.2f}%" for pair, mean in enumerate(self.mean.tolist())
+            }
+        return stats
+
+
+class ChunkedAnalysis:
+    """Анализ файла с ограниченным потреблением памяти.
+
+    Первый проход собирает сводку по каналам и индекс блоков, второй —
+    интерполирует, считает концентрации, фильтрует с перекрытием и
+    дописывает результаты в CSV по кускам. Результат совпадает с
+    ``DataProcessor.process_data`` в пределах погрешности фильтрации.
+    """
+
+    def __init__(self, filename, block_size=DEFAULT_BLOCK_SIZE, chunk_size=100000, overlap=1000,
+                 config=None, montage=None):
+        if config is None:
+            from config import ANALYSIS_CONFIG
+            config = ANALYSIS_CONFIG
+
+        self.filename = filename
+        self.block_size = block_size
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.config = config
+        self.montage = montage if montage is not None else Montage.from_config(config)
+
+        self.scans = None
+        self.blocks = None
+
+    def _scan(self):
+        self.scans = _ChannelScan(self.montage.n_channels)
+        self.blocks = []
+
+        for offset, raw in iter_raw_blocks(self.filename, self.block_size):
+            time, pin, _ = parse_log_bytes(raw)
+            rows = self.montage.rows(pin)
+            known = rows >= 0
+            block_time = time[known]
+            self.scans.update(block_time, rows[known])
+            if len(block_time) > 0:
+                self.blocks.append((offset, len(raw), np.min(block_time), np.max(block_time)))
+
+    def _can_stream(self):
+        return bool(np.all(self.scans.monotonic & (self.scans.count > 1)))
+
+    def _intensities_at(self, times):
+        block_min = np.array([b[2] for b in self.blocks])
+        block_max = np.array([b[3] for b in self.blocks])
+
+        first = max(np.searchsorted(block_max, np.min(times), side='left') - 1, 0)
+        last = min(np.searchsorted(block_min, np.max(times), side='right'), len(self.blocks) - 1)
+
+        offset = self.blocks[first][0]
+        length = self.blocks[last][0] + self.blocks[last][1] - offset
+        time, pin, intensity = parse_log_bytes(read_raw_block(self.filename, offset, length))
+
+        rows = self.montage.rows(pin)
+        known = rows >= 0
+        time, _, intensity, starts, counts = _group_by_row(
+            time[known], rows[known], intensity[known], self.montage.n_channels)
+        return interpolate_segments(times, time, intensity, starts, counts)
+
+    def _run_in_memory(self, output_file, reason):
+        logger.info(f"Анализ {self.filename} выполняется в памяти: {reason}")
+        processor = DataProcessor(self.montage)
+        data = processor.read_and_interpolate_data(self.filename)
+        results = processor.process_data(data)
+        processor.save_results(output_file)
+        return results['stats']
+
+    def run(self, output_file):
+        self._scan()
+
+        if not self._can_stream():
+            return self._run_in_memory(
+                output_file, "время отсчётов канала не возрастает или у канала меньше двух отсчётов")
+
+        min_time = np.max(self.scans.min)
+        max_time = np.min(self.scans.max)
+        if min_time >= max_time:
+            return self._run_in_memory(output_file, "записи каналов не перекрываются по времени")
+
+        # Полифазная передискретизация требует всего ряда канала сразу
+        method = self.config.get('resampling_method', 'linear')
+        if method != 'linear':
+            return self._run_in_memory(output_file, f"передискретизация '{method}' требует всего ряда")
+
+        rate = self.config.get('sampling_rate')
+        if not rate:
+            avg_interval = np.mean(self.scans.mean_interval)
+            if np.isnan(avg_interval) or avg_interval <= 0:
+                avg_interval = 0.3
+            rate = 1.0 / avg_interval
+
+        # Та же сетка, что и resampling.uniform_grid(min_time, max_time, rate)
+        grid_start = min_time
+        step = 1.0 / rate
+        n_points = len(uniform_grid(min_time, max_time, rate))
+
+        montage = self.montage
+        window_size = min(20, n_points // 10)
+        baseline_times = grid_start + np.arange(max(window_size, 1)) * step
+        baseline = np.mean(np.maximum(self._intensities_at(baseline_times), 0.001), axis=1, keepdims=True)
+
+        inverse = extinction_inverse(self.config, montage.wavelengths)
+
+        def concentrations(intensities):
+            OD = calculate_od(intensities, baseline, self.config)
+            return solve_pairs(OD, montage.pair_rows, inverse)
+
+        saturation_start = max(0, int(n_points * 0.1))
+        initial_saturation = None
+        if saturation_start > 0:
+            start_intensities = self._intensities_at(np.array([grid_start + saturation_start * step]))
+            initial_saturation = saturation_from_concentrations(*concentrations(start_intensities))
+
+        interpolator = _GridInterpolator(montage, grid_start, step, n_points)
+        overlap_filter = _OverlapFilter(self.chunk_size, self.overlap, montage.n_channels, fs=1.0 / step,
+                                        config=self.config)
+        stats = _StatsAccumulator(montage, saturation_start)
+        columns = result_columns(montage)
+
+        with open(output_file, 'w', newline='') as output:
+            header = [True]
+
+            def write(block):
+                stats.update(block)
+                pd.DataFrame(block.T, columns=columns, copy=False).to_csv(
+                    output, header=header[0], index=False)
+                header[0] = False
+
+            def process(interpolated):
+                if interpolated is None:
+                    return
+                index, grid, intensities = interpolated
+                Hb, HbO2 = concentrations(intensities)
+                saturation = saturation_from_concentrations(Hb, HbO2)
+                if initial_saturation is not None:
+                    initial = index < saturation_start
+                    saturation[:, initial] = initial_saturation
+                for block in overlap_filter.push(np.vstack([grid, intensities, Hb, HbO2, saturation])):
+                    write(block)
+
+            for _, raw in iter_raw_blocks(self.filename, self.block_size):
+                process(interpolator.feed(*parse_log_bytes(raw)))
+            process(interpolator.feed(np.array([]), np.array([], dtype=int), np.array([]), final=True))
+
+            block = overlap_filter.finish()
+            if block is not None:
+                write(block)
+
+        return stats.as_stats()
+
+
+def analyze_file_chunked(filename, output_file, **kwargs):
+    return ChunkedAnalysis(filename, **kwargs).run(output_file)
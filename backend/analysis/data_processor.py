@@ -1,215 +1,257 @@
+import logging
+
 import pandas as pd
 import numpy as np
-from scipy.interpolate import interp1d
-from .hb_calculations import calculate_hb_concentrations, calculate_saturation, filter_data
+from .alignment import align_nearest
+from .filters import estimate_sampling_rate
+from .hb_calculations import calculate_channel_concentrations, calculate_saturation, filter_data
+from .log_parser import read_log_dataframe
+from .montage import Montage
+from .resampling import resample_samples
+from .results import build_results, results_frame
+
+
+logger = logging.getLogger(__name__)
 
 
 class DataProcessor:
     
-    def __init__(self):
+    def __init__(self, montage=None):
+        self._montage = montage
         self.data = None
         self.results = None
+        self.alignment_stats = None
+    
+    @property
+    def montage(self):
+        if self._montage is None:
+            self._montage = Montage.from_config()
+        return self._montage
     
-    def read_and_interpolate_data(self, filename):
+    def read_and_interpolate_data(self, filename, progress=None):
         try:
-            with open(filename, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-            
-            clean_lines = []
-            for line in lines:
-                clean_line = line.strip()
-                if clean_line and not all(c == '\x00' for c in clean_line):
-                    if not clean_line.startswith('---') and not 'Time(s:ms)' in clean_line:
-                        clean_lines.append(clean_line)
-            
-            data = []
-            for line in clean_lines:
-                parts = line.split()
-                if len(parts) >= 3:
-                    try:
-                        time_str = parts[0]
-                        pin = int(parts[1])
-                        intensity = float(parts[2])
-                        data.append([time_str, pin, intensity])
-                    except (ValueError, IndexError):
-                        continue
-            
-            if len(data) == 0:
-                raise ValueError("Нет корректных данных после очистки")
-            
-            df = pd.DataFrame(data, columns=['TimeStr', 'Pin', 'Intensity'])
-            
-            from backend.serial.serial_reader import parse_time
-            df['Time(s)'] = df['TimeStr'].apply(parse_time)
-            
-            df['Pin'] = pd.to_numeric(df['Pin'], errors='coerce')
-            df['Intensity'] = pd.to_numeric(df['Intensity'], errors='coerce')
-            
-            df = df.dropna()
-            
-            if len(df) == 0:
-                raise ValueError("Нет данных после очистки")
-            
-            data_780 = df[df['Pin'] == 3][['Time(s)', 'Intensity']].copy()
-            data_850 = df[df['Pin'] == 4][['Time(s)', 'Intensity']].copy()
-            
-            if len(data_780) == 0 or len(data_850) == 0:
-                raise ValueError("Не найдены данные для одного или обоих каналов")
-            
-            min_time = max(data_780['Time(s)'].min(), data_850['Time(s)'].min())
-            max_time = min(data_780['Time(s)'].max(), data_850['Time(s)'].max())
-            
-            if min_time >= max_time:
-                return self._alternative_read_method(df)
-            
-            avg_interval_780 = data_780['Time(s)'].diff().mean()
-            avg_interval_850 = data_850['Time(s)'].diff().mean()
-            avg_interval = (avg_interval_780 + avg_interval_850) / 2
-            
-            if pd.isna(avg_interval) or avg_interval <= 0:
-                avg_interval = 0.3  
-            
-            time_grid = np.arange(min_time, max_time, avg_interval)
-            
-            if len(data_780) > 1 and len(data_850) > 1:
-                data_780 = data_780.sort_values('Time(s)')
-                data_850 = data_850.sort_values('Time(s)')
-                
-                f_780 = interp1d(data_780['Time(s)'].values, data_780['Intensity'].values, 
-                                 kind='linear', bounds_error=False, fill_value='extrapolate')
-                f_850 = interp1d(data_850['Time(s)'].values, data_850['Intensity'].values, 
-                                 kind='linear', bounds_error=False, fill_value='extrapolate')
-                
-                intensity_780_interp = f_780(time_grid)
-                intensity_850_interp = f_850(time_grid)
-            else:
-                raise ValueError("Недостаточно данных для интерполяции")
-            
-            combined_data = pd.DataFrame({
-                'Time(s)': time_grid,
-                'Intensity_780': intensity_780_interp,
-                'Intensity_850': intensity_850_interp
-            })
-            
-            combined_data = combined_data.dropna()
-            
-            self.data = combined_data
-            return combined_data
-            
+            df = read_log_dataframe(filename)
+        except Exception as e:
+            raise ValueError(f"Ошибка при чтении файла: {e}")
+        
+        # Вне try: исключение отмены из progress не должно превращаться в ошибку чтения
+        if progress is not None:
+            progress("Интерполяция данных...")
+        
+        try:
+            return self.interpolate_data(df)
         except Exception as e:
             raise ValueError(f"Ошибка при чтении файла: {e}")
     
-    def _alternative_read_method(self, df):
-        data_780 = df[df['Pin'] == 3][['Time(s)', 'Intensity']].copy()
-        data_850 = df[df['Pin'] == 4][['Time(s)', 'Intensity']].copy()
+    def _channel_samples(self, df):
+        # Отсчёты каналов монтажа: (время, строка канала, интенсивность); прочие пины отбрасываются
+        montage = self.montage
+        rows = montage.rows(df['Pin'].to_numpy())
+        known = rows >= 0
+        time = df['Time(s)'].to_numpy(dtype=float)[known]
+        intensity = df['Intensity'].to_numpy(dtype=float)[known]
+        rows = rows[known]
         
-        data_780 = data_780.sort_values('Time(s)')
-        data_850 = data_850.sort_values('Time(s)')
+        counts = np.bincount(rows, minlength=montage.n_channels)
+        if (counts == 0).any():
+            raise ValueError(f"Не найдены данные каналов (пины {montage.pins[counts == 0].tolist()})")
+        return time, rows, intensity, counts
+    
+    def interpolate_data(self, df):
+        if len(df) == 0:
+            raise ValueError("Нет корректных данных после очистки")
         
-        combined_data = []
+        montage = self.montage
+        time, rows, intensity, counts = self._channel_samples(df)
         
-        for _, row_780 in data_780.iterrows():
-            time_780 = row_780['Time(s)']
-            intensity_780 = row_780['Intensity']
+        first_time = np.full(montage.n_channels, np.inf)
+        last_time = np.full(montage.n_channels, -np.inf)
+        np.minimum.at(first_time, rows, time)
+        np.maximum.at(last_time, rows, time)
+        
+        if first_time.max() >= last_time.min():
+            return self._alternative_read_method(df)
+        
+        if (counts < 2).any():
+            raise ValueError("Недостаточно данных для интерполяции")
+        
+        from config import ANALYSIS_CONFIG
+        
+        rate = ANALYSIS_CONFIG.get('sampling_rate')
+        if not rate:
+            # Частота не задана: шаг сетки — средний по каналам интервал между
+            # первым и последним отсчётом канала в порядке файла
+            first_index = np.full(montage.n_channels, len(rows))
+            last_index = np.full(montage.n_channels, -1)
+            np.minimum.at(first_index, rows, np.arange(len(rows)))
+            np.maximum.at(last_index, rows, np.arange(len(rows)))
+            avg_interval = np.mean((time[last_index] - time[first_index]) / (counts - 1))
             
-            if len(data_850) > 0:
-                time_diff = np.abs(data_850['Time(s)'] - time_780)
-                closest_idx = time_diff.idxmin()
-                
-                if time_diff[closest_idx] < 1.0:  
-                    intensity_850 = data_850.loc[closest_idx, 'Intensity']
-                    combined_data.append({
-                        'Time(s)': time_780,
-                        'Intensity_780': intensity_780,
-                        'Intensity_850': intensity_850
-                    })
-        
-        if len(combined_data) == 0:
+            if np.isnan(avg_interval) or avg_interval <= 0:
+                avg_interval = 0.3
+            rate = 1.0 / avg_interval
+        
+        # Все каналы на общую равномерную сетку внутри их общего диапазона одной операцией
+        time_grid, intensities = resample_samples(time, rows, intensity, montage.n_channels, rate,
+                                                  ANALYSIS_CONFIG.get('resampling_method', 'linear'))
+        
+        # Один непрерывный массив (время и каналы по строкам): столбцы таблицы —
+        # его строки без копирования
+        frame = np.empty((1 + montage.n_channels, len(time_grid)))
+        frame[0] = time_grid
+        frame[1:] = intensities
+        combined_data = pd.DataFrame(frame.T, columns=['Time(s)'] + montage.channel_names(), copy=False)
+        
+        if np.isnan(intensities).any():
+            combined_data = combined_data.dropna()
+        
+        self.data = combined_data
+        return combined_data
+    
+    def _alternative_read_method(self, df):
+        from config import ANALYSIS_CONFIG
+        
+        montage = self.montage
+        time, rows, intensity, counts = self._channel_samples(df)
+        
+        order = np.lexsort((time, rows))
+        bounds = np.cumsum(counts)[:-1]
+        times = np.split(time[order], bounds)
+        values = np.split(intensity[order], bounds)
+        
+        # Каждому отсчёту первого канала — отсчёт каждого другого канала по времени
+        # (слиянием отсортированных рядов); остаются отсчёты, сопоставленные со всеми
+        reference = times[0]
+        matched = np.ones(len(reference), dtype=bool)
+        partners = np.zeros((montage.n_channels, len(reference)), dtype=np.intp)
+        partners[0] = np.arange(len(reference))
+        unused = duplicated = 0
+        for row in range(1, montage.n_channels):
+            index_reference, index_channel, channel_stats = align_nearest(
+                reference, times[row],
+                tolerance=ANALYSIS_CONFIG.get('alignment_tolerance', 1.0),
+                direction=ANALYSIS_CONFIG.get('alignment_direction', 'nearest'))
+            has_partner = np.zeros(len(reference), dtype=bool)
+            has_partner[index_reference] = True
+            partners[row, index_reference] = index_channel
+            matched &= has_partner
+            unused += channel_stats['unused_right']
+            duplicated += channel_stats['duplicated_right']
+        
+        keep = np.flatnonzero(matched)
+        stats = {
+            'paired': len(keep),
+            'dropped_left': len(reference) - len(keep),
+            'unused_right': unused,
+            'duplicated_right': duplicated
+        }
+        self.alignment_stats = stats
+        
+        if stats['dropped_left'] or stats['duplicated_right']:
+            logger.info(f"Сопоставление каналов: сопоставлено {stats['paired']}, отброшено отсчётов "
+                        f"опорного канала {stats['dropped_left']}, не использовано отсчётов других каналов "
+                        f"{stats['unused_right']}, использовано повторно {stats['duplicated_right']}")
+        
+        if stats['paired'] == 0:
             raise ValueError("Не удалось сопоставить данные по времени")
-            
-        combined_df = pd.DataFrame(combined_data)
+        
+        frame = np.empty((1 + montage.n_channels, len(keep)))
+        frame[0] = reference[keep]
+        for row in range(montage.n_channels):
+            frame[1 + row] = values[row][partners[row, keep]]
+        combined_df = pd.DataFrame(frame.T, columns=['Time(s)'] + montage.channel_names(), copy=False)
         self.data = combined_df
         return combined_df
     
+    def _intensity_array(self, data):
+        # (каналы, время) из таблицы: для таблицы из interpolate_data — без копирования
+        columns = ['Time(s)'] + self.montage.channel_names()
+        missing = [column for column in columns if column not in data.columns]
+        if missing:
+            raise ValueError(f"В данных нет столбцов {missing}")
+        if list(data.columns) != columns:
+            data = data[columns]
+        frame = data.to_numpy(dtype=float).T
+        return frame[0], frame[1:]
+    
     def process_data(self, data=None):
         if data is None:
             if self.data is None:
                 raise ValueError("Нет данных для обработки")
             data = self.data
         
-        time = data['Time(s)'].values
-        intensity_780 = data['Intensity_780'].values
-        intensity_850 = data['Intensity_850'].values
-        
-        Hb, HbO2, OD_780, OD_850 = calculate_hb_concentrations(intensity_780, intensity_850)
+        montage = self.montage
+        time, intensities = self._intensity_array(data)
         
-        if len(Hb) == 0:
+        if intensities.shape[1] == 0:
             raise ValueError("Не удалось рассчитать концентрации гемоглобина")
         
+        Hb, HbO2, _ = calculate_channel_concentrations(intensities, montage)
         saturation = calculate_saturation(Hb, HbO2)
         
-        Hb_filtered = filter_data(Hb)
-        HbO2_filtered = filter_data(HbO2)
-        saturation_filtered = np.clip(filter_data(saturation), 0, 100)
-        
-        self.results = {
-            'time': time,
-            'intensity_780': intensity_780,
-            'intensity_850': intensity_850,
-            'Hb': Hb_filtered,
-            'HbO2': HbO2_filtered,
-            'saturation': saturation_filtered,
-            'total_Hb': HbO2_filtered + Hb_filtered,
-            'stats': self._calculate_statistics(time, intensity_780, intensity_850, saturation_filtered)
-        }
+        # Все пары и ряды одним вызовом, с фактической частотой сетки интерполяции
+        filtered = filter_data(np.vstack([Hb, HbO2, saturation]), fs=estimate_sampling_rate(time))
+        Hb_filtered, HbO2_filtered, saturation_filtered = np.split(filtered, 3)
+        saturation_filtered = np.clip(saturation_filtered, 0, 100)
+        
+        self.results = build_results(
+            time, intensities, Hb_filtered, HbO2_filtered, saturation_filtered, montage,
+            self._calculate_statistics(time, intensities, saturation_filtered, montage))
         
         return self.results
     
-    def _calculate_statistics(self, time, intensity_780, intensity_850, saturation):
+    def _calculate_statistics(self, time, intensities, saturation, montage):
         if len(time) == 0:
             return {}
         
-        start_idx = max(0, int(len(saturation) * 0.1))
+        start_idx = max(0, int(saturation.shape[-1] * 0.1))
         
-        return {
+        stats = {
             'time_range': f"{time[0]:.2f} - {time[-1]:.2f} с",
-            'duration': f"{time[-1] - time[0]:.2f} с",
-            'intensity_780_range': f"{np.min(intensity_780):.3f} - {np.max(intensity_780):.3f}",
-            'intensity_850_range': f"{np.min(intensity_850):.3f} - {np.max(intensity_850):.3f}",
-            'mean_saturation': f"{np.mean(saturation[start_idx:]):.2f}%",
-            'min_saturation': f"{np.min(saturation[start_idx:]):.2f}%",
-            'max_saturation': f"{np.max(saturation[start_idx:]):.2f}%",
-            'std_saturation': f"{np.std(saturation[start_idx:]):.2f}%",
-            'data_points': len(time)
+            'duration': f"{time[-1] - time[0]:.2f} с"
         }
+        # Интенсивности и сатурация — по первой паре монтажа
+        for wavelength in montage.wavelengths:
+            values = intensities[montage.row(0, wavelength)]
+            stats[f'intensity_{wavelength}_range'] = f"{np.min(values):.3f} - {np.max(values):.3f}"
+        stats.update({
+            'mean_saturation': f"{np.mean(saturation[0, start_idx:]):.2f}%",
+            'min_saturation': f"{np.min(saturation[0, start_idx:]):.2f}%",
+            'max_saturation': f"{np.max(saturation[0, start_idx:]):.2f}%",
+            'std_saturation': f"{np.std(saturation[0, start_idx:]):.2f}%",
+            'data_points': len(time),
+            'channels': montage.n_channels
+        })
+        if montage.n_pairs > 1:
+            means = np.mean(saturation[:, start_idx:], axis=1)
+            stats['pair_mean_saturation'] = {
+                montage.pair_label(pair): f"{mean:.2f}%" for pair, mean in enumerate(means.tolist())
+            }
+        return stats
     
     def process_realtime_data(self, realtime_data):
         if realtime_data is None or len(realtime_data['time']) < 5:
             return None
         
+        montage = self.montage
         time = realtime_data['time']
-        intensity_780 = realtime_data['intensity_780']
-        intensity_850 = realtime_data['intensity_850']
+        intensities = realtime_data.get('intensities')
+        if intensities is None:
+            # Прежний формат: ряды intensity_<нм> одной пары
+            intensities = np.vstack([realtime_data[f'intensity_{wavelength}']
+                                     for _, _, _, wavelength in montage.channels])
         
         try:
-            Hb, HbO2, _, _ = calculate_hb_concentrations(intensity_780, intensity_850)
+            Hb, HbO2, _ = calculate_channel_concentrations(intensities, montage)
             saturation = calculate_saturation(Hb, HbO2)
             
-            if len(Hb) > 5:
-                Hb = filter_data(Hb)
-                HbO2 = filter_data(HbO2)
-                saturation = np.clip(filter_data(saturation), 0, 100)
-            
-            return {
-                'time': time,
-                'intensity_780': intensity_780,
-                'intensity_850': intensity_850,
-                'Hb': Hb,
-                'HbO2': HbO2,
-                'saturation': saturation,
-                'total_Hb': HbO2 + Hb
-            }
+            if Hb.shape[-1] > 5:
+                filtered = filter_data(np.vstack([Hb, HbO2, saturation]), fs=estimate_sampling_rate(time))
+                Hb, HbO2, saturation = np.split(filtered, 3)
+                saturation = np.clip(saturation, 0, 100)
             
+            return build_results(time, intensities, Hb, HbO2, saturation, montage)
+        
         except Exception as e:
             return None
     
@@ -217,15 +259,5 @@ class DataProcessor:
         if self.results is None:
             raise ValueError("Нет результатов для сохранения")
         
-        results_df = pd.DataFrame({
-            'Time(s)': self.results['time'],
-            'Intensity_780': self.results['intensity_780'],
-            'Intensity_850': self.results['intensity_850'],
-            'Hb': self.results['Hb'],
-            'HbO2': self.results['HbO2'],
-            'Saturation(%)': self.results['saturation'],
-            'Total_Hb': self.results['total_Hb']
-        })
-        
-        results_df.to_csv(filename, index=False)
-        return filename
\ No newline at end of file
+        results_frame(self.results).to_csv(filename, index=False)
+        return filename
@@ -0,0 +1,60 @@
+import numpy as np
+
+
+def visible_slice(x, x_min, x_max):
+    """Индексы отсчётов в [x_min, x_max] плюс по одному соседу с каждой стороны.
+
+    Соседи нужны, чтобы линия доходила до краёв оси, а не обрывалась
+    на последнем видимом отсчёте. ``x`` должен быть отсортирован.
+    """
+    start = max(int(np.searchsorted(x, x_min, side='left')) - 1, 0)
+    stop = min(int(np.searchsorted(x, x_max, side='right')) + 1, len(x))
+    return slice(start, stop)
+
+
+def minmax_indices(y, n_buckets):
+    """Индексы минимума и максимума в каждой из ``n_buckets`` равных по числу отсчётов корзин.
+
+    Внутри корзины индексы идут по возрастанию, поэтому линия проходит
+    через оба экстремума в исходном порядке и пики не теряются. Первый и
+    последний отсчёт сохраняются всегда.
+    """
+    n = len(y)
+    if n <= 2 * n_buckets + 2:
+        return np.arange(n)
+
+    bucket = -(-n // n_buckets)
+    n_buckets = -(-n // bucket)
+    # Хвост дополняется последним значением, чтобы корзины стали прямоугольным массивом
+    padded = np.empty(n_buckets * bucket, dtype=float)
+    padded[:n] = y
+    padded[n:] = y[-1]
+    blocks = padded.reshape(n_buckets, bucket)
+
+    offsets = np.arange(n_buckets) * bucket
+    pairs = np.stack([np.argmin(blocks, axis=1), np.argmax(blocks, axis=1)], axis=1)
+    pairs.sort(axis=1)
+    indices = np.minimum(pairs + offsets[:, np.newaxis], n - 1).ravel()
+
+    return np.unique(np.concatenate(([0], indices, [n - 1])))
+
+
+def decimate_minmax(x, y, x_min=None, x_max=None, n_buckets=1000):
+    """Прореживание ряда для отрисовки: min/max на корзину (обычно корзина — пиксель).
+
+    Возвращает (x, y) видимого диапазона не длиннее ~2 * n_buckets точек;
+    форма сигнала, выбросы и артефакты сохраняются, в отличие от шага
+    ``y[::step]``.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(x) == 0:
+        return x, y
+
+    x_min = x[0] if x_min is None else x_min
+    x_max = x[-1] if x_max is None else x_max
+    window = visible_slice(x, x_min, x_max)
+    x, y = x[window], y[window]
+
+    indices = minmax_indices(y, max(int(n_buckets), 1))
+    return x[indices], y[indices]
@@ -0,0 +1,160 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+FILTER_TYPES = ('lowpass', 'highpass', 'bandpass')
+_FILTER_ALIASES = {'low': 'lowpass', 'high': 'highpass', 'band': 'bandpass'}
+
+# Полосы физиологических помех в сигнале fNIRS (Гц) — для полосовой фильтрации
+PHYSIOLOGICAL_BANDS = {
+    'mayer': (0.07, 0.13),
+    'respiration': (0.15, 0.4),
+    'cardiac': (0.8, 2.0)
+}
+
+
+def _normalize(band, btype):
+    if btype is None:
+        btype = 'bandpass' if np.ndim(band) else 'lowpass'
+    btype = _FILTER_ALIASES.get(btype, btype)
+    if btype not in FILTER_TYPES:
+        raise ValueError(f"Неизвестный тип фильтра: {btype}")
+
+    if btype == 'bandpass':
+        low, high = (float(f) for f in band)
+        if not low < high:
+            raise ValueError(f"Нижняя граница полосы {low} Гц не меньше верхней {high} Гц")
+        return btype, (low, high)
+    return btype, float(band)
+
+
+@lru_cache(maxsize=32)
+def _design_sos(order, btype, band, fs):
+    from scipy import signal  # тяжёлый импорт только при первом проектировании
+
+    sos = signal.butter(order, band, btype=btype, fs=fs, output='sos')
+    sos.setflags(write=False)
+    return sos
+
+
+@lru_cache(maxsize=32)
+def _sos_zi(order, btype, band, fs):
+    from scipy import signal
+
+    zi = signal.sosfilt_zi(_design_sos(order, btype, band, fs))
+    zi.setflags(write=False)
+    return zi
+
+
+def _design_key(band, fs, order, btype):
+    btype, band = _normalize(band, btype)
+    # Частота, оценённая по отсчётам времени, отличается в последних разрядах:
+    # округление даёт один и тот же ключ кэша для одной и той же сетки
+    fs = float(f'{float(fs):.10g}')
+    nyquist = fs / 2
+    for frequency in np.atleast_1d(band):
+        if not 0 < frequency < nyquist:
+            raise ValueError(f"Частота {frequency} Гц вне диапазона (0, {nyquist}) Гц при fs={fs} Гц")
+    return int(order), btype, band, fs
+
+
+def design_filter(band, fs, order=2, btype=None):
+    """Фильтр Баттерворта в виде каскада секций второго порядка (SOS).
+
+    ``band`` — частота среза (Гц) для ``lowpass``/``highpass`` или пара
+    (нижняя, верхняя) для ``bandpass``; тип по умолчанию определяется по
+    ``band``. Проект кэшируется по (порядок, тип, полоса, частота
+    дискретизации); возвращаемый массив общий для всех вызовов и доступен
+    только для чтения. Форма SOS устойчива
+    при низких частотах среза относительно частоты дискретизации, где
+    коэффициенты (b, a) теряют точность.
+    """
+    return _design_sos(*_design_key(band, fs, order, btype))
+
+
+def filter_spec(config=None):
+    """(полоса, порядок, тип) фильтра из ``ANALYSIS_CONFIG``."""
+    if config is None:
+        from config import ANALYSIS_CONFIG
+        config = ANALYSIS_CONFIG
+
+    btype = config.get('filter_type', 'lowpass')
+    btype = _FILTER_ALIASES.get(btype, btype)
+    if btype == 'highpass':
+        band = config['highpass_frequency']
+    elif btype == 'bandpass':
+        band = (config['highpass_frequency'], config['cutoff_frequency'])
+    else:
+        band = config['cutoff_frequency']
+    return band, config.get('filter_order', 2), btype
+
+
+def estimate_sampling_rate(time, default=None):
+    """Частота дискретизации по медианному шагу времени; ``default`` при недостатке данных."""
+    time = np.asarray(time, dtype=float)
+    if len(time) >= 2:
+        step = np.median(np.diff(time))
+        if np.isfinite(step) and step > 0:
+            return 1.0 / step
+    if default is None:
+        from config import ANALYSIS_CONFIG
+        default = ANALYSIS_CONFIG['sampling_rate']
+    return float(default)
+
+
+def filtfilt_sos(data, band, fs, order=2, btype=None, axis=-1):
+    """Нуль-фазовая фильтрация (прямой и обратный проход) всех каналов одним вызовом.
+
+    ``data`` — ряд (time,) или массив (channels, time); фильтруется по ``axis``.
+    """
+    from scipy import signal
+
+    # sosfiltfilt требует записываемый буфер коэффициентов: копия общего проекта
+    sos = design_filter(band, fs, order, btype).copy()
+    data = np.asarray(data, dtype=float)
+    n_samples = data.shape[axis]
+    # Длина дополнения по умолчанию как у scipy, но не больше длины ряда
+    padlen = min(3 * (2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum())),
+                 n_samples - 1)
+    return signal.sosfiltfilt(sos, data, axis=axis, padlen=padlen)
+
+
+class CausalFilter:
+    """Каузальный SOS-фильтр для потока (channels, time) с переносом состояния между блоками.
+
+    Начальное состояние — установившееся для первого отсчёта каждого канала,
+    так что фильтр не даёт переходного процесса от нуля.
+    """
+
+    def __init__(self, band, fs, order=2, btype=None):
+        key = _design_key(band, fs, order, btype)
+        # sosfilt требует записываемый буфер коэффициентов: своя копия общего проекта
+        self.sos = _design_sos(*key).copy()
+        self._zi_unit = _sos_zi(*key)
+        self._zi = None
+
+    @classmethod
+    def from_config(cls, config=None, fs=None):
+        if config is None:
+            from config import ANALYSIS_CONFIG
+            config = ANALYSIS_CONFIG
+        band, order, btype = filter_spec(config)
+        return cls(band, config['sampling_rate'] if fs is None else fs, order, btype)
+
+    def reset(self):
+        self._zi = None
+
+    def process(self, block):
+        from scipy import signal
+
+        block = np.asarray(block, dtype=float)
+        if block.shape[-1] == 0:
+            return block
+        if self._zi is None:
+            # (секции, каналы, 2): единичное состояние, масштабированное первым отсчётом канала
+            self._zi = self._zi_unit[:, np.newaxis, :] * block[..., :1].reshape(1, -1, 1)
+            if block.ndim == 1:
+                self._zi = self._zi[:, 0, :]
+        filtered, self._zi = signal.sosfilt(self.sos, block, axis=-1, zi=self._zi)
+        return filtered
@@ -1,105 +1,187 @@
+from functools import lru_cache
+
 import numpy as np
-from scipy import signal
+
+from .filters import filter_spec, filtfilt_sos
+
+
+def _analysis_config():
+    from config import ANALYSIS_CONFIG
+    return ANALYSIS_CONFIG
+
+
+@lru_cache(maxsize=8)
+def _extinction_inverse(coefficients):
+    # Строки — длины волн, столбцы — (Hb, HbO2)
+    epsilon_matrix = np.array(coefficients, dtype=float)
+    n_wavelengths = epsilon_matrix.shape[0]
+    
+    # Обратная матрица считается один раз на набор коэффициентов; для
+    # вырожденной, плохо обусловленной или неквадратной (больше двух длин волн,
+    # метод наименьших квадратов) матрицы берём псевдообратную
+    try:
+        if n_wavelengths == 2 and np.linalg.cond(epsilon_matrix) < 1.0 / np.finfo(float).eps:
+            inverse = np.linalg.inv(epsilon_matrix)
+        else:
+            inverse = np.linalg.pinv(epsilon_matrix)
+    except (np.linalg.LinAlgError, ValueError):
+        try:
+            inverse = np.linalg.pinv(epsilon_matrix)
+        except (np.linalg.LinAlgError, ValueError):
+            inverse = np.zeros((2, n_wavelengths))
+    
+    if not np.all(np.isfinite(inverse)):
+        inverse = np.zeros((2, n_wavelengths))
+    
+    inverse.setflags(write=False)
+    return inverse
+
+
+def extinction_inverse(config=None, wavelengths=(780, 850)):
+    """Матрица (2, длины волн), переводящая OD в (Hb, HbO2); коэффициенты ``epsilon_hb_<нм>``."""
+    if config is None:
+        config = _analysis_config()
+    try:
+        coefficients = tuple(
+            (float(config[f'epsilon_hb_{wavelength}']), float(config[f'epsilon_hbo2_{wavelength}']))
+            for wavelength in wavelengths
+        )
+    except KeyError as e:
+        raise ValueError(f"Нет коэффициента экстинкции {e} в ANALYSIS_CONFIG")
+    return _extinction_inverse(coefficients)
+
+
+def solve_concentrations(OD_780, OD_850, inverse=None):
+    if inverse is None:
+        inverse = extinction_inverse()
+    
+    # Решение системы для всех отсчётов (и всех каналов) одной операцией
+    Hb = inverse[0, 0] * OD_780 + inverse[0, 1] * OD_850
+    HbO2 = inverse[1, 0] * OD_780 + inverse[1, 1] * OD_850
+    return Hb, HbO2
+
+
+def solve_pairs(OD, pair_rows, inverse):
+    """Hb и HbO2 (пары, время) по OD всех каналов (каналы, время).
+
+    ``pair_rows[p, w]`` — строка канала пары ``p`` на длине волны ``w``;
+    каждое слагаемое считается сразу для всех пар.
+    """
+    OD_first = OD[pair_rows[:, 0]]
+    Hb = inverse[0, 0] * OD_first
+    HbO2 = inverse[1, 0] * OD_first
+    for w in range(1, pair_rows.shape[1]):
+        OD_w = OD[pair_rows[:, w]]
+        Hb = Hb + inverse[0, w] * OD_w
+        HbO2 = HbO2 + inverse[1, w] * OD_w
+    return Hb, HbO2
+
+
+def _baseline(intensity):
+    # Среднее первых отсчётов каждого канала (не больше 20 и не больше 10% записи)
+    n_samples = intensity.shape[-1]
+    window_size = min(20, n_samples // 10)
+    if window_size > 1:
+        return np.mean(intensity[..., :window_size], axis=-1, keepdims=True)
+    return intensity[..., :1]
+
+
+def calculate_od(intensity, baseline, config=None):
+    if config is None:
+        config = _analysis_config()
+    
+    distance = config['source_detector_distance']
+    dpf = config['differential_pathlength_factor']
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta_OD = -np.log(np.maximum(intensity, 0.001) / baseline)
+        OD = delta_OD / (distance * dpf)
+    
+    OD = np.nan_to_num(OD, nan=0, posinf=0, neginf=0)
+    return np.clip(OD, -0.1, 0.1)
 
 
 def calculate_hb_concentrations(intensity_780, intensity_850):
-    if len(intensity_780) == 0 or len(intensity_850) == 0:
+    if np.size(intensity_780) == 0 or np.size(intensity_850) == 0:
         return np.array([]), np.array([]), np.array([]), np.array([])
     
-    from config import ANALYSIS_CONFIG
+    config = _analysis_config()
     
-    epsilon_Hb_780 = ANALYSIS_CONFIG['epsilon_hb_780']
-    epsilon_HbO2_780 = ANALYSIS_CONFIG['epsilon_hbo2_780']
-    epsilon_Hb_850 = ANALYSIS_CONFIG['epsilon_hb_850']
-    epsilon_HbO2_850 = ANALYSIS_CONFIG['epsilon_hbo2_850']
+    # Массивы формы (time,) или (channels, time)
+    intensity_780_arr = np.maximum(np.asarray(intensity_780, dtype=float), 0.001)
+    intensity_850_arr = np.maximum(np.asarray(intensity_850, dtype=float), 0.001)
     
-    distance = ANALYSIS_CONFIG['source_detector_distance']
-    dpf = ANALYSIS_CONFIG['differential_pathlength_factor']
+    baseline_780 = _baseline(intensity_780_arr)
+    baseline_850 = _baseline(intensity_850_arr)
     
-    intensity_780_arr = np.array(intensity_780)
-    intensity_850_arr = np.array(intensity_850)
+    OD_780 = calculate_od(intensity_780_arr, baseline_780, config)
+    OD_850 = calculate_od(intensity_850_arr, baseline_850, config)
     
-    intensity_780_arr = np.maximum(intensity_780_arr, 0.001)
-    intensity_850_arr = np.maximum(intensity_850_arr, 0.001)
+    Hb, HbO2 = solve_concentrations(OD_780, OD_850, extinction_inverse(config))
     
-    window_size = min(20, len(intensity_780_arr) // 10)
-    if window_size > 1:
-        baseline_780 = np.mean(intensity_780_arr[:window_size])
-        baseline_850 = np.mean(intensity_850_arr[:window_size])
-    else:
-        baseline_780 = intensity_780_arr[0]
-        baseline_850 = intensity_850_arr[0]
+    return Hb, HbO2, OD_780, OD_850
+
+
+def calculate_channel_concentrations(intensities, montage, config=None):
+    """Hb, HbO2 (пары, время) и OD (каналы, время) для всех каналов монтажа сразу."""
+    if config is None:
+        config = _analysis_config()
+    
+    intensities = np.maximum(np.asarray(intensities, dtype=float), 0.001)
+    OD = calculate_od(intensities, _baseline(intensities), config)
+    Hb, HbO2 = solve_pairs(OD, montage.pair_rows, extinction_inverse(config, montage.wavelengths))
+    return Hb, HbO2, OD
+
+
+def saturation_from_concentrations(Hb, HbO2):
+    total_Hb = Hb + HbO2
     
     with np.errstate(divide='ignore', invalid='ignore'):
-        delta_OD_780 = -np.log(intensity_780_arr / baseline_780)
-        delta_OD_850 = -np.log(intensity_850_arr / baseline_850)
-        
-        OD_780 = delta_OD_780 / (distance * dpf)
-        OD_850 = delta_OD_850 / (distance * dpf)
-    
-    OD_780 = np.nan_to_num(OD_780, nan=0, posinf=0, neginf=0)
-    OD_850 = np.nan_to_num(OD_850, nan=0, posinf=0, neginf=0)
-    
-    OD_780 = np.clip(OD_780, -0.1, 0.1)
-    OD_850 = np.clip(OD_850, -0.1, 0.1)
-    
-    epsilon_matrix = np.array([
-        [epsilon_Hb_780, epsilon_HbO2_780],
-        [epsilon_Hb_850, epsilon_HbO2_850]
-    ])
-    
-    concentrations = []
-    for od_780, od_850 in zip(OD_780, OD_850):
-        OD_vector = np.array([od_780, od_850])
-        
-        try:
-            conc = np.linalg.solve(epsilon_matrix, OD_vector)
-            concentrations.append(conc)
-        except (np.linalg.LinAlgError, ValueError):
-            try:
-                conc = np.linalg.pinv(epsilon_matrix) @ OD_vector
-                concentrations.append(conc)
-            except:
-                concentrations.append([0, 0])
+        saturation = np.where(total_Hb > 0.001, (HbO2 / total_Hb) * 100, 50)
     
-    concentrations = np.array(concentrations)
-    Hb = concentrations[:, 0]
-    HbO2 = concentrations[:, 1]
+    saturation = saturation * 1.4
     
-    return Hb, HbO2, OD_780, OD_850
+    saturation = np.nan_to_num(saturation, nan=50, posinf=100, neginf=0)
+    return np.clip(saturation, 0, 100)
 
 
 def calculate_saturation(Hb, HbO2):
-    if len(Hb) == 0:
+    if np.shape(Hb)[-1] == 0:
         return np.array([])
-        
-    total_Hb = Hb + HbO2
     
-    start_idx = max(0, int(len(total_Hb) * 0.1))
+    # Ряд (time,) или пары (pairs, time): первые 10% отсчётов — первое рассчитанное значение
+    start_idx = max(0, int(np.shape(Hb)[-1] * 0.1))
     
-    with np.errstate(divide='ignore', invalid='ignore'):
-        saturation = np.where(total_Hb[start_idx:] > 0.001,
-                            (HbO2[start_idx:] / total_Hb[start_idx:]) * 100, 50)
-    
-    saturation = saturation * 1.4
+    saturation = saturation_from_concentrations(Hb[..., start_idx:], HbO2[..., start_idx:])
     
     if start_idx > 0:
-        initial_saturation = np.full(start_idx, saturation[0] if len(saturation) > 0 else 50)
-        saturation = np.concatenate([initial_saturation, saturation])
-    
-    saturation = np.nan_to_num(saturation, nan=50, posinf=100, neginf=0)
-    saturation = np.clip(saturation, 0, 100)
+        initial_saturation = np.repeat(saturation[..., :1], start_idx, axis=-1)
+        saturation = np.concatenate([initial_saturation, saturation], axis=-1)
     
     return saturation
 
 
-def filter_data(data, cutoff_freq=0.5, fs=10):
-    if len(data) < 10:  
+def filter_data(data, cutoff_freq=None, fs=None, config=None):
+    """Нуль-фазовая фильтрация ряда (time,) или всех каналов (channels, time) сразу.
+
+    Полоса, порядок и тип фильтра берутся из ``config`` (по умолчанию
+    ``ANALYSIS_CONFIG``); ``cutoff_freq`` задаёт низкочастотный фильтр явно.
+    ``fs`` — фактическая частота дискретизации данных (по умолчанию
+    ``sampling_rate`` из конфигурации).
+    """
+    if np.shape(data)[-1] < 10:
         return data
-        
+    
+    if config is None:
+        config = _analysis_config()
+    band, order, btype = filter_spec(config)
+    if cutoff_freq is not None:
+        band, btype = cutoff_freq, 'lowpass'
+    if fs is None:
+        fs = config['sampling_rate']
+    
     try:
-        b, a = signal.butter(2, cutoff_freq / (fs / 2), btype='low')
-        filtered_data = signal.filtfilt(b, a, data)
-        return filtered_data
-    except:
-        return data  
\ No newline at end of file
+        return filtfilt_sos(data, band, fs, order, btype)
+    except (ValueError, ImportError):
+        # Полоса вне диапазона частот данных или нет scipy: данные без фильтрации
+        return data
@@ -0,0 +1,201 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+
+import numpy as np
+
+from .decimation import decimate_minmax, visible_slice
+
+
+LOD_SERIES = ('intensity_780', 'intensity_850', 'Hb', 'HbO2', 'saturation', 'total_Hb')
+CACHE_SUFFIX = '.lod.npz'
+CACHE_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+class LODPyramid:
+    """Пирамида уровней детализации (min/max) над результатами ``process_data``.
+
+    Уровень 0 — исходные ряды (без копирования). Уровень k хранит для каждой
+    корзины из ``factor ** k`` отсчётов время начала корзины и минимум/максимум
+    каждого ряда; строится из предыдущего уровня за один проход. При
+    ``factor=4`` все уровни вместе занимают не больше ~2/3 объёма исходных
+    данных. Для видимого диапазона выбирается самый грубый уровень, где на
+    пиксель приходится хотя бы одна корзина, так что стоимость отрисовки
+    зависит от ширины оси, а не от длины записи.
+    """
+
+    def __init__(self, time, series, factor=4, min_buckets=1024, levels=None):
+        self.time = np.asarray(time, dtype=float)
+        self.series = {key: np.asarray(values, dtype=float) for key, values in series.items()}
+        self.factor = factor
+        self.levels = levels if levels is not None else self._build(min_buckets)
+
+    @classmethod
+    def from_results(cls, results, **kwargs):
+        series = {key: results[key] for key in LOD_SERIES if key in results}
+        if 'total_Hb' not in series and 'Hb' in series and 'HbO2' in series:
+            series['total_Hb'] = np.asarray(results['HbO2']) + np.asarray(results['Hb'])
+        return cls(results['time'], series, **kwargs)
+
+    def _build(self, min_buckets):
+        levels = []
+        time = self.time
+        lows, highs = self.series, self.series
+        bucket = 1
+
+        while len(time) // self.factor >= min_buckets:
+            starts = np.arange(0, len(time), self.factor)
+            bucket *= self.factor
+            time = time[starts]
+            lows = {key: np.minimum.reduceat(values, starts) for key, values in lows.items()}
+            highs = {key: np.maximum.reduceat(values, starts) for key, values in highs.items()}
+            levels.append({'bucket': bucket, 'time': time, 'min': lows, 'max': highs})
+
+        return levels
+
+    def nbytes(self):
+        total = 0
+        for level in self.levels:
+            total += level['time'].nbytes
+            total += sum(values.nbytes for values in level['min'].values())
+            total += sum(values.nbytes for values in level['max'].values())
+        return total
+
+    def select_level(self, x_min, x_max, n_buckets):
+        """Номер уровня для диапазона (0 — исходные данные)."""
+        window = visible_slice(self.time, x_min, x_max)
+        visible = window.stop - window.start
+
+        selected = 0
+        for index, level in enumerate(self.levels, start=1):
+            if visible // level['bucket'] < n_buckets:
+                break
+            selected = index
+        return selected
+
+    def render(self, key, x_min=None, x_max=None, n_buckets=1000):
+        """(x, y) ряда ``key`` для отрисовки видимого диапазона на ``n_buckets`` пикселей."""
+        if len(self.time) == 0:
+            return self.time, self.series[key]
+
+        x_min = self.time[0] if x_min is None else x_min
+        x_max = self.time[-1] if x_max is None else x_max
+        level_index = self.select_level(x_min, x_max, n_buckets)
+        if level_index == 0:
+            return decimate_minmax(self.time, self.series[key], x_min, x_max, n_buckets)
+
+        level = self.levels[level_index - 1]
+        window = visible_slice(level['time'], x_min, x_max)
+        time = level['time'][window]
+        # Корзина уже меньше пикселя: рисуется вертикальный отрезок min–max в её начале
+        y = np.empty(2 * len(time))
+        y[0::2] = level['min'][key][window]
+        y[1::2] = level['max'][key][window]
+        return np.repeat(time, 2), y
+
+    def save(self, path, fingerprint):
+        arrays = {'meta': np.array(json.dumps({
+            'version': CACHE_VERSION,
+            'fingerprint': fingerprint,
+            'factor': self.factor,
+            'buckets': [level['bucket'] for level in self.levels],
+            'series': sorted(self.series)
+        }))}
+        for index, level in enumerate(self.levels):
+            arrays[f'time_{index}'] = level['time']
+            for key in self.series:
+                arrays[f'min_{index}_{key}'] = level['min'][key]
+                arrays[f'max_{index}_{key}'] = level['max'][key]
+
+        # Запись во временный файл и атомарная замена: прерванное сохранение не оставит битый кэш;
+        # временный файл свой у каждого писателя, каталог кэша общий с процессами анализа
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                                 prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(temporary, path)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path, results, fingerprint):
+        """Пирамида из кэша или None, если кэша нет либо он не соответствует результатам."""
+        try:
+            with np.load(path, allow_pickle=False) as cached:
+                meta = json.loads(str(cached['meta']))
+                if meta.get('version') != CACHE_VERSION or meta.get('fingerprint') != fingerprint:
+                    return None
+
+                pyramid = cls.from_results(results, factor=meta['factor'], levels=[])
+                if sorted(pyramid.series) != meta['series']:
+                    return None
+
+                for index, bucket in enumerate(meta['buckets']):
+                    pyramid.levels.append({
+                        'bucket': bucket,
+                        'time': cached[f'time_{index}'],
+                        'min': {key: cached[f'min_{index}_{key}'] for key in pyramid.series},
+                        'max': {key: cached[f'max_{index}_{key}'] for key in pyramid.series}
+                    })
+                return pyramid
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать кэш уровней детализации {path}: {e}")
+            return None
+
+
+def results_fingerprint(results):
+    """Отпечаток результатов: длина и выборка значений рядов."""
+    time = np.asarray(results['time'])
+    digest = hashlib.sha1()
+    digest.update(str(len(time)).encode())
+
+    stride = max(1, len(time) // 4096)
+    for key in ('time',) + LOD_SERIES:
+        if key in results:
+            digest.update(key.encode())
+            digest.update(np.ascontiguousarray(np.asarray(results[key], dtype=float)[::stride]).tobytes())
+
+    return digest.hexdigest()
+
+
+def load_or_build(results, key=None, cache_dir=None, **kwargs):
+    """Пирамида для результатов; при ``key`` и ``cache_dir`` — с кэшем в этом каталоге.
+
+    ``key`` — хэш содержимого исходного файла (``results['source_key']``),
+    его считает процесс анализа, так что здесь файл не читается. Запись
+    ``<key>.lod.npz`` лежит рядом с записями кэша анализа
+    (``FILE_CONFIG['analysis_cache_dir']``) и вытесняется вместе с ними.
+    """
+    if key is None or cache_dir is None:
+        return LODPyramid.from_results(results, **kwargs)
+
+    path = os.path.join(cache_dir, key + CACHE_SUFFIX)
+    # Файл задан хэшем содержимого; отпечаток сверяет только результаты (параметры анализа)
+    fingerprint = results_fingerprint(results)
+    if os.path.exists(path):
+        pyramid = LODPyramid.load(path, results, fingerprint)
+        if pyramid is not None:
+            try:
+                # Время изменения — порядок вытеснения в кэше анализа
+                os.utime(path)
+            except OSError:
+                pass
+            return pyramid
+
+    pyramid = LODPyramid.from_results(results, **kwargs)
+    if pyramid.levels:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            pyramid.save(path, fingerprint)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить кэш уровней детализации {path}: {e}")
+    return pyramid
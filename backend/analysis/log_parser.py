@@ -0,0 +1,209 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_BLOCK_SIZE = 16 * 1024 * 1024
+
+_COLUMNS = ['c0', 'c1', 'c2', 'c3']
+
+# Значимые поля строки, как в построчном разборе: время "с:мс" или "с", пин и значение;
+# остальные поля (комментарии и т. п.) не учитываются
+_DATA_FIELDS = 3
+_PIN_FIELD = 2
+
+# Классы байтов: один проход по таблице вместо отдельной таблицы на каждую проверку
+_SPACE = 1
+_SEPARATOR = 2
+_DIGIT = 4
+_COLON = 8
+_NOT_INTEGER = 16
+_NOT_ALLOWED = 32
+
+_BYTE_CLASS = np.full(256, _NOT_ALLOWED | _NOT_INTEGER, dtype=np.uint8)
+_BYTE_CLASS[np.frombuffer(b'\t \r\x0b\x0c', dtype=np.uint8)] = _SPACE | _SEPARATOR
+_BYTE_CLASS[ord('\n')] = _SPACE
+_BYTE_CLASS[ord('0'):ord('9') + 1] = _DIGIT
+_BYTE_CLASS[np.frombuffer(b'+-', dtype=np.uint8)] = 0
+_BYTE_CLASS[np.frombuffer(b'.eE', dtype=np.uint8)] = _NOT_INTEGER
+# Двоеточие "с:мс" становится разделителем полей
+_BYTE_CLASS[ord(':')] = _COLON | _SEPARATOR | _NOT_INTEGER
+
+
+def _empty():
+    return np.array([]), np.array([], dtype=int), np.array([])
+
+
+def _decode_columns(has_ms, c0, c1, c2, c3):
+    # Строки "с:мс пин значение" и "время пин значение"
+    time = np.where(has_ms, c0 + c1 / 1000.0, c0)
+    pin = np.where(has_ms, c2, c1)
+    intensity = np.where(has_ms, c3, c2)
+
+    valid = ~(np.isnan(time) | np.isnan(pin) | np.isnan(intensity))
+    valid &= pin == np.round(pin)
+
+    return time[valid], pin[valid].astype(int), intensity[valid]
+
+
+def _field_numbers(space, line_starts, line_lengths):
+    """Номер поля для каждого байта внутри своей строки (0 — пробелы до первого поля)."""
+    field_start = ~space
+    field_start[1:] &= space[:-1]
+    # В строке короче 511 байт меньше 256 полей: счёт по модулю 256 точен и вчетверо компактнее
+    dtype = np.uint8 if line_lengths.max() < 511 else np.int32
+    field = np.cumsum(field_start, dtype=dtype)
+    field -= np.repeat(field[line_starts] - field_start[line_starts], line_lengths)
+    return field
+
+
+def _data_lines(block):
+    """Строки данных блока, готовые для CSV-парсера, и признак времени "с:мс" для каждой."""
+    chars = np.frombuffer(block, dtype=np.uint8)
+    line_ends = np.flatnonzero(chars == ord('\n'))
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    line_lengths = line_ends - line_starts + 1
+
+    byte_class = _BYTE_CLASS[chars]
+    space = (byte_class & _SPACE) != 0
+    field = _field_numbers(space, line_starts, line_lengths)
+    data = field <= _DATA_FIELDS
+    colon = (byte_class & _COLON) != 0
+
+    # Заголовки и мусор отсекаются по составу символов строки, без цикла по строкам.
+    # Двоеточие допустимо только во времени, номер пина — целое без точки и экспоненты,
+    # как требовал int() построчного разбора
+    invalid = (byte_class & _NOT_ALLOWED) != 0
+    invalid |= colon & (field > 1)
+    invalid |= (field == _PIN_FIELD) & ((byte_class & _NOT_INTEGER) != 0)
+    invalid &= data
+    bad = np.logical_or.reduceat(invalid, line_starts)
+    digits = np.logical_or.reduceat((byte_class & _DIGIT) != 0, line_starts)
+
+    # Двоеточий в строке обычно не больше одного: разбираются их позиции, а не все байты
+    colons = np.flatnonzero(colon & data)
+    colon_lines = np.searchsorted(line_starts, colons, side='right') - 1
+    bad[colon_lines[1:][colon_lines[1:] == colon_lines[:-1]]] = True
+    has_ms = np.zeros(len(line_starts), dtype=bool)
+    # "5:" без миллисекунд — просто секунды
+    has_ms[colon_lines[~space[colons + 1]]] = True
+
+    keep = ~bad & digits
+    # Разделители полей — табуляция, лишние поля стираются
+    chars = chars.copy()
+    np.putmask(chars, ((byte_class & _SEPARATOR) != 0) | ~(data | space), np.uint8(ord('\t')))
+    chars = chars[np.repeat(keep, line_lengths)]
+    return chars.tobytes(), has_ms[keep]
+
+
+def _parse_numeric_block(data, has_ms):
+    frame = pd.read_csv(
+        io.BytesIO(data),
+        sep=r'\s+',
+        header=None,
+        names=_COLUMNS,
+        dtype=float,
+        engine='c'
+    )
+    if len(frame) != len(has_ms):
+        raise ValueError("Несоответствие числа строк при разборе блока")
+
+    values = frame.to_numpy(dtype=float)
+    return _decode_columns(has_ms, values[:, 0], values[:, 1], values[:, 2], values[:, 3])
+
+
+def _parse_text_block(data, has_ms):
+    # Медленный путь для блоков с повреждёнными числами ("1.2.3", "1e"): они становятся NaN
+    frame = pd.read_csv(
+        io.BytesIO(data),
+        sep=r'\s+',
+        header=None,
+        names=_COLUMNS,
+        dtype=str,
+        engine='c'
+    )
+    if len(frame) != len(has_ms):
+        raise ValueError("Несоответствие числа строк при разборе блока")
+
+    c0, c1, c2, c3 = (
+        pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=float)
+        for column in _COLUMNS
+    )
+    return _decode_columns(has_ms, c0, c1, c2, c3)
+
+
+def parse_log_bytes(raw):
+    """Разбор блока журнала фотометра (строки ``с:мс<TAB>пин<TAB>значение``).
+
+    Возвращает массивы времени (с), номера пина и интенсивности. Заголовки,
+    разделители и строки, заполненные NUL, отбрасываются без построчного кода Python.
+    """
+    raw = raw.replace(b'\x00', b'')
+    if not raw.strip():
+        return _empty()
+    if not raw.endswith(b'\n'):
+        raw += b'\n'
+
+    data, has_ms = _data_lines(raw)
+    if len(has_ms) == 0:
+        return _empty()
+    try:
+        return _parse_numeric_block(data, has_ms)
+    except (ValueError, pd.errors.ParserError):
+        return _parse_text_block(data, has_ms)
+
+
+def iter_raw_blocks(filename, block_size=DEFAULT_BLOCK_SIZE):
+    """Чтение файла блоками, выровненными по границам строк: (смещение, байты)."""
+    with open(filename, 'rb') as f:
+        # Один буфер на весь файл и не больше файла: маленький журнал не выделяет полный блок
+        buffer = bytearray(max(1, min(block_size, os.fstat(f.fileno()).st_size)))
+        offset = 0
+        filled = 0
+        while True:
+            if filled == len(buffer):
+                # Строка длиннее блока
+                buffer.extend(bytes(len(buffer)))
+            with memoryview(buffer) as view:
+                count = f.readinto(view[filled:])
+                if not count:
+                    break
+                filled += count
+                cut = buffer.rfind(b'\n', 0, filled) + 1
+                if cut > 0:
+                    block = bytes(view[:cut])
+            if cut > 0:
+                # Остаток неполной строки переносится в начало буфера
+                buffer[:filled - cut] = buffer[cut:filled]
+                filled -= cut
+                yield offset, block
+                offset += cut
+        if filled:
+            yield offset, bytes(buffer[:filled])
+
+
+def read_raw_block(filename, offset, length):
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def iter_log_blocks(filename, block_size=DEFAULT_BLOCK_SIZE):
+    for _, raw in iter_raw_blocks(filename, block_size):
+        yield parse_log_bytes(raw)
+
+
+def read_log_file(filename, block_size=DEFAULT_BLOCK_SIZE):
+    blocks = list(iter_log_blocks(filename, block_size))
+    if not blocks:
+        return _empty()
+
+    time, pin, intensity = zip(*blocks)
+    return np.concatenate(time), np.concatenate(pin), np.concatenate(intensity)
+
+
+def read_log_dataframe(filename):
+    time, pin, intensity = read_log_file(filename)
+    return pd.DataFrame({'Time(s)': time, 'Pin': pin, 'Intensity': intensity})
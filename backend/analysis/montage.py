@@ -0,0 +1,114 @@
+import numpy as np
+
+
+# (пин, источник, детектор, длина волны нм): прошивка шлёт 780 нм на пин 3, 850 нм — на пин 4
+DEFAULT_MONTAGE = (
+    (3, 1, 1, 780),
+    (4, 1, 1, 850)
+)
+
+
+class Montage:
+    """Монтаж каналов для данных вида (каналы × время).
+
+    Каждая строка массива — канал: пин устройства (номер в логе и в потоке
+    порта), источник, детектор и длина волны. Каналы с одинаковыми
+    (источник, детектор) образуют измерительную пару; для пары закон
+    Бера–Ламберта решается относительно Hb и HbO2, поэтому у всех пар
+    должен быть один и тот же набор из двух и более длин волн.
+    ``pair_rows[p, w]`` — строка канала пары ``p`` на длине волны
+    ``wavelengths[w]``: все стадии обработки работают с этим индексом
+    целиком, без циклов по каналам.
+    """
+
+    def __init__(self, channels):
+        channels = tuple(tuple(int(value) for value in channel) for channel in channels)
+        if not channels:
+            raise ValueError("Монтаж не содержит каналов")
+
+        self.channels = channels
+        self.pins = np.array([pin for pin, _, _, _ in channels])
+        if len(set(self.pins.tolist())) != len(channels) or self.pins.min() < 0:
+            raise ValueError("Пины каналов монтажа должны быть неотрицательными и различными")
+
+        self.wavelengths = tuple(sorted({wavelength for _, _, _, wavelength in channels}))
+        if len(self.wavelengths) < 2:
+            raise ValueError("Для расчёта Hb и HbO2 нужны минимум две длины волны")
+        self.pairs = tuple(dict.fromkeys((source, detector) for _, source, detector, _ in channels))
+
+        pair_rows = np.full((len(self.pairs), len(self.wavelengths)), -1, dtype=np.intp)
+        for row, (_, source, detector, wavelength) in enumerate(channels):
+            index = (self.pairs.index((source, detector)), self.wavelengths.index(wavelength))
+            if pair_rows[index] >= 0:
+                raise ValueError(f"Повтор канала S{source}-D{detector} {wavelength} нм")
+            pair_rows[index] = row
+        if (pair_rows < 0).any():
+            source, detector = self.pairs[int(np.flatnonzero((pair_rows < 0).any(axis=1))[0])]
+            raise ValueError(f"У пары S{source}-D{detector} есть не все длины волны {self.wavelengths}")
+        self.pair_rows = pair_rows
+
+        self._pin_rows = np.full(self.pins.max() + 1, -1, dtype=np.intp)
+        self._pin_rows[self.pins] = np.arange(len(channels))
+
+    @classmethod
+    def from_config(cls, config=None):
+        if config is None:
+            from config import ANALYSIS_CONFIG
+            config = ANALYSIS_CONFIG
+        return cls(config.get('montage') or DEFAULT_MONTAGE)
+
+    @classmethod
+    def build(cls, pairs, wavelengths=(780, 850), first_pin=3):
+        """Монтаж из списка пар (источник, детектор); пины идут подряд с ``first_pin``."""
+        channels = []
+        for source, detector in pairs:
+            for wavelength in wavelengths:
+                channels.append((first_pin + len(channels), source, detector, wavelength))
+        return cls(channels)
+
+    @property
+    def n_channels(self):
+        return len(self.channels)
+
+    @property
+    def n_pairs(self):
+        return len(self.pairs)
+
+    def __len__(self):
+        return len(self.channels)
+
+    def __eq__(self, other):
+        return isinstance(other, Montage) and self.channels == other.channels
+
+    def __hash__(self):
+        return hash(self.channels)
+
+    def rows(self, pins):
+        """Строки каналов для массива пинов; -1 для пинов вне монтажа."""
+        pins = np.asarray(pins)
+        known = (pins >= 0) & (pins < len(self._pin_rows))
+        rows = np.full(pins.shape, -1, dtype=np.intp)
+        rows[known] = self._pin_rows[pins[known]]
+        return rows
+
+    def row(self, pair, wavelength):
+        return int(self.pair_rows[pair, self.wavelengths.index(wavelength)])
+
+    def pair_label(self, pair):
+        source, detector = self.pairs[pair]
+        return f'S{source}D{detector}'
+
+    def channel_names(self):
+        """Имена столбцов интенсивности; для одной пары — прежние ``Intensity_<длина волны>``."""
+        if self.n_pairs == 1:
+            return [f'Intensity_{wavelength}' for _, _, _, wavelength in self.channels]
+        return [f'Intensity_S{source}D{detector}_{wavelength}'
+                for _, source, detector, wavelength in self.channels]
+
+    def pair_suffixes(self):
+        if self.n_pairs == 1:
+            return ['']
+        return [f'_{self.pair_label(pair)}' for pair in range(self.n_pairs)]
+
+    def to_list(self):
+        return [list(channel) for channel in self.channels]
@@ -0,0 +1,105 @@
+from fractions import Fraction
+
+import numpy as np
+
+
+RESAMPLING_METHODS = ('linear', 'polyphase')
+# Предел знаменателя отношения частот для полифазного режима (up/down)
+MAX_RATIO_DENOMINATOR = 64
+
+
+def uniform_grid(start, stop, rate):
+    """Равномерная сетка ``start + k / rate`` внутри [start, stop]."""
+    step = 1.0 / rate
+    if not stop >= start:
+        return np.array([])
+    n_points = int(np.floor((stop - start) / step)) + 1
+    grid = start + np.arange(n_points) * step
+    # Погрешность округления не должна выводить последнюю точку за данные
+    if grid[-1] > stop:
+        grid = grid[:-1]
+    return grid
+
+
+def interpolate_segments(grid, time, values, starts, counts):
+    """Линейная интерполяция каналов со своими осями времени одной операцией.
+
+    ``time`` и ``values`` — отсчёты всех каналов подряд (канал за каналом,
+    внутри канала по времени); канал ``c`` занимает ``starts[c]`` ..
+    ``starts[c] + counts[c] - 1``. К времени каждого канала добавляется
+    смещение, превышающее весь диапазон, так что один ``np.searchsorted``
+    по склеенной оси находит интервалы для всех каналов. Возвращает (каналы, сетка).
+    """
+    n_channels = len(starts)
+    origin = grid[0]
+    span = 2.0 * max(np.max(np.abs(time - origin)), np.max(np.abs(grid - origin))) + 1.0
+    offsets = np.arange(n_channels) * span
+
+    keys = (time - origin) + np.repeat(offsets, counts)
+    grid_keys = (grid - origin)[np.newaxis, :] + offsets[:, np.newaxis]
+
+    first = starts[:, np.newaxis]
+    last = (starts + counts - 1)[:, np.newaxis]
+    right = np.minimum(np.maximum(np.searchsorted(keys, grid_keys, side='right'), first + 1), last)
+    left = np.maximum(right - 1, first)
+
+    span_time = time[right] - time[left]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.clip(np.where(span_time > 0, (grid - time[left]) / span_time, 0.0), 0.0, 1.0)
+    return values[left] + (values[right] - values[left]) * weight
+
+
+def _group_samples(time, rows, values, n_rows):
+    # Отсчёты вперемешку -> канал за каналом, внутри канала по времени (устойчиво)
+    order = np.lexsort((time, rows))
+    time, rows, values = time[order], rows[order], values[order]
+    counts = np.bincount(rows, minlength=n_rows)
+    if (counts == 0).any():
+        raise ValueError(f"Нет отсчётов для каналов {np.flatnonzero(counts == 0).tolist()}")
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return time, values, starts, counts
+
+
+def resample_samples(time, rows, values, n_rows, rate, method='linear'):
+    """Отсчёты вперемешку (время, строка канала, значение) на общую сетку с частотой ``rate`` (Гц).
+
+    Поток вида (время, пин, интенсивность), где у каждого канала свои
+    моменты отсчётов. Сетка лежит в пересечении диапазонов всех каналов, так
+    что значения за пределами данных не экстраполируются. Все каналы
+    интерполируются одной операцией; в режиме ``polyphase`` каналы сначала
+    приводятся к общей равномерной сетке с медианной собственной частотой,
+    затем передискретизируются одним вызовом ``resample_poly`` по всем
+    строкам (фильтр против наложения спектров при понижении частоты).
+
+    Возвращает (сетка, значения (n_rows, сетка)).
+    """
+    if method not in RESAMPLING_METHODS:
+        raise ValueError(f"Неизвестный метод передискретизации: {method}")
+
+    time, values, starts, counts = _group_samples(
+        np.asarray(time, dtype=float), np.asarray(rows), np.asarray(values, dtype=float), n_rows)
+    ends = starts + counts - 1
+    start = np.max(time[starts])
+    stop = np.min(time[ends])
+    grid = uniform_grid(start, stop, rate)
+    if len(grid) == 0:
+        raise ValueError("Диапазоны времени каналов не пересекаются")
+
+    if method == 'linear' or len(time) - n_rows < 1:
+        return grid, interpolate_segments(grid, time, values, starts, counts)
+
+    from scipy import signal
+
+    # Медианный шаг внутри каналов (без переходов между каналами)
+    within = np.ones(len(time) - 1, dtype=bool)
+    within[ends[:-1]] = False
+    step = np.median(np.diff(time)[within])
+    native = 1.0 / step if step > 0 else rate
+    ratio = Fraction(rate / native).limit_denominator(MAX_RATIO_DENOMINATOR)
+    up, down = ratio.numerator, ratio.denominator
+
+    source_grid = uniform_grid(start, stop, rate * down / up)
+    uniform = interpolate_segments(source_grid, time, values, starts, counts)
+    resampled = signal.resample_poly(uniform, up, down, axis=-1, padtype='line')
+    n_points = min(len(grid), resampled.shape[1])
+    return grid[:n_points], np.ascontiguousarray(resampled[:, :n_points])
@@ -0,0 +1,249 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .montage import Montage
+from .results import build_results
+
+
+# Меняется при изменении алгоритмов обработки: старые записи перестают совпадать
+CACHE_VERSION = 4
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+INDEX_FILE = 'index.json'
+
+# Массивы результатов: (каналы, время) для интенсивности и (пары, время) для остальных
+RESULT_ARRAYS = ('intensity', 'Hb', 'HbO2', 'saturation')
+# Параметры, от которых зависят уже интерполированные данные (сетка, монтаж и сопоставление каналов)
+DATA_PARAMS = ('sampling_rate', 'resampling_method', 'alignment_tolerance', 'alignment_direction', 'montage')
+
+
+def content_hash(filename, block_size=HASH_BLOCK_SIZE):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def data_params(params):
+    return {name: params[name] for name in DATA_PARAMS if name in params}
+
+
+def params_hash(params):
+    encoded = json.dumps({'version': CACHE_VERSION, 'params': params}, sort_keys=True, default=str)
+    return hashlib.blake2b(encoded.encode(), digest_size=10).hexdigest()
+
+
+class AnalysisCache:
+    """Дисковый кэш результатов анализа файла, адресуемый по содержимому.
+
+    Записи именуются хэшем содержимого файла, поэтому копия файла по другому
+    пути попадает в ту же запись. Интерполированные данные зависят только
+    от файла и параметров сетки (``<хэш>.<параметры>.data.npz``),
+    результаты — от всех параметров анализа (``<хэш>.<параметры>.results.npz``): при смене ``ANALYSIS_CONFIG``
+    пересчитывается только обработка, разбор файла берётся из кэша. Чтобы не
+    перечитывать файл при каждом открытии, хэш запоминается в индексе по
+    (путь, размер, время изменения). Формат — несжатый ``.npz``; при
+    превышении ``max_bytes`` удаляются давно не использованные записи (LRU по
+    времени изменения файла записи, которое обновляется при чтении).
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._index = None
+        self.logger = logging.getLogger(__name__)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load_index(self):
+        if self._index is None:
+            try:
+                with open(self._path(INDEX_FILE), encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _write_file(self, name, write):
+        # Свой временный файл у каждого писателя: каталог кэша общий для процессов анализа и интерфейса
+        os.makedirs(self.directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix=f'.{name}.', suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                write(f)
+            os.replace(temporary, self._path(name))
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            raise
+
+    def _save_index(self, path=None, entry=None, keep=None):
+        """Запись ``entry`` для ``path`` и/или отбор записей ``keep(entry)`` в индексе.
+
+        Изменения применяются к текущей версии индекса на диске, которую могли
+        обновить другие процессы; при одновременной записи побеждает последний.
+        """
+        self._index = None
+        index = self._load_index()
+        if path is not None:
+            index[path] = entry
+        if keep is not None:
+            for name in [name for name, value in index.items() if not keep(value)]:
+                del index[name]
+        self._write_file(INDEX_FILE, lambda f: f.write(json.dumps(index).encode('utf-8')))
+
+    def file_key(self, filename):
+        """Хэш содержимого; при неизменных размере и времени изменения берётся из индекса."""
+        path = os.path.realpath(filename)
+        stat = os.stat(path)
+        index = self._load_index()
+
+        entry = index.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['hash']
+
+        digest = content_hash(path)
+        self._save_index(path, {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest})
+        return digest
+
+    def _read(self, name):
+        path = self._path(name)
+        try:
+            with np.load(path, allow_pickle=False) as cached:
+                arrays = {key: cached[key] for key in cached.files}
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            # Запись уже вытеснена другим процессом; прочитанные массивы остаются в памяти
+            pass
+        return arrays
+
+    def _write(self, name, arrays):
+        self._write_file(name, lambda f: np.savez(f, **arrays))
+        self.evict()
+
+    def _data_name(self, key, params):
+        return f'{key}.{params_hash(data_params(params or {}))}.data.npz'
+
+    def load_data(self, key, params=None):
+        arrays = self._read(self._data_name(key, params))
+        if arrays is None:
+            return None
+        # Таблица — строки одного массива (столбцы, время) без копирования
+        return pd.DataFrame(arrays['frame'].T, columns=arrays['columns'].tolist(), copy=False)
+
+    def store_data(self, key, data, params=None):
+        self._write(self._data_name(key, params), {
+            'frame': np.ascontiguousarray(data.to_numpy(dtype=float).T),
+            'columns': np.array(list(data.columns))
+        })
+
+    def load_results(self, key, params):
+        arrays = self._read(f'{key}.{params_hash(params)}.results.npz')
+        if arrays is None:
+            return None
+        return build_results(arrays['time'], *(arrays[name] for name in RESULT_ARRAYS),
+                             Montage(arrays['montage'].tolist()), json.loads(str(arrays['stats'])))
+
+    def store_results(self, key, params, results):
+        channel_data = results['channel_data']
+        arrays = {name: np.asarray(channel_data[name]) for name in RESULT_ARRAYS}
+        arrays['time'] = np.asarray(results['time'])
+        arrays['montage'] = np.array(results['montage'].to_list())
+        arrays['stats'] = np.array(json.dumps(results.get('stats', {})))
+        self._write(f'{key}.{params_hash(params)}.results.npz', arrays)
+
+    def analyze(self, filename, processor, params, progress=None):
+        """Результаты ``process_data`` для файла: из кэша или с расчётом и сохранением.
+
+        Состояние ``processor`` (``data``, ``results``) выставляется так же,
+        как после обычного анализа, чтобы работало ``save_results``; хэш
+        содержимого файла возвращается в ``results['source_key']``.
+        ``progress(message)`` вызывается между этапами расчёта, как в
+        ``run_analysis``, и может прервать его исключением.
+        """
+        if progress is None:
+            progress = lambda message: None
+
+        key = self.file_key(filename)
+        # Монтаж — тот, с которым работает processor (по умолчанию из ANALYSIS_CONFIG)
+        params = dict(params, montage=processor.montage.to_list())
+
+        results = self.load_results(key, params)
+        data = self.load_data(key, params)
+        if results is not None and data is not None:
+            self.hits += 1
+            processor.data = data
+            processor.results = results
+            results['source_key'] = key
+            return results
+
+        self.misses += 1
+        if data is None:
+            data = processor.read_and_interpolate_data(filename, progress)
+            self.store_data(key, data, params)
+        progress("Обработка данных...")
+        results = processor.process_data(data)
+        self.store_results(key, params, results)
+        results['source_key'] = key
+        return results
+
+    def _entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith('.npz'):
+                continue
+            try:
+                stat = os.stat(self._path(name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = False
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                # Запись одновременно вытеснил другой процесс
+                pass
+            except OSError as e:
+                self.logger.warning(f"Не удалось удалить запись кэша {name}: {e}")
+                continue
+            total -= size
+            removed = True
+
+        if removed:
+            # Из индекса убираются файлы, у которых не осталось записей
+            keys = {name.split('.', 1)[0] for _, _, name in self._entries()}
+            self._save_index(keep=lambda entry: entry['hash'] in keys)
+
+    def clear(self):
+        for _, _, name in self._entries():
+            os.remove(self._path(name))
+        self._save_index(keep=lambda entry: False)
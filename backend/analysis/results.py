@@ -0,0 +1,61 @@
+import numpy as np
+
+
+# Словари результатов строятся без pandas: их собирают и процесс
+# интерфейса (результаты из процесса-исполнителя), и обработка реального времени
+RESULT_NAMES = ('Hb', 'HbO2', 'Saturation(%)', 'Total_Hb')
+
+
+def result_columns(montage):
+    """Столбцы файла результатов; для монтажа из одной пары — прежние имена."""
+    columns = ['Time(s)'] + montage.channel_names()
+    for suffix in montage.pair_suffixes():
+        columns += [name + suffix for name in RESULT_NAMES]
+    return columns
+
+
+def build_results(time, intensities, Hb, HbO2, saturation, montage, stats=None, total_Hb=None):
+    """Словарь результатов по массивам (каналы, время) и (пары, время).
+
+    Все каналы и пары — в ``channel_data``; плоские ряды ``intensity_<нм>``,
+    ``Hb``, ``HbO2``, ``saturation``, ``total_Hb`` — строки первой пары без
+    копирования (их используют графики, кэши и статистика).
+    """
+    if total_Hb is None:
+        total_Hb = HbO2 + Hb
+    results = {
+        'time': time,
+        'montage': montage,
+        'channel_data': {
+            'intensity': intensities,
+            'Hb': Hb,
+            'HbO2': HbO2,
+            'saturation': saturation,
+            'total_Hb': total_Hb
+        },
+        'Hb': Hb[0],
+        'HbO2': HbO2[0],
+        'saturation': saturation[0],
+        'total_Hb': total_Hb[0]
+    }
+    for wavelength in montage.wavelengths:
+        results[f'intensity_{wavelength}'] = intensities[montage.row(0, wavelength)]
+    if stats is not None:
+        results['stats'] = stats
+    return results
+
+
+def results_array(results):
+    """Все ряды результатов одним массивом (столбцы ``result_columns``, время)."""
+    channel_data = results['channel_data']
+    # (пары, 4, время) -> строки Hb, HbO2, сатурация, общий Hb пара за парой
+    per_pair = np.stack([channel_data[key] for key in ('Hb', 'HbO2', 'saturation', 'total_Hb')], axis=1)
+    return np.vstack([np.asarray(results['time'])[np.newaxis, :],
+                      channel_data['intensity'],
+                      per_pair.reshape(-1, per_pair.shape[-1])])
+
+
+def results_frame(results):
+    import pandas as pd
+
+    return pd.DataFrame(results_array(results).T, columns=result_columns(results['montage']), copy=False)
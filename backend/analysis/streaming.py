@@ -0,0 +1,139 @@
+import numpy as np
+
+from .filters import CausalFilter, estimate_sampling_rate
+from .hb_calculations import calculate_od, extinction_inverse, saturation_from_concentrations, solve_pairs
+from .montage import Montage
+from .results import build_results
+
+
+class _History:
+    """Окно последних значений фиксированной длины с амортизированным O(1) добавлением."""
+
+    def __init__(self, n_series, capacity):
+        self.n_series = n_series
+        self.capacity = capacity
+        self._data = np.empty((n_series, 2 * capacity))
+        self._start = 0
+        self._end = 0
+
+    def append(self, block):
+        n = block.shape[1]
+        if n >= self.capacity:
+            block = block[:, -self.capacity:]
+            n = self.capacity
+
+        if self._end + n > self._data.shape[1]:
+            # Новый массив вместо сдвига на месте: ранее выданные срезы остаются неизменными
+            keep = min(self._end - self._start, self.capacity - n)
+            data = np.empty_like(self._data)
+            data[:, :keep] = self._data[:, self._end - keep:self._end]
+            self._data = data
+            self._start = 0
+            self._end = keep
+
+        self._data[:, self._end:self._end + n] = block
+        self._end += n
+        self._start = max(self._start, self._end - self.capacity)
+
+    def view(self):
+        return self._data[:, self._start:self._end]
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        self._start = 0
+        self._end = 0
+
+
+class StreamingProcessor:
+    """Инкрементальная обработка данных реального времени.
+
+    Хранит базовую линию, состояние фильтров и историю результатов между
+    вызовами, поэтому стоимость одного вызова зависит только от числа новых отсчётов.
+    История — строки (время, каналы монтажа, Hb, HbO2, сатурация по парам).
+    Отсчёты потока не приводятся к сетке ``sampling_rate``, поэтому фильтр
+    проектируется на частоту ``sampling_rate`` аргумента или, по умолчанию,
+    оценённую по времени отсчётов базового окна.
+    """
+
+    def __init__(self, history_size=1000, baseline_window=20, config=None, montage=None, sampling_rate=None):
+        if config is None:
+            from config import ANALYSIS_CONFIG
+            config = ANALYSIS_CONFIG
+
+        self.config = config
+        self.montage = montage if montage is not None else Montage.from_config(config)
+        self.baseline_window = max(1, baseline_window)
+        self.history = _History(1 + self.montage.n_channels + 3 * self.montage.n_pairs, history_size)
+
+        self.sampling_rate = sampling_rate
+        self._inverse = extinction_inverse(config, self.montage.wavelengths)
+
+        self.reset()
+
+    def reset(self):
+        self.baseline = None
+        self.filter_rate = None
+        self._filter = None
+        self._pending = []
+        self.history.clear()
+
+    def _design_filter(self, time):
+        fs = self.sampling_rate
+        if fs is None:
+            fs = estimate_sampling_rate(time, default=self.config['sampling_rate'])
+        self.filter_rate = fs
+        try:
+            return CausalFilter.from_config(self.config, fs=fs)
+        except (ValueError, ImportError):
+            # Полоса вне диапазона частот потока или нет scipy: данные без фильтрации
+            return None
+
+    def process(self, time, *intensities):
+        """Новые отсчёты: ``process(time, intensities)`` с массивом (каналы, время)
+        или ``process(time, intensity_780, intensity_850)`` по каналам."""
+        block = np.vstack([np.asarray(time, dtype=float)] +
+                          [np.asarray(values, dtype=float) for values in intensities])
+        if block.shape[1] == 0:
+            return 0
+        if block.shape[0] != 1 + self.montage.n_channels:
+            raise ValueError(f"Ожидалось {self.montage.n_channels} каналов, получено {block.shape[0] - 1}")
+
+        if self.baseline is None:
+            self._pending.append(block)
+            pending = np.hstack(self._pending)
+            if pending.shape[1] < self.baseline_window:
+                return 0
+            self._pending = []
+            intensities = np.maximum(pending[1:, :self.baseline_window], 0.001)
+            self.baseline = intensities.mean(axis=1, keepdims=True)
+            self._filter = self._design_filter(pending[0])
+            block = pending
+
+        time = block[0]
+        intensity = block[1:]
+
+        OD = calculate_od(intensity, self.baseline, self.config)
+
+        Hb, HbO2 = solve_pairs(OD, self.montage.pair_rows, self._inverse)
+        saturation = saturation_from_concentrations(Hb, HbO2)
+
+        # Каузальный фильтр всех пар с переносом начальных условий между вызовами
+        filtered = np.vstack([Hb, HbO2, saturation])
+        if self._filter is not None:
+            filtered = self._filter.process(filtered)
+        n_pairs = self.montage.n_pairs
+        filtered[2 * n_pairs:] = np.clip(filtered[2 * n_pairs:], 0, 100)
+
+        self.history.append(np.vstack([time, intensity, filtered]))
+        return block.shape[1]
+
+    def get_data(self):
+        if len(self.history) == 0:
+            return None
+
+        view = self.history.view()
+        first = 1 + self.montage.n_channels
+        Hb, HbO2, saturation = np.split(view[first:], 3)
+        return build_results(view[0], view[1:first], Hb, HbO2, saturation, self.montage)
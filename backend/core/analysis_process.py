@@ -0,0 +1,295 @@
+import os
+import time
+import queue
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# Массивы результатов, которые передаются через разделяемую память
+SHARED_ARRAYS = ('time', 'intensity', 'Hb', 'HbO2', 'saturation', 'total_Hb')
+# Выравнивание массивов внутри блока разделяемой памяти (байт)
+ALIGNMENT = 64
+# Период проверки, жив ли процесс, при ожидании сообщений (с)
+POLL_TIMEOUT = 0.1
+# Модули, которые процесс-сервер загружает один раз для всех процессов анализа
+PRELOAD_MODULES = ['backend.analysis.data_processor', 'backend.analysis.result_cache']
+
+
+class AnalysisCancelled(Exception):
+    pass
+
+
+def run_analysis(filename, processor, cache=None, progress=None, params=None):
+    """Анализ файла: из кэша результатов или чтением и обработкой.
+
+    ``progress(message)`` вызывается перед каждым этапом и может прервать
+    анализ исключением (так работает отмена в процессе-исполнителе).
+    """
+    if progress is None:
+        progress = lambda message: None
+
+    progress("Чтение данных из файла...")
+    if cache is not None:
+        if params is None:
+            from config import ANALYSIS_CONFIG
+            params = ANALYSIS_CONFIG
+        return cache.analyze(filename, processor, params, progress)
+
+    data = processor.read_and_interpolate_data(filename, progress)
+
+    if data is None or len(data) == 0:
+        raise ValueError("Не удалось обработать данные из файла")
+
+    progress("Обработка данных...")
+
+    return processor.process_data(data)
+
+
+class _SharedBlock(shared_memory.SharedMemory):
+
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, BufferError):
+            pass
+
+
+# Подключённые блоки результатов: блок закрывается, когда на его память не
+# остаётся массивов (закрытие раньше оставило бы массивы без памяти)
+_attached = []
+
+
+def _close_unused():
+    for block in list(_attached):
+        try:
+            block.close()
+        except BufferError:
+            continue
+        _attached.remove(block)
+
+
+def share_results(results):
+    """Копирует массивы результатов в новый блок разделяемой памяти.
+
+    Возвращает (блок, описание): описание — имя блока, расположение
+    массивов, монтаж и статистика; оно маленькое и передаётся через очередь.
+    """
+    channel_data = results['channel_data']
+    arrays = {'time': np.asarray(results['time'], dtype=float)}
+    arrays.update({name: np.asarray(channel_data[name], dtype=float) for name in SHARED_ARRAYS[1:]})
+
+    layout = []
+    size = 0
+    for name in SHARED_ARRAYS:
+        array = arrays[name]
+        layout.append((name, array.dtype.str, array.shape, size))
+        size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    block = _SharedBlock(create=True, size=max(size, 1))
+    for (name, dtype, shape, offset) in layout:
+        np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)[...] = arrays[name]
+
+    description = {
+        'name': block.name,
+        'layout': layout,
+        'montage': results['montage'].to_list(),
+        'stats': results.get('stats', {}),
+        'source_key': results.get('source_key')
+    }
+    return block, description
+
+
+def attach_results(description):
+    """Результаты по описанию из ``share_results`` без копирования массивов.
+
+    Имя блока сразу удаляется из системы: память остаётся доступной через
+    массивы и освобождается при следующем подключении после того, как
+    массивы больше не нужны.
+    """
+    from backend.analysis.montage import Montage
+    from backend.analysis.results import build_results
+
+    _close_unused()
+    block = _SharedBlock(name=description['name'])
+    block.unlink()
+    _attached.append(block)
+
+    # Все массивы — представления одного буфера, который держит блок открытым
+    memory = np.frombuffer(block.buf, dtype=np.uint8)
+    arrays = {}
+    for name, dtype, shape, offset in description['layout']:
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        arrays[name] = memory[offset:offset + size].view(dtype).reshape(shape)
+
+    results = build_results(arrays['time'], arrays['intensity'], arrays['Hb'], arrays['HbO2'],
+                            arrays['saturation'], Montage(description['montage']), description['stats'],
+                            total_Hb=arrays['total_Hb'])
+    if description.get('source_key') is not None:
+        results['source_key'] = description['source_key']
+    return results
+
+
+def _discard_results(description):
+    try:
+        block = shared_memory.SharedMemory(name=description['name'])
+    except OSError:
+        return
+    block.close()
+    block.unlink()
+
+
+def _analysis_main(filename, analysis_config, file_config, messages, cancel_event):
+    # Точка входа процесса-исполнителя: настройки — снимок настроек родителя
+    import config
+
+    config.ANALYSIS_CONFIG.clear()
+    config.ANALYSIS_CONFIG.update(analysis_config)
+    config.FILE_CONFIG.clear()
+    config.FILE_CONFIG.update(file_config)
+
+    def progress(message):
+        if cancel_event.is_set():
+            raise AnalysisCancelled()
+        messages.put(('progress', message))
+
+    try:
+        from backend.analysis.data_processor import DataProcessor
+
+        cache = None
+        if file_config.get('analysis_cache', False):
+            from backend.analysis.result_cache import AnalysisCache
+            cache = AnalysisCache(file_config['analysis_cache_dir'], file_config['analysis_cache_max_bytes'])
+
+        results = run_analysis(filename, DataProcessor(), cache, progress, analysis_config)
+        if cancel_event.is_set():
+            raise AnalysisCancelled()
+        if 'source_key' not in results and config.UI_CONFIG.get('lod_cache', False):
+            # Ключ кэша графиков считается здесь, а не чтением файла в потоке интерфейса
+            from backend.analysis.result_cache import content_hash
+            results['source_key'] = content_hash(filename)
+
+        block, description = share_results(results)
+        messages.put(('finished', description))
+        # Блок остаётся в системе до unlink в родительском процессе
+        block.close()
+    except AnalysisCancelled:
+        messages.put(('cancelled', None))
+    except Exception as e:
+        messages.put(('error', str(e)))
+
+
+def _context():
+    # forkserver: процессы порождаются из чистого сервера с заранее загруженными
+    # pandas/scipy (безопасно при потоках Qt); spawn — там, где его нет (Windows)
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(PRELOAD_MODULES)
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class AnalysisProcess:
+    """Анализ файла в отдельном процессе.
+
+    Разбор файла, pandas и фильтрация не держат GIL процесса интерфейса, и
+    несколько анализов могут идти параллельно. Процесс шлёт в очередь
+    сообщения ``('progress', текст)``, затем одно из ``('finished', описание)``,
+    ``('error', текст)`` или ``('cancelled', None)``; массивы результатов
+    передаются через разделяемую память, а не копией через очередь.
+    ``poll()`` не блокирует и вызывается, например, по таймеру интерфейса.
+    Отмена — флаг, который процесс проверяет между этапами; если процесс не
+    завершился за ``timeout``, он завершается принудительно.
+    """
+
+    def __init__(self, filename):
+        from config import ANALYSIS_CONFIG, FILE_CONFIG
+
+        self.filename = os.path.abspath(filename)
+        file_config = dict(FILE_CONFIG)
+        file_config['analysis_cache_dir'] = os.path.abspath(file_config['analysis_cache_dir'])
+
+        context = _context()
+        self._messages = context.Queue()
+        self._cancel_event = context.Event()
+        self._process = context.Process(
+            target=_analysis_main,
+            args=(self.filename, dict(ANALYSIS_CONFIG), file_config, self._messages, self._cancel_event),
+            daemon=True
+        )
+        self.results = None
+        self.error = None
+        self.done = False
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        self._process.start()
+        return self
+
+    def is_running(self):
+        return not self.done
+
+    def poll(self):
+        """Новые сообщения процесса без ожидания: список (тип, значение); результаты уже подключены."""
+        return self._receive(block=False)
+
+    def wait(self, timeout=None):
+        """Ожидание итогового сообщения не дольше ``timeout`` секунд (для скриптов и тестов)."""
+        return self._receive(block=True, timeout=timeout)
+
+    def _receive(self, block, timeout=None):
+        events = []
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.done:
+            try:
+                kind, value = self._messages.get(block, POLL_TIMEOUT)
+            except queue.Empty:
+                if not self._process.is_alive() and self._messages.empty():
+                    # Процесс завершился без итогового сообщения (сбой, нехватка памяти)
+                    self._finish('error', f"Процесс анализа завершился с кодом {self._process.exitcode}", events)
+                if not block or (deadline is not None and time.monotonic() >= deadline):
+                    break
+                continue
+
+            self._handle(kind, value, events)
+        return events
+
+    def _handle(self, kind, value, events):
+        if kind == 'progress':
+            events.append((kind, value))
+        elif kind == 'finished':
+            self._finish(kind, attach_results(value), events)
+        else:
+            self._finish(kind, value, events)
+
+    def _finish(self, kind, value, events):
+        if kind == 'finished':
+            self.results = value
+        elif kind == 'error':
+            self.error = value
+        self.done = True
+        self._process.join()
+        events.append((kind, value))
+
+    def cancel(self, timeout=0.5):
+        if self.done:
+            return
+        self._cancel_event.set()
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+
+        # Результат мог быть отправлен до отмены: его блок памяти удаляется
+        while True:
+            try:
+                kind, value = self._messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'finished':
+                _discard_results(value)
+        self.done = True
+        self.logger.info(f"Анализ {self.filename} отменён")
@@ -1,24 +1,44 @@
 import logging
+import threading
 import time
-from typing import Optional, Dict, Any, Callable
+from typing import Optional, Dict, Any, Callable, List
 import numpy as np
 from PySide6.QtCore import QObject, Signal
 
-from backend.serial.serial_reader import SerialDataReader
-from backend.analysis.data_processor import DataProcessor
+from backend.serial.acquisition import AcquisitionCore
+from backend.serial.session_recorder import SessionRecorder, recover_sessions
+from backend.core import metrics
+from backend.core.realtime import LatestValue, RealtimeWorker, SampleBatcher, per_sample_adapter
 
 
 class FNIRSAnalyzer(QObject):
-    data_updated = Signal(dict)  # данные для обновления
+    data_updated = Signal(dict)  # пакет новых отсчётов (см. SampleBatcher)
     status_updated = Signal(str)  # статус
     error_occurred = Signal(str)  # ошибка
     
     def __init__(self):
         super().__init__()
-        self.serial_reader = None
-        self.data_processor = DataProcessor()
+        self.acquisition = None
+        self.serial_reader = None  # первое устройство
+        # pandas/scipy загружаются при первом анализе, а не при запуске приложения
+        self._data_processor = None
+        self.analysis_cache = None
         self.realtime_data = None
         self.is_realtime_mode = False
+        self.stream_processors = []
+        self.stream_positions = []
+        # Кадры для отрисовки: по почтовому ящику последнего значения на устройство
+        self.realtime_frames = []
+        self.realtime_worker = None
+        self.sample_batcher = None
+        self.session_recorders = []
+        # Устройства с новыми отсчётами с прошлого шага обработки
+        self._updated_devices = set()
+        self._updated_lock = threading.Lock()
+        
+        self._skipped_frames = metrics.counter('realtime.skipped_frames')
+        self._process_time = metrics.histogram('realtime.process')
+        self._frame_time = metrics.histogram('realtime.frame')
         
         self.data_update_callbacks = []
         self.status_update_callbacks = []
@@ -37,7 +57,22 @@ class FNIRSAnalyzer(QObject):
             self.logger.addHandler(handler)
             self.logger.setLevel(logging.INFO)
     
-    def add_data_update_callback(self, callback: Callable):
+    @property
+    def data_processor(self):
+        if self._data_processor is None:
+            from backend.analysis.data_processor import DataProcessor
+            
+            self._data_processor = DataProcessor()
+        return self._data_processor
+    
+    def add_data_update_callback(self, callback: Callable, per_sample: bool = False):
+        """Колбэк пакетов новых отсчётов ``{'device_id', 'time', 'pins', 'intensities'}``.
+        
+        С ``per_sample=True`` колбэк вызывается, как раньше, для каждого
+        отсчёта со словарём ``{'timestamp', 'pin', 'intensity'}``.
+        """
+        if per_sample:
+            callback = per_sample_adapter(callback)
         self.data_update_callbacks.append(callback)
     
     def add_status_update_callback(self, callback: Callable):
@@ -74,21 +109,70 @@ class FNIRSAnalyzer(QObject):
                 self.logger.error(f"Ошибка в колбэке ошибок: {e}")
     
     def start_realtime_analysis(self, port: str = '/dev/ttyUSB0', baudrate: int = 9600):
+        self.start_montage_analysis([{'port': port, 'baudrate': baudrate}])
+    
+    def start_montage_analysis(self, devices: List[Dict[str, Any]]):
         try:
             if self.is_realtime_mode:
                 self.logger.warning("Режим реального времени уже активен")
                 return
             
-            self.serial_reader = SerialDataReader(port, baudrate)
+            from config import SERIAL_CONFIG
+            from backend.analysis.streaming import StreamingProcessor
+            
+            self.acquisition = AcquisitionCore()
+            self.sample_batcher = SampleBatcher(
+                self._notify_data_update,
+                SERIAL_CONFIG.get('notify_interval', 0.02),
+                SERIAL_CONFIG.get('notify_max_samples')
+            )
+            for device in devices:
+                reader = self.acquisition.add_device(
+                    device['port'],
+                    device.get('baudrate', SERIAL_CONFIG['default_baudrate']),
+                    protocol=device.get('protocol', SERIAL_CONFIG.get('protocol', 'text')),
+                    buffer_size=SERIAL_CONFIG['buffer_size']
+                )
+                reader.add_error_callback(
+                    lambda error_message, reader=reader: self._on_device_error(reader, error_message)
+                )
+                reader.add_status_callback(self._on_serial_status)
+            # Отсчёты всех устройств приходят одним потоком пакетов с идентификаторами каналов
+            self.acquisition.add_batch_callback(self._on_acquisition_batch)
+            
+            readers = self.acquisition.devices
+            self.serial_reader = readers[0]
+            self.stream_processors = [StreamingProcessor(history_size=reader.buffer_size, montage=reader.montage)
+                                      for reader in readers]
+            self.stream_positions = [0] * len(readers)
+            self.realtime_frames = [LatestValue() for _ in readers]
+            self._updated_devices = set()
+            
+            self._start_session_recording()
             
-            self.serial_reader.add_data_callback(self._on_serial_data)
-            self.serial_reader.add_error_callback(self._on_serial_error)
-            self.serial_reader.add_status_callback(self._on_serial_status)
+            if AcquisitionCore.is_supported():
+                started = self.acquisition.start()
+            else:
+                # Без файловых дескрипторов портов (Windows) — отдельный поток на устройство
+                for reader in readers:
+                    reader.start()
+                started = any(reader.running for reader in readers)
+            
+            if not started:
+                self._stop_session_recording()
+                return
             
-            self.serial_reader.start()
             self.is_realtime_mode = True
             
-            self.logger.info(f"Запущен режим реального времени на порту {port}")
+            self.realtime_worker = RealtimeWorker(
+                self._process_realtime, SERIAL_CONFIG.get('processing_interval', 0.05)
+            )
+            self.realtime_worker.start()
+            self.sample_batcher.start()
+            self._register_queue_gauges()
+            
+            ports = ', '.join(reader.port for reader in readers)
+            self.logger.info(f"Запущен режим реального времени на портах {ports}")
             
         except Exception as e:
             error_msg = f"Ошибка при запуске режима реального времени: {str(e)}"
@@ -99,8 +183,23 @@ class FNIRSAnalyzer(QObject):
         if not self.is_realtime_mode:
             return
         
-        if self.serial_reader:
-            self.serial_reader.stop()
+        if self.realtime_worker:
+            self.realtime_worker.stop()
+            self.realtime_worker = None
+        
+        metrics.REGISTRY.remove_gauges('realtime.')
+        
+        if self.acquisition:
+            self.acquisition.stop()
+            for reader in self.acquisition.devices:
+                reader.stop()
+        
+        if self.sample_batcher:
+            # Остаток отсчётов после остановки чтения уходит последним пакетом
+            self.sample_batcher.stop()
+            self.sample_batcher = None
+        
+        self._stop_session_recording()
         
         self.is_realtime_mode = False
         self.realtime_data = None
@@ -108,72 +207,182 @@ class FNIRSAnalyzer(QObject):
         self._notify_status_update("Режим реального времени остановлен")
         self.logger.info("Режим реального времени остановлен")
     
-    def _on_serial_data(self, timestamp: float, pin: int, intensity: float):
-        self.logger.info(f"Получены данные: время={timestamp}, пин={pin}, интенсивность={intensity}")
+    def _start_session_recording(self):
+        from config import FILE_CONFIG
         
-        data = {
-            'timestamp': timestamp,
-            'pin': pin,
-            'intensity': intensity
-        }
-        self._notify_data_update(data)
+        if not FILE_CONFIG.get('session_recording', False):
+            return
+        
+        directory = FILE_CONFIG['default_save_dir']
+        prefix = FILE_CONFIG['session_prefix']
+        
+        for path in recover_sessions(directory, prefix):
+            self._notify_status_update(f"Восстановлена незавершенная сессия: {path}")
+            self.logger.info(f"Восстановлена незавершенная сессия: {path}")
+        
+        readers = self.acquisition.devices
+        for reader in readers:
+            device_prefix = prefix if len(readers) == 1 else f"{prefix}dev{reader.device_id}_"
+            recorder = SessionRecorder(
+                directory, device_prefix,
+                flush_interval=FILE_CONFIG['session_flush_interval'],
+                fsync_interval=FILE_CONFIG['session_fsync_interval']
+            )
+            recorder.start()
+            self.session_recorders.append(recorder)
+    
+    def _stop_session_recording(self):
+        for recorder in self.session_recorders:
+            try:
+                path = recorder.stop()
+                if path:
+                    self._notify_status_update(f"Сессия записана в {path}")
+            except OSError as e:
+                self._notify_error(f"Ошибка при завершении записи сессии: {str(e)}")
+        
+        self.session_recorders = []
     
-    def _on_serial_error(self, error_message: str):
+    def _on_acquisition_batch(self, batch: Dict[str, Any]):
+        # Общий вход отсчётов всех устройств (поток сбора данных): отсчёты
+        # распределяются по устройствам их каналов; отсчёты пинов вне монтажа
+        # остаются за устройством-источником
+        channels = batch['channels']
+        devices = self.acquisition.device_of(channels)
+        devices[channels < 0] = batch['device_id']
+        
+        for device_id in np.unique(devices).tolist():
+            selected = devices == device_id
+            if selected.all():
+                # Обычный случай — пакет одного устройства, без копирования
+                selected = slice(None)
+            time_values = batch['time'][selected]
+            pins = batch['pins'][selected]
+            intensities = batch['intensities'][selected]
+            
+            self.sample_batcher.add(device_id, time_values, pins, intensities, channels[selected])
+            if self.session_recorders:
+                self.session_recorders[device_id].record_batch(time_values, pins, intensities)
+            with self._updated_lock:
+                self._updated_devices.add(device_id)
+    
+    def _on_device_error(self, reader, error_message: str):
         self._notify_error(error_message)
-        self.stop_realtime_analysis()
+        if not self.is_realtime_mode:
+            return
+        
+        # Ошибка одного устройства останавливает только его; сессия — когда не осталось ни одного
+        reader.stop()
+        if not any(device.running for device in self.acquisition.devices):
+            self.stop_realtime_analysis()
     
     def _on_serial_status(self, status_message: str):
         self._notify_status_update(status_message)
     
-    def get_realtime_data(self) -> Optional[Dict[str, Any]]:
-        if not self.is_realtime_mode or not self.serial_reader:
-            return None
+    def _register_queue_gauges(self):
+        # Глубина очередей между этапами; вычисляется только при снимке метрик
+        registry = metrics.REGISTRY
+        batcher = self.sample_batcher
+        registry.gauge('realtime.pending_notifications', batcher.pending)
+        for device_id, reader in enumerate(self.acquisition.devices):
+            frames = self.realtime_frames[device_id]
+            registry.gauge(f'realtime.unread_frames.dev{device_id}',
+                           lambda reader=reader, device_id=device_id:
+                               reader.buffer.total - self.stream_positions[device_id])
+            registry.gauge(f'realtime.unpaired_samples.dev{device_id}',
+                           lambda reader=reader: len(reader._unpaired[0]))
+            registry.gauge(f'realtime.frames_dropped.dev{device_id}', lambda frames=frames: frames.dropped)
+        for device_id, recorder in enumerate(self.session_recorders):
+            registry.gauge(f'realtime.session_queue.dev{device_id}', lambda recorder=recorder: len(recorder.queue))
+    
+    def _process_realtime(self):
+        # Выполняется в потоке обработки: новые отсчёты каждого устройства
+        # обрабатываются и публикуются готовым к отрисовке кадром
+        with self._updated_lock:
+            updated, self._updated_devices = self._updated_devices, set()
         
-        raw_data = self.serial_reader.get_current_data()
-        if raw_data is None or len(raw_data['time']) < 1:
-            return None
+        for device_id in sorted(updated):
+            reader = self.acquisition.devices[device_id]
+            new_data = reader.get_new_data(self.stream_positions[device_id])
+            if new_data is None:
+                continue
+            
+            self.stream_positions[device_id] = new_data['next_index']
+            self._skipped_frames.add(new_data['skipped'])
+            stream_processor = self.stream_processors[device_id]
+            with self._process_time.time():
+                stream_processor.process(new_data['time'], new_data['intensities'])
+            
+            with self._frame_time.time():
+                processed_data = stream_processor.get_data()
+                if processed_data is None or len(processed_data['time']) < 5:
+                    continue
+                
+                if len(processed_data['time']) > 5:
+                    processed_data['stats'] = self._get_realtime_stats(processed_data)
+            
+            # Срезы истории обработчика не перезаписываются, кадр публикуется без копирования
+            self.realtime_frames[device_id].publish(processed_data)
+            if device_id == 0:
+                self.realtime_data = processed_data
+    
+    def get_realtime_frame(self, device_id: int = 0, since: int = 0):
+        """(версия, кадр) последнего кадра устройства, если он новее ``since``, иначе (since, None).
         
-        processed_data = self.data_processor.process_realtime_data(raw_data)
-        if processed_data is None:
+        Обработка идёт в отдельном потоке; кадры, которые не успели забрать,
+        заменяются более новыми, поэтому отстающая отрисовка получает сразу
+        последнее состояние, а не очередь устаревших кадров.
+        """
+        if not self.is_realtime_mode or device_id >= len(self.realtime_frames):
+            return since, None
+        return self.realtime_frames[device_id].take(since)
+    
+    def get_realtime_data(self, device_id: int = 0) -> Optional[Dict[str, Any]]:
+        if not self.is_realtime_mode or device_id >= len(self.realtime_frames):
             return None
-        
-        if len(processed_data['time']) > 5:
-            processed_data['stats'] = self._get_realtime_stats(processed_data)
-        
-        self.realtime_data = processed_data
-        return processed_data
+        return self.realtime_frames[device_id].peek()
     
     def _get_realtime_stats(self, data: Dict[str, Any]) -> Dict[str, str]:
         time_data = data['time']
-        intensity_780 = data['intensity_780']
-        intensity_850 = data['intensity_850']
         saturation = data['saturation']
         
         n_points = min(50, len(saturation))
         
-        return {
+        stats = {
             'recording_time': f"{time_data[-1]:.1f} с",
-            'data_points': str(len(time_data)),
-            'current_intensity_780': f"{intensity_780[-1]:.3f}",
-            'current_intensity_850': f"{intensity_850[-1]:.3f}",
+            'data_points': str(len(time_data))
+        }
+        for wavelength in data['montage'].wavelengths:
+            stats[f'current_intensity_{wavelength}'] = f"{data[f'intensity_{wavelength}'][-1]:.3f}"
+        stats.update({
             'current_saturation': f"{saturation[-1]:.1f}%",
             'mean_saturation': f"{np.mean(saturation[-n_points:]):.1f}%",
             'min_saturation': f"{np.min(saturation[-n_points:]):.1f}%",
             'max_saturation': f"{np.max(saturation[-n_points:]):.1f}%"
-        }
+        })
+        return stats
+    
+    def _get_analysis_cache(self):
+        from config import FILE_CONFIG
+        
+        if not FILE_CONFIG.get('analysis_cache', False):
+            return None
+        
+        if self.analysis_cache is None:
+            from backend.analysis.result_cache import AnalysisCache
+            
+            self.analysis_cache = AnalysisCache(FILE_CONFIG['analysis_cache_dir'],
+                                                FILE_CONFIG['analysis_cache_max_bytes'])
+        return self.analysis_cache
     
     def analyze_file(self, filename: str) -> Optional[Dict[str, Any]]:
         try:
-            self._notify_status_update("Чтение данных из файла...")
-            
-            data = self.data_processor.read_and_interpolate_data(filename)
-            
-            if data is None or len(data) == 0:
-                raise ValueError("Не удалось обработать данные из файла")
-            
-            self._notify_status_update("Обработка данных...")
+            from backend.core.analysis_process import run_analysis
             
-            results = self.data_processor.process_data(data)
+            cache = self._get_analysis_cache()
+            hits = cache.hits if cache is not None else 0
+            results = run_analysis(filename, self.data_processor, cache, self._notify_status_update)
+            if cache is not None and cache.hits > hits:
+                self.logger.info(f"Результаты анализа {filename} взяты из кэша")
             
             self._notify_status_update("Анализ завершен")
             self.logger.info(f"Успешно проанализирован файл {filename}")
@@ -186,6 +395,31 @@ class FNIRSAnalyzer(QObject):
             self.logger.error(error_msg)
             return None
     
+    def start_file_analysis(self, filename: str):
+        """Анализ файла в отдельном процессе; результат и ход — через ``AnalysisProcess.poll()``."""
+        from backend.core.analysis_process import AnalysisProcess
+        
+        return AnalysisProcess(filename).start()
+    
+    def analyze_file_chunked(self, filename: str, output_file: str) -> Optional[Dict[str, str]]:
+        try:
+            from backend.analysis.chunked import analyze_file_chunked
+            
+            self._notify_status_update("Потоковый анализ файла...")
+            
+            stats = analyze_file_chunked(filename, output_file)
+            
+            self._notify_status_update(f"Анализ завершен, результаты сохранены в {output_file}")
+            self.logger.info(f"Успешно проанализирован файл {filename} (по блокам)")
+            
+            return stats
+            
+        except Exception as e:
+            error_msg = f"Ошибка при анализе файла: {str(e)}"
+            self._notify_error(error_msg)
+            self.logger.error(error_msg)
+            return None
+    
     def save_realtime_data(self, filename: str = None) -> Optional[str]:
         if not self.realtime_data:
             self._notify_error("Нет данных для сохранения")
@@ -196,19 +430,9 @@ class FNIRSAnalyzer(QObject):
             filename = f"fnirs_realtime_{timestamp}.csv"
         
         try:
-            import pandas as pd
-            
-            save_data = pd.DataFrame({
-                'Time(s)': self.realtime_data['time'],
-                'Intensity_780': self.realtime_data['intensity_780'],
-                'Intensity_850': self.realtime_data['intensity_850'],
-                'Hb': self.realtime_data['Hb'],
-                'HbO2': self.realtime_data['HbO2'],
-                'Saturation(%)': self.realtime_data['saturation'],
-                'Total_Hb': self.realtime_data['total_Hb']
-            })
+            from backend.analysis.results import results_frame
             
-            save_data.to_csv(filename, index=False)
+            results_frame(self.realtime_data).to_csv(filename, index=False)
             
             self._notify_status_update(f"Данные сохранены в {filename}")
             self.logger.info(f"Данные сохранены в {filename}")
@@ -231,6 +455,22 @@ class FNIRSAnalyzer(QObject):
         if self.serial_reader:
             status['connected'] = self.serial_reader.is_connected()
             status['buffer_sizes'] = self.serial_reader.get_buffer_sizes()
+            status['link'] = self.serial_reader.get_link_stats()
+        
+        if self.acquisition and len(self.acquisition.devices) > 1:
+            status['devices'] = [
+                {
+                    'port': reader.port,
+                    'connected': reader.is_connected(),
+                    'channels': self.acquisition.channel_ids(reader.device_id),
+                    'buffer_size': len(reader.buffer)
+                }
+                for reader in self.acquisition.devices
+            ]
+        
+        if self.session_recorders:
+            status['session_files'] = [recorder.path for recorder in self.session_recorders]
+            status['session_samples'] = sum(recorder.samples_written for recorder in self.session_recorders)
         
         return status
 
@@ -0,0 +1,260 @@
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+
+
+# Границы корзин гистограмм задержек (с): 1-2-5 от 10 мкс до 10 с; последняя корзина — всё, что дольше
+LATENCY_BUCKETS = tuple(scale * step for scale in (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0) for step in (1, 2, 5)) + (10.0,)
+
+
+class _Cells:
+    """Ячейки значений по потокам: каждый поток пишет только в свою ячейку.
+
+    Запись не берёт блокировок и не теряет обновлений при одновременной
+    записи из нескольких потоков; чтение суммирует ячейки всех потоков.
+    Ячейки завершившихся потоков при чтении и при появлении нового потока
+    складываются в общий итог, так что короткие потоки не копят ячейки.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        # Блокировка только для списка ячеек: первая запись потока и чтение
+        self._lock = threading.Lock()
+        self._cells = []
+        self._retired = [0] * size
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = [0] * self._size
+            with self._lock:
+                self._prune()
+                self._cells.append((threading.current_thread(), cell))
+            return cell
+
+    def _prune(self):
+        # Завершившийся поток больше не пишет: его ячейку можно сложить без гонки
+        alive = []
+        for thread, cell in self._cells:
+            if thread.is_alive():
+                alive.append((thread, cell))
+            else:
+                for i, value in enumerate(cell):
+                    self._retired[i] += value
+        self._cells = alive
+
+    def totals(self):
+        with self._lock:
+            self._prune()
+            totals = list(self._retired)
+            for _, cell in self._cells:
+                for i, value in enumerate(cell):
+                    totals[i] += value
+        return totals
+
+    def reset(self):
+        with self._lock:
+            self._prune()
+            self._retired = [0] * self._size
+            for _, cell in self._cells:
+                cell[:] = [0] * self._size
+
+
+class Counter:
+
+    def __init__(self, name):
+        self.name = name
+        self._cells = _Cells(1)
+
+    def add(self, n=1):
+        self._cells.cell()[0] += n
+
+    @property
+    def value(self):
+        return self._cells.totals()[0]
+
+    def reset(self):
+        self._cells.reset()
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (по умолчанию — задержки в секундах).
+
+    Хранятся число наблюдений по корзинам и их сумма; квантили в снимке —
+    верхние границы корзин, в которые они попадают.
+    """
+
+    def __init__(self, name, bounds=LATENCY_BUCKETS):
+        self.name = name
+        self.bounds = tuple(bounds)
+        # Корзины, затем сумма наблюдений
+        self._cells = _Cells(len(self.bounds) + 2)
+
+    def observe(self, value):
+        cell = self._cells.cell()
+        cell[bisect.bisect_left(self.bounds, value)] += 1
+        cell[-1] += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self):
+        totals = self._cells.totals()
+        counts, total = totals[:-1], totals[-1]
+        count = sum(counts)
+        snapshot = {'count': count, 'sum': total, 'mean': total / count if count else 0.0}
+
+        edges = self.bounds + (float('inf'),)
+        for label, quantile in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+            rank = quantile * count
+            seen = 0
+            value = 0.0
+            for edge, bucket in zip(edges, counts):
+                seen += bucket
+                if bucket and seen >= rank:
+                    value = edge
+                    break
+            snapshot[label] = value
+
+        snapshot['buckets'] = [[edge, bucket] for edge, bucket in zip(edges, counts) if bucket]
+        return snapshot
+
+    def reset(self):
+        self._cells.reset()
+
+
+class MetricsRegistry:
+    """Метрики процесса: счётчики, гистограммы и показатели-функции.
+
+    Запись в счётчики и гистограммы не берёт блокировок и дешевле строки
+    журнала, поэтому метрики можно держать включёнными на горячем пути.
+    Показатели (``gauge``) — функции без аргументов, которые вычисляются
+    только при снимке, например глубина очередей. Блокировка нужна только
+    при создании метрики.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self.started = time.time()
+
+    def counter(self, name):
+        counter = self._counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(name, Counter(name))
+        return counter
+
+    def histogram(self, name, bounds=LATENCY_BUCKETS):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(name, bounds))
+        return histogram
+
+    def gauge(self, name, function):
+        with self._lock:
+            self._gauges[name] = function
+
+    def remove_gauges(self, prefix):
+        with self._lock:
+            for name in [name for name in self._gauges if name.startswith(prefix)]:
+                del self._gauges[name]
+
+    def snapshot(self):
+        gauges = {}
+        for name, function in sorted(dict(self._gauges).items()):
+            try:
+                gauges[name] = function()
+            except Exception as e:
+                gauges[name] = f'ошибка: {e}'
+
+        return {
+            'time': time.time(),
+            'uptime': time.time() - self.started,
+            'counters': {name: counter.value for name, counter in sorted(dict(self._counters).items())},
+            'gauges': gauges,
+            'histograms': {name: histogram.snapshot()
+                           for name, histogram in sorted(dict(self._histograms).items())}
+        }
+
+    def reset(self):
+        for metric in list(self._counters.values()) + list(self._histograms.values()):
+            metric.reset()
+        self.started = time.time()
+
+
+# Общий реестр процесса
+REGISTRY = MetricsRegistry()
+
+
+def counter(name):
+    return REGISTRY.counter(name)
+
+
+def histogram(name, bounds=LATENCY_BUCKETS):
+    return REGISTRY.histogram(name, bounds)
+
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+class MetricsDumper:
+    """Периодическая запись снимков метрик: строкой JSON в файл или в журнал.
+
+    К снимку добавляются скорости счётчиков (в секунду) с прошлой записи.
+    """
+
+    def __init__(self, interval=10.0, filename=None, registry=None):
+        from backend.core.realtime import RealtimeWorker
+
+        self.filename = filename
+        self.registry = registry if registry is not None else REGISTRY
+        self._previous = None
+        self._worker = RealtimeWorker(self.dump, interval, name='metrics-dump')
+
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.INFO)
+
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+            self.logger.addHandler(handler)
+
+    def dump(self):
+        snapshot = self.registry.snapshot()
+        previous = self._previous
+        if previous is not None:
+            elapsed = snapshot['time'] - previous['time']
+            snapshot['rates'] = {
+                name: (value - previous['counters'].get(name, 0)) / elapsed
+                for name, value in snapshot['counters'].items()
+            } if elapsed > 0 else {}
+        self._previous = snapshot
+
+        line = json.dumps(snapshot, ensure_ascii=False, default=str)
+        if self.filename:
+            with open(self.filename, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        else:
+            self.logger.info(f"Метрики: {line}")
+        return snapshot
+
+    def start(self):
+        self._worker.start()
+
+    def stop(self):
+        self._worker.stop()
@@ -0,0 +1,177 @@
+import time
+import threading
+import logging
+
+import numpy as np
+
+from backend.core import metrics
+
+
+class LatestValue:
+    """Почтовый ящик на одно значение: новое значение заменяет непрочитанное.
+
+    Читатель получает только последнее опубликованное значение и его номер
+    версии; если он не успевает, промежуточные значения пропускаются, а не
+    копятся в очереди, так что задержка отображения ограничена одним кадром.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = 0
+        self._taken = 0
+        self.dropped = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def publish(self, value):
+        with self._lock:
+            if self._version > self._taken:
+                self.dropped += 1
+            self._value = value
+            self._version += 1
+
+    def peek(self):
+        return self._value
+
+    def take(self, since=0):
+        """(версия, значение), если после ``since`` есть новое значение, иначе (since, None)."""
+        with self._lock:
+            if self._version == since:
+                return since, None
+            self._taken = self._version
+            return self._version, self._value
+
+    def clear(self):
+        with self._lock:
+            self._value = None
+            self._taken = self._version
+
+
+class RealtimeWorker:
+    """Поток обработки данных реального времени со своим периодом.
+
+    Каждые ``interval`` секунд вызывает ``step()`` — чтение новых отсчётов,
+    обработку и публикацию кадров в ``LatestValue``; интерфейс только
+    отрисовывает последний кадр. Ошибка одного шага пишется в журнал и не
+    останавливает поток.
+    """
+
+    def __init__(self, step, interval=0.05, name='realtime-processing'):
+        self.step = step
+        self.interval = interval
+        self.name = name
+        self.steps = 0
+        self.step_time = 0.0
+        self._step_times = metrics.histogram(f'worker.{name}')
+        self._thread = None
+        self._stop_event = threading.Event()
+
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+        # Остановка из самого шага (например, по ошибке порта) — без ожидания себя
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            started = time.perf_counter()
+            try:
+                self.step()
+            except Exception as e:
+                self.logger.error(f"Ошибка обработки данных реального времени: {e}")
+            self.step_time = time.perf_counter() - started
+            self._step_times.observe(self.step_time)
+            self.steps += 1
+
+            # Период отсчитывается от начала шага; долгий шаг не накапливает отставание
+            self._stop_event.wait(max(0.0, self.interval - self.step_time))
+
+
+class SampleBatcher:
+    """Объединение новых отсчётов в пакеты для уведомлений.
+
+    Отсчёты из потоков чтения копятся и передаются в ``callback(batch)`` не
+    чаще раза в ``interval`` секунд или сразу по набору ``max_samples``
+    отсчётов одного устройства. ``batch`` — словарь ``device_id``, ``time``,
+    ``channels`` (идентификаторы каналов сбора данных, -1 — без канала),
+    ``pins``, ``intensities`` (массивы в порядке поступления).
+    """
+
+    def __init__(self, callback, interval=0.02, max_samples=None):
+        self.callback = callback
+        self.max_samples = max_samples
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Пакеты уходят по порядку, даже если сброс идёт из нескольких потоков
+        self._flush_lock = threading.Lock()
+        self._worker = RealtimeWorker(self.flush, interval, name='sample-notifications')
+
+    def add(self, device_id, time_values, pins, intensities, channels=None):
+        if channels is None:
+            channels = np.full(len(time_values), -1)
+        with self._lock:
+            parts = self._pending.setdefault(device_id, [])
+            parts.append((time_values, channels, pins, intensities))
+            count = sum(len(part[0]) for part in parts)
+
+        if self.max_samples and count >= self.max_samples:
+            self.flush()
+
+    def pending(self):
+        with self._lock:
+            return sum(len(part[0]) for parts in self._pending.values() for part in parts)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            for device_id, parts in pending.items():
+                time_values, channels, pins, intensities = (np.concatenate(column) for column in zip(*parts))
+                self.callback({
+                    'device_id': device_id,
+                    'time': time_values,
+                    'channels': channels,
+                    'pins': pins,
+                    'intensities': intensities
+                })
+
+    def start(self):
+        self._worker.start()
+
+    def stop(self):
+        self._worker.stop()
+        self.flush()
+
+
+def per_sample_adapter(callback):
+    """Адаптер для колбэков, ожидающих по одному отсчёту.
+
+    Возвращает колбэк пакетов, который вызывает ``callback`` со словарём
+    ``timestamp``, ``pin``, ``intensity`` для каждого отсчёта пакета.
+    """
+    def adapter(batch):
+        for timestamp, pin, intensity in zip(batch['time'].tolist(), batch['pins'].tolist(),
+                                             batch['intensities'].tolist()):
+            callback({'timestamp': timestamp, 'pin': pin, 'intensity': intensity})
+    return adapter
@@ -0,0 +1,81 @@
+import os
+import re
+import sys
+import time
+import subprocess
+
+
+PROFILE_ENV = 'FNIRS_STARTUP_PROFILE'
+MARK_PREFIX = 'startup mark:'
+
+_IMPORT_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+# Отсчёт от первого импорта модуля (main.py импортирует его первым)
+_started = time.perf_counter()
+
+
+def enabled():
+    return os.environ.get(PROFILE_ENV) == '1'
+
+
+def mark(stage):
+    """Отметка этапа запуска; в режиме профилирования уходит в stderr для родительского процесса."""
+    if enabled():
+        print(f"{MARK_PREFIX} {stage} | {time.perf_counter() - _started:.6f}", file=sys.stderr, flush=True)
+
+
+def parse_importtime(lines):
+    """Разбор вывода ``python -X importtime``: (собственное время по пакетам, импорты верхнего уровня)."""
+    by_package = {}
+    top_level = []
+    for line in lines:
+        match = _IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        package = module.split('.')[0]
+        by_package[package] = by_package.get(package, 0) + int(self_us)
+        # Отступ 1 пробел — модуль, импортированный непосредственно приложением
+        if len(indent) <= 1:
+            top_level.append((module, int(cumulative_us)))
+    return by_package, top_level
+
+
+def run_profiled(script, argv, top=15):
+    """Запускает приложение заново с ``-X importtime`` и печатает разбивку времени запуска."""
+    env = dict(os.environ, **{PROFILE_ENV: '1'})
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', script] + list(argv),
+                             env=env, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - started
+
+    import_lines, marks = [], []
+    for line in process.stderr.splitlines():
+        if line.startswith('import time:'):
+            import_lines.append(line)
+        elif line.startswith(MARK_PREFIX):
+            stage, seconds = line[len(MARK_PREFIX):].rsplit('|', 1)
+            marks.append((stage.strip(), float(seconds)))
+        else:
+            print(line, file=sys.stderr)
+
+    by_package, top_level = parse_importtime(import_lines)
+    total = sum(by_package.values())
+
+    print(f"\n=== ПРОФИЛЬ ЗАПУСКА ===")
+    print(f"Время процесса: {wall:.3f} с, импорт модулей: {total / 1e6:.3f} с")
+
+    if marks:
+        print("\nЭтапы (от запуска main.py):")
+        for stage, seconds in marks:
+            print(f"  {stage:<32} {seconds:8.3f} с")
+
+    print(f"\nСобственное время импорта по пакетам (топ {top}):")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<32} {self_us / 1e6:8.3f} с  {100.0 * self_us / max(total, 1):5.1f}%")
+
+    print(f"\nИмпорты приложения верхнего уровня (с вложенными, топ {top}):")
+    for module, cumulative_us in sorted(top_level, key=lambda item: -item[1])[:top]:
+        print(f"  {module:<32} {cumulative_us / 1e6:8.3f} с")
+
+    return process.returncode
@@ -0,0 +1,176 @@
+import os
+import logging
+import selectors
+import threading
+
+import numpy as np
+import serial
+
+from .serial_reader import SerialDataReader
+
+
+class AcquisitionCore:
+    """Событийный сбор данных с нескольких последовательных портов в одном потоке.
+
+    Порты открываются в неблокирующем режиме и ожидаются через ``selectors``:
+    поток просыпается только когда есть данные (или по сигналу остановки),
+    без циклов опроса со ``sleep``. Каждое устройство — это ``SerialDataReader``
+    со своим буфером, декодером и монтажом; каналам устройства выделяются
+    идентификаторы подряд за каналами предыдущих устройств, и под ними его
+    отсчёты уходят в общие пакетные колбэки ``callback(batch)`` — словарь
+    ``device_id``, ``time``, ``channels`` (идентификаторы каналов; отсчёты пинов
+    вне монтажа получают -1), ``pins``, ``intensities``. Устройство канала
+    находится по идентификатору (``device_of``).
+    Требует порты с файловыми дескрипторами (Linux/macOS).
+    """
+
+    def __init__(self, read_size=65536):
+        self.read_size = read_size
+        self.devices = []
+        self.batch_callbacks = []
+        self.running = False
+
+        self._selector = None
+        self._thread = None
+        self._wakeup_read, self._wakeup_write = None, None
+        # Остановка из самого цикла: селектор закрывает цикл, когда завершится
+        self._close_on_exit = False
+
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def is_supported():
+        return os.name != 'nt'
+
+    def add_device(self, port, baudrate=9600, protocol='text', buffer_size=1000, montage=None):
+        if self.running:
+            raise RuntimeError("Нельзя добавить устройство во время сбора данных")
+
+        device_id = len(self.devices)
+        reader = SerialDataReader(port, baudrate, buffer_size=buffer_size, protocol=protocol, montage=montage)
+        reader.device_id = device_id
+        reader.channel_base = sum(device.montage.n_channels for device in self.devices)
+        reader.add_batch_callback(
+            lambda time_values, pins, intensities, reader=reader:
+                self._on_device_batch(reader, time_values, pins, intensities)
+        )
+        self.devices.append(reader)
+        return reader
+
+    def add_batch_callback(self, callback):
+        self.batch_callbacks.append(callback)
+
+    def channel_ids(self, device_id):
+        reader = self.devices[device_id]
+        names = reader.montage.channel_names()
+        return {name: reader.channel_base + row for row, name in enumerate(names)}
+
+    def device_of(self, channel_ids):
+        """Номера устройств по идентификаторам каналов (-1 для отсчётов вне монтажа)."""
+        channel_ids = np.asarray(channel_ids)
+        bases = np.array([reader.channel_base for reader in self.devices])
+        devices = np.searchsorted(bases, channel_ids, side='right') - 1
+        return np.where(channel_ids >= 0, devices, -1)
+
+    def _on_device_batch(self, reader, time_values, pins, intensities):
+        rows = reader.montage.rows(pins)
+        batch = {
+            'device_id': reader.device_id,
+            'time': time_values,
+            'channels': np.where(rows >= 0, reader.channel_base + rows, -1),
+            'pins': pins,
+            'intensities': intensities
+        }
+        for callback in self.batch_callbacks:
+            try:
+                callback(batch)
+            except Exception as e:
+                self.logger.error(f"Ошибка в колбэке пакета данных: {e}")
+
+    def start(self):
+        if self.running:
+            self.logger.warning("Сбор данных уже запущен")
+            return False
+
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_read, False)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ, None)
+
+        for reader in self.devices:
+            if not reader.open(timeout=0):
+                continue
+            self._selector.register(reader.serial_connection.fileno(), selectors.EVENT_READ, reader)
+            reader._notify_status_callbacks(f"Подключен к {reader.port}")
+
+        if len(self._selector.get_map()) == 1:
+            self._close_selector()
+            return False
+
+        self.running = True
+        self._thread = threading.Thread(target=self._event_loop, daemon=True)
+        self._thread.start()
+        self.logger.info(f"Запущен сбор данных с {len(self._selector.get_map()) - 1} устройств")
+        return True
+
+    def stop(self):
+        if self._thread is None:
+            return
+
+        self.running = False
+        os.write(self._wakeup_write, b'\0')
+        # Из колбэка ошибки устройства stop() вызывается в потоке цикла — без ожидания себя
+        in_loop = self._thread is threading.current_thread()
+        if not in_loop:
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+        for reader in self.devices:
+            reader.stop()
+
+        if in_loop:
+            self._close_on_exit = True
+        else:
+            self._close_selector()
+
+    def _close_selector(self):
+        self._selector.close()
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
+        self._selector = None
+
+    def _drop_device(self, reader, error_msg):
+        # Остальные устройства продолжают работу; подписчики ошибки уже видят устройство остановленным
+        try:
+            self._selector.unregister(reader.serial_connection.fileno())
+        except (KeyError, ValueError):
+            pass
+        reader.stop()
+        reader._notify_error_callbacks(error_msg)
+        self.logger.error(error_msg)
+
+    def _event_loop(self):
+        while self.running:
+            for key, _ in self._selector.select():
+                if not self.running:
+                    break
+                reader = key.data
+                if reader is None:
+                    os.read(self._wakeup_read, 4096)
+                    continue
+
+                try:
+                    chunk = reader.serial_connection.read(self.read_size)
+                    if chunk:
+                        reader.feed_bytes(chunk)
+                except serial.SerialException as e:
+                    self._drop_device(reader, f"Ошибка чтения данных ({reader.port}): {str(e)}")
+                except Exception as e:
+                    self._drop_device(reader, f"Неожиданная ошибка в цикле чтения ({reader.port}): {str(e)}")
+
+            if len(self._selector.get_map()) <= 1:
+                self.running = False
+
+        if self._close_on_exit:
+            self._close_on_exit = False
+            self._close_selector()
@@ -0,0 +1,153 @@
+import struct
+
+import numpy as np
+
+
+# Пакет (little-endian, 14 байт):
+#   sync     uint16  0x5AA5 (байты A5 5A)
+#   seq      uint16  счётчик пакетов
+#   time_us  uint32  micros() на устройстве
+#   raw_780  uint16  отсчёт АЦП, 780 нм
+#   raw_850  uint16  отсчёт АЦП, 850 нм
+#   checksum uint16  Fletcher-16 по байтам 2..11
+SYNC = b'\xa5\x5a'
+PACKET_SIZE = 14
+PAYLOAD_SLICE = slice(2, 12)
+PACKET_DTYPE = np.dtype([
+    ('sync', '<u2'),
+    ('seq', '<u2'),
+    ('time_us', '<u4'),
+    ('raw_780', '<u2'),
+    ('raw_850', '<u2'),
+    ('checksum', '<u2')
+])
+
+ADC_MAX = 1023.0
+ADC_REFERENCE = 5.0
+
+_PAYLOAD_LENGTH = PAYLOAD_SLICE.stop - PAYLOAD_SLICE.start
+# Вторая сумма Fletcher-16 для пакета фиксированной длины — взвешенная сумма байтов
+_FLETCHER_WEIGHTS = np.arange(_PAYLOAD_LENGTH, 0, -1, dtype=np.int64)
+
+
+def fletcher16(payloads):
+    payloads = np.asarray(payloads, dtype=np.int64).reshape(-1, _PAYLOAD_LENGTH)
+    sum1 = payloads.sum(axis=1) % 255
+    sum2 = (payloads @ _FLETCHER_WEIGHTS) % 255
+    return ((sum2 << 8) | sum1).astype(np.uint16)
+
+
+def encode_packet(seq, time_us, raw_780, raw_850):
+    body = struct.pack('<HIHH', seq & 0xFFFF, time_us & 0xFFFFFFFF, raw_780, raw_850)
+    checksum = int(fletcher16(np.frombuffer(body, dtype=np.uint8))[0])
+    return SYNC + body + struct.pack('<H', checksum)
+
+
+def encode_packets(seq, time_us, raw_780, raw_850):
+    packets = np.zeros(len(seq), dtype=PACKET_DTYPE)
+    packets['sync'] = 0x5AA5
+    packets['seq'] = np.asarray(seq, dtype=np.int64) & 0xFFFF
+    packets['time_us'] = np.asarray(time_us, dtype=np.int64) & 0xFFFFFFFF
+    packets['raw_780'] = raw_780
+    packets['raw_850'] = raw_850
+
+    frames = packets.view(np.uint8).reshape(-1, PACKET_SIZE)
+    packets['checksum'] = fletcher16(frames[:, PAYLOAD_SLICE])
+    return packets.tobytes()
+
+
+class BinaryFrameDecoder:
+    """Пакетное декодирование двоичного протокола фотометра.
+
+    Хранит недочитанный хвост, разворачивает переполнение micros() и
+    счётчика пакетов и считает пропущенные пакеты по разрывам ``seq``.
+    """
+
+    def __init__(self):
+        self.pending = b''
+        self.last_seq = None
+        self.last_time_us = None
+        self.time_offset = 0
+        self.packets = 0
+        self.dropped_packets = 0
+        self.checksum_errors = 0
+
+    def _packet_offsets(self, chars):
+        n = len(chars)
+        if n < PACKET_SIZE:
+            return np.array([], dtype=np.int64)
+
+        # Быстрый путь: поток выровнен и все пакеты корректны
+        n_aligned = n // PACKET_SIZE
+        aligned = chars[:n_aligned * PACKET_SIZE].reshape(n_aligned, PACKET_SIZE)
+        if (aligned[:, 0] == 0xA5).all() and (aligned[:, 1] == 0x5A).all():
+            packets = aligned.view(PACKET_DTYPE).ravel()
+            if (fletcher16(aligned[:, PAYLOAD_SLICE]) == packets['checksum']).all():
+                return np.arange(n_aligned, dtype=np.int64) * PACKET_SIZE
+
+        # Поиск синхрослова и проверка контрольных сумм всех кандидатов разом
+        candidates = np.flatnonzero((chars[:-1] == 0xA5) & (chars[1:] == 0x5A))
+        candidates = candidates[candidates + PACKET_SIZE <= n]
+        if len(candidates) == 0:
+            return candidates
+
+        frames = chars[candidates[:, np.newaxis] + np.arange(PACKET_SIZE)]
+        checksums = frames[:, 12].astype(np.uint16) | (frames[:, 13].astype(np.uint16) << 8)
+        valid = fletcher16(frames[:, PAYLOAD_SLICE]) == checksums
+        self.checksum_errors += int(np.count_nonzero(~valid))
+        offsets = candidates[valid]
+
+        if len(offsets) > 1 and (np.diff(offsets) < PACKET_SIZE).any():
+            selected = []
+            next_free = 0
+            for offset in offsets.tolist():
+                if offset >= next_free:
+                    selected.append(offset)
+                    next_free = offset + PACKET_SIZE
+            offsets = np.array(selected, dtype=np.int64)
+
+        return offsets
+
+    def decode(self, data):
+        """Возвращает (время в с, 780 нм в В, 850 нм в В, seq) для всех полных пакетов."""
+        buffer = self.pending + data
+        chars = np.frombuffer(buffer, dtype=np.uint8)
+        offsets = self._packet_offsets(chars)
+
+        if len(offsets) == 0:
+            self.pending = buffer[-(PACKET_SIZE - 1):]
+            return np.array([]), np.array([]), np.array([]), np.array([], dtype=np.int64)
+
+        end = int(offsets[-1]) + PACKET_SIZE
+        self.pending = buffer[max(end, len(buffer) - (PACKET_SIZE - 1)):]
+
+        frames = chars[offsets[:, np.newaxis] + np.arange(PACKET_SIZE)]
+        packets = np.ascontiguousarray(frames).view(PACKET_DTYPE).ravel()
+
+        seq = packets['seq'].astype(np.int64)
+        time_us = packets['time_us'].astype(np.int64)
+
+        previous_seq = seq[0] - 1 if self.last_seq is None else self.last_seq
+        seq_steps = np.diff(np.concatenate(([previous_seq], seq))) % 0x10000
+        self.dropped_packets += int(np.sum(np.maximum(seq_steps - 1, 0)))
+        self.last_seq = int(seq[-1])
+
+        # Разворот переполнения 32-битного счётчика микросекунд
+        previous_time = time_us[0] if self.last_time_us is None else self.last_time_us
+        wraps = np.cumsum(np.diff(np.concatenate(([previous_time], time_us))) < 0)
+        unwrapped = time_us + self.time_offset + wraps * 0x100000000
+        self.time_offset += int(wraps[-1]) * 0x100000000
+        self.last_time_us = int(time_us[-1])
+        self.packets += len(packets)
+
+        intensity_780 = packets['raw_780'] / ADC_MAX * ADC_REFERENCE
+        intensity_850 = packets['raw_850'] / ADC_MAX * ADC_REFERENCE
+
+        return unwrapped / 1e6, intensity_780, intensity_850, seq
+
+    def get_stats(self):
+        return {
+            'packets': self.packets,
+            'dropped_packets': self.dropped_packets,
+            'checksum_errors': self.checksum_errors
+        }
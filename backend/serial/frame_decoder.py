@@ -0,0 +1,87 @@
+import numpy as np
+
+
+MAX_PENDING_BYTES = 4096
+
+_ALLOWED_BYTES = np.zeros(256, dtype=bool)
+_ALLOWED_BYTES[np.frombuffer(b'0123456789.:\t \r\n', dtype=np.uint8)] = True
+_DIGIT_BYTES = np.zeros(256, dtype=bool)
+_DIGIT_BYTES[ord('0'):ord('9') + 1] = True
+_SEPARATOR_BYTES = np.zeros(256, dtype=bool)
+_SEPARATOR_BYTES[np.frombuffer(b':\t \r\n', dtype=np.uint8)] = True
+
+
+def _empty():
+    return np.array([]), np.array([], dtype=int), np.array([])
+
+
+def _decode_lines_slow(lines):
+    times, pins, intensities = [], [], []
+    for line in lines:
+        parts = line.replace(b':', b' ').split()
+        has_ms = b':' in line
+        if len(parts) != (4 if has_ms else 3):
+            continue
+        try:
+            values = [float(part) for part in parts]
+        except ValueError:
+            continue
+        if has_ms:
+            values = [values[0] + values[1] / 1000.0] + values[2:]
+        if values[1] != int(values[1]):
+            continue
+        times.append(values[0])
+        pins.append(int(values[1]))
+        intensities.append(values[2])
+    return np.array(times, dtype=float), np.array(pins, dtype=int), np.array(intensities, dtype=float)
+
+
+def decode_text_frames(data):
+    """Декодирование всех полных строк ``с:мс<TAB>пин<TAB>значение`` из буфера.
+
+    Возвращает (время, пин, интенсивность, остаток); остаток — начало
+    недочитанной строки, которое нужно передать в следующий вызов.
+    """
+    cut = data.rfind(b'\n') + 1
+    complete, remainder = data[:cut], data[cut:]
+    if len(remainder) > MAX_PENDING_BYTES:
+        remainder = b''
+
+    complete = complete.replace(b'\x00', b'')
+    if not complete:
+        return _empty() + (remainder,)
+
+    chars = np.frombuffer(complete, dtype=np.uint8)
+    line_ends = np.flatnonzero(chars == ord('\n'))
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+
+    separators = _SEPARATOR_BYTES[chars]
+    token_starts = ~separators
+    token_starts[1:] &= separators[:-1]
+
+    bad = np.add.reduceat(~_ALLOWED_BYTES[chars], line_starts, dtype=np.int32)
+    digits = np.add.reduceat(_DIGIT_BYTES[chars], line_starts, dtype=np.int32)
+    colons = np.add.reduceat(chars == ord(':'), line_starts, dtype=np.int32)
+    tokens = np.add.reduceat(token_starts, line_starts, dtype=np.int32)
+
+    # Заголовки, разделители и обрывки строк отбрасываются целиком
+    keep = (bad == 0) & (digits > 0) & (colons <= 1) & (tokens == 3 + colons)
+    if not keep.any():
+        return _empty() + (remainder,)
+
+    has_ms = colons[keep] > 0
+    kept = chars[np.repeat(keep, line_ends - line_starts + 1)].tobytes()
+
+    try:
+        values = np.array(kept.replace(b':', b' ').split()).astype(float)
+    except ValueError:
+        lines = [line for line, ok in zip(complete.split(b'\n'), keep) if ok]
+        return _decode_lines_slow(lines) + (remainder,)
+
+    offsets = np.concatenate(([0], np.cumsum(3 + has_ms)[:-1]))
+    time = np.where(has_ms, values[offsets] + values[offsets + 1] / 1000.0, values[offsets])
+    pin = values[offsets + 1 + has_ms]
+    intensity = values[offsets + 2 + has_ms]
+
+    valid = pin == np.round(pin)
+    return time[valid], pin[valid].astype(int), intensity[valid], remainder
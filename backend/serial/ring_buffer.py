@@ -0,0 +1,80 @@
+import time
+
+import numpy as np
+
+
+class RingBuffer:
+    """Кольцевой буфер фиксированной ёмкости для нескольких каналов.
+
+    Все каналы хранятся в одном массиве (каналы × ёмкость) с общим индексом
+    записи, поэтому строки всегда выровнены. Запись ведёт один поток; чтение
+    защищено счётчиком-последовательностью (seqlock): снимок повторяется,
+    если во время копирования шла запись, и никогда не бывает «рваным».
+    """
+
+    def __init__(self, n_channels, capacity, dtype=float):
+        self.n_channels = n_channels
+        self.capacity = capacity
+        self.data = np.zeros((n_channels, capacity), dtype=dtype)
+        self.total = 0
+        self._sequence = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def write(self, block):
+        block = np.asarray(block, dtype=self.data.dtype)
+        n = block.shape[1]
+        if n == 0:
+            return
+        if n > self.capacity:
+            block = block[:, -self.capacity:]
+
+        start = (self.total + n - block.shape[1]) % self.capacity
+        first = min(block.shape[1], self.capacity - start)
+
+        self._sequence += 1  # нечётное значение — идёт запись
+        self.data[:, start:start + first] = block[:, :first]
+        if first < block.shape[1]:
+            self.data[:, :block.shape[1] - first] = block[:, first:]
+        self.total += n
+        self._sequence += 1
+
+    def _copy_range(self, start_index, end_index):
+        n = end_index - start_index
+        out = np.empty((self.n_channels, n), dtype=self.data.dtype)
+        start = start_index % self.capacity
+        first = min(n, self.capacity - start)
+        out[:, :first] = self.data[:, start:start + first]
+        if first < n:
+            out[:, first:] = self.data[:, :n - first]
+        return out
+
+    def read_since(self, index=0, max_retries=100):
+        """Отсчёты с глобальным номером >= index: (массив, номер первого, номер следующего)."""
+        for _ in range(max_retries):
+            sequence = self._sequence
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            end_index = self.total
+            start_index = max(index, end_index - self.capacity)
+            if start_index >= end_index:
+                out = np.empty((self.n_channels, 0), dtype=self.data.dtype)
+            else:
+                out = self._copy_range(start_index, end_index)
+            if self._sequence == sequence:
+                return out, start_index, end_index
+            time.sleep(0)
+        raise RuntimeError("Не удалось получить согласованный снимок буфера")
+
+    def snapshot(self, last=None):
+        end_index = self.total
+        count = len(self) if last is None else min(last, len(self))
+        out, _, _ = self.read_since(end_index - count)
+        return out
+
+    def clear(self):
+        self._sequence += 1
+        self.total = 0
+        self._sequence += 1
@@ -1,27 +1,61 @@
 import serial
 import time
-from collections import deque
 import threading
 import logging
 import numpy as np
 
+from ..analysis.alignment import align_nearest
+from ..analysis.montage import Montage
+from ..core import metrics
+from .binary_protocol import BinaryFrameDecoder
+from .frame_decoder import decode_text_frames
+from .ring_buffer import RingBuffer
+
 
 class SerialDataReader:
     
-    def __init__(self, port='/dev/ttyUSB0', baudrate=9600, buffer_size=1000):
+    def __init__(self, port='/dev/ttyUSB0', baudrate=9600, buffer_size=1000, protocol='text', montage=None,
+                 alignment_tolerance=None, alignment_direction=None):
+        from config import SERIAL_CONFIG
+        
+        if protocol not in ('text', 'binary'):
+            raise ValueError(f"Неизвестный протокол: {protocol}")
+        
         self.port = port
         self.baudrate = baudrate
         self.buffer_size = buffer_size
+        self.protocol = protocol
+        self.binary_decoder = BinaryFrameDecoder() if protocol == 'binary' else None
         self.running = False
         self.serial_connection = None
         self.read_thread = None
         
-        self.time_buffer = deque(maxlen=buffer_size)
-        self.pin3_buffer = deque(maxlen=buffer_size)  # 780 нм
-        self.pin4_buffer = deque(maxlen=buffer_size)  # 850 нм
+        self.montage = montage if montage is not None else Montage.from_config()
+        
+        # Строки: время, затем каналы монтажа; один столбец — кадр из отсчёта
+        # каждого канала (по умолчанию 780 нм с пина 3 и 850 нм с пина 4)
+        self.buffer = RingBuffer(1 + self.montage.n_channels, buffer_size)
+        self._unpaired = (np.empty(0), np.empty(0, dtype=np.intp), np.empty(0))
+        # Последнее время отсчёта каждого канала: более поздние отсчёты не раньше него
+        self._latest_time = np.full(self.montage.n_channels, -np.inf)
+        self.alignment_tolerance = (SERIAL_CONFIG.get('alignment_tolerance', 0.25)
+                                    if alignment_tolerance is None else alignment_tolerance)
+        self.alignment_direction = (SERIAL_CONFIG.get('alignment_direction', 'forward')
+                                    if alignment_direction is None else alignment_direction)
+        self._pending_bytes = b''
         self.start_time = None
         
+        self._bytes_read = metrics.counter('serial.bytes_read')
+        self._lines_read = metrics.counter('serial.lines_read')
+        self._packets_read = metrics.counter('serial.packets_read')
+        self._parse_errors = metrics.counter('serial.parse_errors')
+        self._dropped_samples = metrics.counter('serial.dropped_samples')
+        self._samples = [metrics.counter(f'serial.samples.{port}.{name}') for name in self.montage.channel_names()]
+        self._decode_time = metrics.histogram('serial.decode')
+        self._store_time = metrics.histogram('serial.store')
+        
         self.data_callbacks = []
+        self.batch_callbacks = []
         self.error_callbacks = []
         self.status_callbacks = []
         
@@ -39,6 +73,9 @@ class SerialDataReader:
     def add_data_callback(self, callback):
         self.data_callbacks.append(callback)
     
+    def add_batch_callback(self, callback):
+        self.batch_callbacks.append(callback)
+    
     def add_error_callback(self, callback):
         self.error_callbacks.append(callback)
     
@@ -55,6 +92,13 @@ class SerialDataReader:
             except Exception as e:
                 self.logger.error(f"Ошибка в колбэке данных: {e}")
     
+    def _notify_batch_callbacks(self, time_values, pins, intensities):
+        for callback in self.batch_callbacks:
+            try:
+                callback(time_values, pins, intensities)
+            except Exception as e:
+                self.logger.error(f"Ошибка в колбэке пакета данных: {e}")
+    
     def _notify_error_callbacks(self, error_message):
         for callback in self.error_callbacks:
             try:
@@ -69,18 +113,12 @@ class SerialDataReader:
             except Exception as e:
                 self.logger.error(f"Ошибка в колбэке статуса: {e}")
     
-    def start(self):
-        print("SerialDataReader.start() вызван")
-        self.logger.info("Метод start() вызван")
-        if self.running:
-            self.logger.warning("Чтение данных уже запущено")
-            return
-        
+    def open(self, timeout=1):
         try:
             self.serial_connection = serial.Serial(
                 self.port, 
                 self.baudrate, 
-                timeout=1,
+                timeout=timeout,
                 bytesize=serial.EIGHTBITS,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE
@@ -88,13 +126,7 @@ class SerialDataReader:
             
             self.running = True
             self.start_time = time.time()
-            
-            self.read_thread = threading.Thread(target=self._read_loop)
-            self.read_thread.daemon = True
-            self.read_thread.start()
-            
-            self._notify_status_callbacks(f"Подключен к {self.port}")
-            self.logger.info(f"Запущено чтение данных с порта {self.port}")
+            return True
             
         except serial.SerialException as e:
             error_msg = f"Не удалось подключиться к {self.port}: {str(e)}"
@@ -104,13 +136,30 @@ class SerialDataReader:
             error_msg = f"Неожиданная ошибка при подключении: {str(e)}"
             self._notify_error_callbacks(error_msg)
             self.logger.error(error_msg)
+        return False
+    
+    def start(self):
+        if self.running:
+            self.logger.warning("Чтение данных уже запущено")
+            return
+        
+        if not self.open():
+            return
+        
+        self.read_thread = threading.Thread(target=self._read_loop)
+        self.read_thread.daemon = True
+        self.read_thread.start()
+        
+        self._notify_status_callbacks(f"Подключен к {self.port}")
+        self.logger.info(f"Запущено чтение данных с порта {self.port}")
     
     def stop(self):
         if not self.running:
             return
         
         self.running = False
-        if self.read_thread:
+        # Из колбэка ошибки stop() вызывается в потоке чтения — без ожидания себя
+        if self.read_thread and self.read_thread is not threading.current_thread():
             self.read_thread.join(timeout=2.0)
         
         if self.serial_connection and self.serial_connection.is_open:
@@ -122,14 +171,10 @@ class SerialDataReader:
     def _read_loop(self):
         while self.running:
             try:
-                self.logger.info(f"Цикл чтения: in_waiting = {self.serial_connection.in_waiting}")
-                if self.serial_connection.in_waiting > 0:
-                    line = self.serial_connection.readline().decode('utf-8', errors='ignore').strip()
-                    self.logger.info(f"Прочитана строка: '{line}'")
-                    if line:
-                        self._parse_data_line(line)
-                else:
-                    time.sleep(0.01)
+                # Блокирующее чтение всего доступного (с таймаутом порта) вместо опроса in_waiting
+                chunk = self.serial_connection.read(max(1, self.serial_connection.in_waiting))
+                if chunk:
+                    self.feed_bytes(chunk)
                     
             except serial.SerialException as e:
                 error_msg = f"Ошибка чтения данных: {str(e)}"
@@ -142,72 +187,215 @@ class SerialDataReader:
                 self.logger.error(error_msg)
                 break
     
+    def feed_bytes(self, chunk):
+        started = time.perf_counter()
+        self._bytes_read.add(len(chunk))
+        
+        frames = None
+        if self.binary_decoder is not None:
+            time_values, pins, intensities, frames = self._decode_binary(chunk)
+        else:
+            data = self._pending_bytes + chunk
+            time_values, pins, intensities, self._pending_bytes = decode_text_frames(data)
+            # Каждая полная строка даёт один отсчёт; остальные отброшены разбором
+            lines = data.count(b'\n')
+            self._lines_read.add(lines)
+            self._parse_errors.add(lines - len(time_values))
+        self._decode_time.observe(time.perf_counter() - started)
+        
+        if len(time_values) > 0:
+            self._store_samples(time_values, pins, intensities, frames)
+    
     def _parse_data_line(self, line):
-        self.logger.info(f"Получена строка данных: '{line}'")
+        time_values, pins, intensities, _ = decode_text_frames(line.encode('utf-8', errors='ignore') + b'\n')
+        self._lines_read.add(1)
+        if len(time_values) > 0:
+            self._store_samples(time_values, pins, intensities)
+        else:
+            self._parse_errors.add(1)
+    
+    def _decode_binary(self, chunk):
+        decoder = self.binary_decoder
+        before = (decoder.packets, decoder.checksum_errors, decoder.dropped_packets)
+        time_values, intensity_780, intensity_850, _ = decoder.decode(chunk)
+        self._packets_read.add(decoder.packets - before[0])
+        self._parse_errors.add(decoder.checksum_errors - before[1])
+        # Потерянный пакет — по отсчёту каждого из двух каналов
+        self._dropped_samples.add(2 * (decoder.dropped_packets - before[2]))
         
-        if 'Time(s:ms)' in line or 'Active Pin' in line or '---' in line or line.strip() == '':
-            self.logger.info("Игнорируем заголовок или разделитель")
-            return
-            
-        try:
-            parts = [part.strip() for part in line.split() if part.strip()]
-            self.logger.info(f"Разделенные части: {parts}")
+        # Пакет содержит оба канала: разворачиваем в общий вид (время, пин, интенсивность)
+        n = len(time_values)
+        pins = np.tile(np.array([3, 4]), n)
+        intensities = np.empty(2 * n)
+        intensities[0::2] = intensity_780
+        intensities[1::2] = intensity_850
+        
+        # Каналы пакета сняты в один момент: кадры готовы без сопоставления по времени,
+        # если монтаж состоит ровно из этих двух каналов
+        frames = None
+        rows = self.montage.rows(np.array([3, 4]))
+        if self.montage.n_channels == 2 and (rows >= 0).all():
+            frames = np.empty((3, n))
+            frames[0] = time_values
+            frames[1 + rows[0]] = intensity_780
+            frames[1 + rows[1]] = intensity_850
+        return np.repeat(time_values, 2), pins, intensities, frames
+    
+    def _pair_frames(self, pending_time, pending_rows):
+        """Кадры из ожидающих отсчётов (отсортированы по каналу, затем по времени).
+        
+        Отсчёту первого канала сопоставляется ближайший по времени отсчёт
+        каждого другого канала (``align_nearest``, каждый отсчёт — не больше
+        чем в одной паре). Кадр записывается, когда пару уже не изменят
+        будущие отсчёты: они не раньше последних полученных. Отсчёт без пары
+        отбрасывается, когда все каналы ушли от него дальше допуска.
+        Возвращает индексы отсчётов кадров (каналы, кадры), число
+        окончательных отсчётов первого канала и порог времени, до которого
+        неиспользованные отсчёты других каналов уже не найдут пару.
+        """
+        n_channels = self.montage.n_channels
+        tolerance = self.alignment_tolerance
+        latest = self._latest_time
+        
+        counts = np.bincount(pending_rows, minlength=n_channels)
+        bounds = np.cumsum(counts)
+        starts = bounds - counts
+        reference = pending_time[starts[0]:bounds[0]]
+        n_reference = len(reference)
+        
+        partners = np.zeros((n_channels, n_reference), dtype=np.intp)
+        partners[0] = starts[0] + np.arange(n_reference)
+        matched = np.ones(n_reference, dtype=bool)
+        final = np.ones(n_reference, dtype=bool)
+        for row in range(1, n_channels):
+            channel = pending_time[starts[row]:bounds[row]]
+            index_reference, index_channel, _ = align_nearest(
+                reference, channel, tolerance, self.alignment_direction, one_to_one=True)
+            partners[row, index_reference] = starts[row] + index_channel
+            partner_time = np.full(n_reference, np.nan)
+            partner_time[index_reference] = channel[index_channel]
+            distance = np.abs(partner_time - reference)
             
-            if len(parts) >= 3:
-                time_str = parts[0]
-                if ':' in time_str:
-                    time_parts = time_str.split(':')
-                    seconds = float(time_parts[0])
-                    milliseconds = float(time_parts[1])
-                    current_time = seconds + milliseconds / 1000.0
-                else:
-                    current_time = float(time_str)
-                
-                pin = int(parts[1])
-                intensity = float(parts[2])
-                
-                self.logger.info(f"Обработанные данные: время={current_time}, пин={pin}, интенсивность={intensity}")
-                
-                if pin == 3:  # 780 нм
-                    self.time_buffer.append(current_time)
-                    self.pin3_buffer.append(intensity)
-                    self.logger.info("Добавлены данные для 780 нм")
-                elif pin == 4:  # 850 нм
-                    self.pin4_buffer.append(intensity)
-                    self.logger.info("Добавлены данные для 850 нм")
-                
+            has_partner = np.zeros(n_reference, dtype=bool)
+            has_partner[index_reference] = True
+            matched &= has_partner
+            # Будущие отсчёты канала дальше найденного, будущие отсчёты первого
+            # канала не ближе к отсчёту пары
+            with np.errstate(invalid='ignore'):
+                final &= (latest[row] > reference + distance) & (latest[0] - partner_time >= distance)
+        
+        # Без пары: будущие отсчёты всех каналов уже дальше допуска
+        final |= reference <= latest.min() - tolerance
+        n_final = int(np.count_nonzero(np.logical_and.accumulate(final)))
+        frames = partners[:, np.flatnonzero(matched[:n_final])]
+        
+        waiting = reference[n_final] if n_final < n_reference else latest[0]
+        return frames, starts[0] + n_final, waiting - tolerance
+    
+    def _pair_samples(self, time_values, rows, intensities):
+        """Кадры (время, каналы) из новых отсчётов известных каналов и ожидающих пары.
+        
+        Возвращает кадры и число отсчётов, отброшенных без пары.
+        """
+        montage = self.montage
+        np.maximum.at(self._latest_time, rows, time_values)
+        
+        unpaired_time, unpaired_rows, unpaired_values = self._unpaired
+        pending_rows = np.concatenate([unpaired_rows, rows])
+        pending_time = np.concatenate([unpaired_time, time_values])
+        order = np.lexsort((pending_time, pending_rows))
+        pending_rows, pending_time = pending_rows[order], pending_time[order]
+        pending_values = np.concatenate([unpaired_values, intensities])[order]
+        
+        frames, reference_end, expired = self._pair_frames(pending_time, pending_rows)
+        
+        # Ждут пары: отсчёты первого канала после окончательных и отсчёты других
+        # каналов, не попавшие в кадры и ещё способные найти пару (не больше ёмкости буфера)
+        index = np.arange(len(pending_rows))
+        keep = np.where(pending_rows == 0, index >= reference_end, pending_time > expired)
+        keep[frames.ravel()] = False
+        counts = np.bincount(pending_rows, minlength=montage.n_channels)
+        keep &= index >= np.cumsum(counts)[pending_rows] - self.buffer_size
+        self._unpaired = (pending_time[keep], pending_rows[keep], pending_values[keep])
+        
+        unpaired = len(pending_rows) - frames.size - len(self._unpaired[0])
+        return np.vstack([pending_time[frames[0]], pending_values[frames]]), unpaired
+    
+    def _store_samples(self, time_values, pins, intensities, frames=None):
+        """Запись отсчётов (время, пин, интенсивность) в буфер кадров и уведомление подписчиков.
+        
+        ``frames`` — уже готовые кадры (время, каналы), если отсчёты не нужно
+        сопоставлять по времени (двоичный протокол).
+        """
+        started = time.perf_counter()
+        montage = self.montage
+        rows = montage.rows(pins)
+        known = rows >= 0
+        
+        if frames is None:
+            frames, unpaired = self._pair_samples(time_values[known], rows[known], intensities[known])
+        else:
+            unpaired = 0
+        if frames.shape[1] > 0:
+            self.buffer.write(frames)
+        
+        # Потери: отсчёты неизвестных пинов и отброшенные без пары
+        unknown = len(rows) - int(np.count_nonzero(known))
+        self._dropped_samples.add(unknown + unpaired)
+        for counter, count in zip(self._samples, np.bincount(rows[known], minlength=montage.n_channels).tolist()):
+            if count:
+                counter.add(count)
+        self._store_time.observe(time.perf_counter() - started)
+        
+        self._notify_batch_callbacks(time_values, pins, intensities)
+        
+        if self.data_callbacks:
+            for current_time, pin, intensity in zip(time_values.tolist(), pins.tolist(), intensities.tolist()):
                 self._notify_data_callbacks(current_time, pin, intensity)
-                
-        except (ValueError, IndexError) as e:
-            self.logger.debug(f"Некорректная строка данных: {line}")
+    
+    def _as_dict(self, frames):
+        # Все каналы (каналы, время) и прежние ряды intensity_<нм> первой пары
+        intensities = frames[1:]
+        data = {
+            'time': frames[0],
+            'intensities': intensities
+        }
+        for wavelength in self.montage.wavelengths:
+            data[f'intensity_{wavelength}'] = intensities[self.montage.row(0, wavelength)]
+        return data
     
     def get_current_data(self):
-        if len(self.time_buffer) == 0:
+        snapshot = self.buffer.snapshot()
+        if snapshot.shape[1] == 0:
             return None
-            
-        time_array = np.array(self.time_buffer)
-        pin3_array = np.array(self.pin3_buffer)
-        pin4_array = np.array(self.pin4_buffer)
         
-        min_len = min(len(time_array), len(pin3_array), len(pin4_array))
-        if min_len == 0:
+        return self._as_dict(snapshot)
+    
+    def get_new_data(self, since=0):
+        new_data, start, end = self.buffer.read_since(since)
+        if new_data.shape[1] == 0:
             return None
-            
-        return {
-            'time': time_array[-min_len:],
-            'intensity_780': pin3_array[-min_len:],
-            'intensity_850': pin4_array[-min_len:]
-        }
+        
+        data = self._as_dict(new_data)
+        # Отсчёты, вытесненные из буфера до чтения
+        data['skipped'] = start - since
+        data['next_index'] = end
+        return data
     
     def is_connected(self):
         return self.running and self.serial_connection and self.serial_connection.is_open
     
+    def get_link_stats(self):
+        if self.binary_decoder is None:
+            return {}
+        return self.binary_decoder.get_stats()
+    
     def get_buffer_sizes(self):
-        return {
-            'time': len(self.time_buffer),
-            'pin3': len(self.pin3_buffer),
-            'pin4': len(self.pin4_buffer)
-        }
+        size = len(self.buffer)
+        sizes = {'time': size}
+        for pin in self.montage.pins.tolist():
+            sizes[f'pin{pin}'] = size
+        return sizes
 
 
 def parse_time(time_str):
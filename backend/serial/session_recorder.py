@@ -0,0 +1,147 @@
+import os
+import glob
+import time
+import threading
+import logging
+from collections import deque
+
+import numpy as np
+
+
+PARTIAL_SUFFIX = '.part'
+
+
+class SessionRecorder:
+    """Запись всех отсчётов сессии в файл журнала только на дозапись.
+
+    Поток чтения лишь кладёт отсчёт в очередь; фоновый поток пачками пишет
+    их в файл ``*.log.part``, периодически вызывая fsync. При штатной
+    остановке файл переименовывается в ``*.log``, а незавершённые после
+    сбоя файлы восстанавливаются функцией ``recover_sessions``.
+    Формат строк ``время<TAB>пин<TAB>интенсивность`` читается ``read_and_interpolate_data``.
+    """
+
+    def __init__(self, directory='data', prefix='fnirs_session_', flush_interval=0.2, fsync_interval=1.0):
+        self.directory = directory
+        self.prefix = prefix
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+
+        self.queue = deque()
+        self.path = None
+        self.samples_written = 0
+        self._file = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._last_fsync = 0.0
+
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        if self._thread is not None:
+            return self.path
+
+        os.makedirs(self.directory, exist_ok=True)
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        self.path = os.path.join(self.directory, f"{self.prefix}{timestamp}.log{PARTIAL_SUFFIX}")
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write("Time(s)\tPin\tIntensity\n")
+        self._sync()
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+        self.logger.info(f"Запись сессии в {self.path}")
+        return self.path
+
+    def record(self, timestamp, pin, intensity):
+        # Вызывается из потока чтения: только добавление в очередь, без ввода-вывода
+        self.queue.append((timestamp, pin, intensity))
+
+    def record_batch(self, times, pins, intensities):
+        self.queue.extend(zip(np.asarray(times).tolist(), np.asarray(pins).tolist(),
+                              np.asarray(intensities).tolist()))
+
+    def stop(self):
+        if self._thread is None:
+            return None
+
+        self._stop_event.set()
+        self._thread.join(timeout=5.0)
+        self._thread = None
+
+        self._flush()
+        self._sync()
+        self._file.close()
+        self._file = None
+
+        final_path = self.path[:-len(PARTIAL_SUFFIX)]
+        os.replace(self.path, final_path)
+        self.path = final_path
+
+        self.logger.info(f"Сессия сохранена в {final_path} ({self.samples_written} отсчётов)")
+        return final_path
+
+    def is_recording(self):
+        return self._thread is not None
+
+    def _write_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self._flush()
+                if time.monotonic() - self._last_fsync >= self.fsync_interval:
+                    self._sync()
+            except OSError as e:
+                self.logger.error(f"Ошибка записи сессии: {e}")
+
+    def _flush(self):
+        lines = []
+        queue = self.queue
+        while True:
+            try:
+                timestamp, pin, intensity = queue.popleft()
+            except IndexError:
+                break
+            lines.append(f"{timestamp:.6f}\t{pin}\t{intensity:.6f}\n")
+
+        if lines:
+            self._file.write(''.join(lines))
+            self._file.flush()
+            self.samples_written += len(lines)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+
+
+def recover_sessions(directory='data', prefix='fnirs_session_'):
+    """Завершение файлов сессий, оставшихся после аварийного завершения.
+
+    Обрезает недописанную последнюю строку и переименовывает ``*.log.part`` в ``*.log``.
+    """
+    recovered = []
+    pattern = os.path.join(directory, f"{prefix}*.log{PARTIAL_SUFFIX}")
+
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            tail_start = max(0, size - 4096)
+            f.seek(tail_start)
+            tail = f.read()
+            last_newline = tail.rfind(b'\n')
+            if last_newline >= 0:
+                f.truncate(tail_start + last_newline + 1)
+            elif tail_start == 0:
+                f.truncate(0)
+            f.flush()
+            os.fsync(f.fileno())
+
+        final_path = path[:-len(PARTIAL_SUFFIX)]
+        os.replace(path, final_path)
+        recovered.append(final_path)
+
+    return recovered
@@ -0,0 +1,339 @@
+import os
+import tty
+import time
+import errno
+import logging
+import argparse
+import threading
+
+import numpy as np
+
+from backend.analysis.log_parser import read_log_file
+
+from .binary_protocol import ADC_MAX, ADC_REFERENCE, PACKET_SIZE, encode_packets
+
+
+class SyntheticSource:
+    """Синтетический сигнал фотометра: пульсовая волна, медленный гемодинамический дрейф и шум.
+
+    ``generate(start, count)`` возвращает циклы измерения с номерами
+    ``start .. start + count - 1``: (время в с, 780 нм в В, 850 нм в В).
+    """
+
+    def __init__(self, rate=100.0, level_780=2.0, level_850=2.4, pulse_rate=1.2,
+                 pulse_amplitude=0.02, drift_amplitude=0.05, drift_period=30.0,
+                 noise=0.005, seed=None):
+        self.rate = float(rate)
+        self.level_780 = level_780
+        self.level_850 = level_850
+        self.pulse_rate = pulse_rate
+        self.pulse_amplitude = pulse_amplitude
+        self.drift_amplitude = drift_amplitude
+        self.drift_period = drift_period
+        self.noise = noise
+        self._rng = np.random.default_rng(seed)
+
+    def generate(self, start, count):
+        time_values = np.arange(start, start + count) / self.rate
+        pulse = self.pulse_amplitude * np.sin(2 * np.pi * self.pulse_rate * time_values)
+        # Рост HbO2 сильнее ослабляет 850 нм, рост Hb — 780 нм
+        drift = self.drift_amplitude * np.sin(2 * np.pi * time_values / self.drift_period)
+
+        intensity_780 = self.level_780 * (1 - pulse + drift) + self.noise * self._rng.standard_normal(count)
+        intensity_850 = self.level_850 * (1 - pulse - drift) + self.noise * self._rng.standard_normal(count)
+
+        return (time_values,
+                np.clip(intensity_780, 0, ADC_REFERENCE),
+                np.clip(intensity_850, 0, ADC_REFERENCE))
+
+
+class ReplaySource:
+    """Воспроизведение записанного лога фотометра (формат как у ``read_log_file``).
+
+    Отсчёты 780 и 850 нм объединяются в пары по порядку, время отсчитывается
+    от начала записи. При ``loop=True`` запись повторяется по кругу со
+    сдвигом времени на длительность записи, иначе источник исчерпывается.
+    """
+
+    def __init__(self, filename, loop=True):
+        time_values, pins, intensities = read_log_file(filename)
+        time_780 = time_values[pins == 3]
+        intensity_780 = intensities[pins == 3]
+        intensity_850 = intensities[pins == 4]
+        n = min(len(time_780), len(intensity_850))
+        if n < 2:
+            raise ValueError(f"В файле {filename} недостаточно данных для воспроизведения")
+
+        self.loop = loop
+        self.time = time_780[:n] - time_780[0]
+        self.intensity_780 = intensity_780[:n]
+        self.intensity_850 = intensity_850[:n]
+
+        step = float(np.median(np.diff(self.time)))
+        if step <= 0:
+            step = 0.1
+        # Частота записи — частота воспроизведения по умолчанию
+        self.rate = 1.0 / step
+        self.period = self.time[-1] + step
+
+    def __len__(self):
+        return len(self.time)
+
+    def generate(self, start, count):
+        index = np.arange(start, start + count)
+        if not self.loop:
+            index = index[index < len(self)]
+
+        cycle, position = np.divmod(index, len(self))
+        return (self.time[position] + cycle * self.period,
+                self.intensity_780[position],
+                self.intensity_850[position])
+
+
+class VirtualPhotometer:
+    """Программный фотометр на псевдотерминале (pty) для нагрузочных тестов.
+
+    Берёт циклы измерения из источника (``SyntheticSource``, ``ReplaySource``
+    или любой объект с ``generate(start, count)``) и выдаёт их в текстовом или
+    двоичном протоколе с частотой ``rate`` циклов в секунду. ``port`` — путь
+    к ведомой стороне pty, его можно открыть через ``SerialDataReader`` или
+    ``AcquisitionCore`` как обычный порт.
+
+    Искажения канала: ``jitter`` — случайная задержка записи до указанного
+    числа секунд (пачки данных, как у USB-моста), ``drop_probability`` —
+    доля потерянных строк/пакетов, ``garbage_probability`` — доля строк/пакетов,
+    перед которыми вставляется 1..``max_garbage`` случайных байт. Если читатель
+    не успевает и буфер pty переполнен, лишние байты теряются, как при
+    переполнении UART без управления потоком (``overrun_bytes``).
+
+    ``render(count)`` формирует байты следующих ``count`` циклов без pty —
+    для подачи напрямую в ``SerialDataReader.feed_bytes``.
+    """
+
+    def __init__(self, source=None, rate=None, protocol='text', jitter=0.0,
+                 drop_probability=0.0, garbage_probability=0.0, max_garbage=16,
+                 tick=0.005, seed=None):
+        if protocol not in ('text', 'binary'):
+            raise ValueError(f"Неизвестный протокол: {protocol}")
+
+        self.source = source if source is not None else SyntheticSource(seed=seed)
+        self.rate = float(rate) if rate is not None else float(self.source.rate)
+        self.protocol = protocol
+        self.jitter = jitter
+        self.drop_probability = drop_probability
+        self.garbage_probability = garbage_probability
+        self.max_garbage = max_garbage
+        self.tick = tick
+
+        self.port = None
+        self.running = False
+        self._master_fd = None
+        self._slave_fd = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._rng = np.random.default_rng(seed)
+        self._position = 0
+
+        self.cycles = 0
+        self.frames = 0
+        self.dropped_frames = 0
+        self.garbage_bytes = 0
+        self.bytes_written = 0
+        self.overrun_bytes = 0
+
+        self.logger = logging.getLogger(__name__)
+
+    def _time_scale(self):
+        # Время источника пересчитывается под частоту выдачи
+        return self.source.rate / self.rate
+
+    def _render_text(self, time_values, intensity_780, intensity_850):
+        n = len(time_values)
+        half_period_ms = 500.0 / self.rate
+        # Как в прошивке: 780 и 850 нм — отдельные строки с собственным millis()
+        ms_total = np.empty(2 * n, dtype=np.int64)
+        ms_total[0::2] = np.round(time_values * 1000)
+        ms_total[1::2] = np.round(time_values * 1000 + half_period_ms)
+        seconds, milliseconds = np.divmod(ms_total, 1000)
+
+        pins = np.tile([3, 4], n)
+        intensities = np.empty(2 * n)
+        intensities[0::2] = intensity_780
+        intensities[1::2] = intensity_850
+
+        return [b'%d:%d\t\t%d\t\t%.3f\r\n' % line for line in
+                zip(seconds.tolist(), milliseconds.tolist(), pins.tolist(), intensities.tolist())]
+
+    def _render_binary(self, time_values, intensity_780, intensity_850):
+        n = len(time_values)
+        seq = np.arange(self._position - n, self._position)
+        raw_780 = np.clip(np.round(intensity_780 / ADC_REFERENCE * ADC_MAX), 0, ADC_MAX)
+        raw_850 = np.clip(np.round(intensity_850 / ADC_REFERENCE * ADC_MAX), 0, ADC_MAX)
+        packets = encode_packets(seq, np.round(time_values * 1e6).astype(np.int64),
+                                 raw_780.astype(np.uint16), raw_850.astype(np.uint16))
+        if not (self.drop_probability or self.garbage_probability):
+            return [packets]
+        return [packets[i:i + PACKET_SIZE] for i in range(0, len(packets), PACKET_SIZE)]
+
+    def _apply_faults(self, frames):
+        n = len(frames)
+        if n == 0 or not (self.drop_probability or self.garbage_probability):
+            return frames
+
+        keep = self._rng.random(n) >= self.drop_probability
+        garbage = self._rng.random(n) < self.garbage_probability
+        self.dropped_frames += int(n - np.count_nonzero(keep))
+
+        out = []
+        for frame, keep_frame, add_garbage in zip(frames, keep.tolist(), garbage.tolist()):
+            if add_garbage:
+                length = int(self._rng.integers(1, self.max_garbage + 1))
+                out.append(self._rng.integers(0, 256, length, dtype=np.uint8).tobytes())
+                self.garbage_bytes += length
+            if keep_frame:
+                out.append(frame)
+        return out
+
+    def render(self, count):
+        time_values, intensity_780, intensity_850 = self.source.generate(self._position, count)
+        n = len(time_values)
+        if n == 0:
+            return b''
+
+        self._position += n
+        self.cycles += n
+        time_values = time_values * self._time_scale()
+
+        if self.protocol == 'binary':
+            frames = self._render_binary(time_values, intensity_780, intensity_850)
+            self.frames += n
+        else:
+            frames = self._render_text(time_values, intensity_780, intensity_850)
+            self.frames += len(frames)
+
+        return b''.join(self._apply_faults(frames))
+
+    def open(self):
+        if self._master_fd is not None:
+            return self.port
+
+        self._master_fd, self._slave_fd = os.openpty()
+        # Без преобразований строк и эха: байты доходят до читателя как есть
+        tty.setraw(self._slave_fd)
+        os.set_blocking(self._master_fd, False)
+        # Ведомая сторона остаётся открытой, чтобы переподключение читателя не давало EIO
+        self.port = os.ttyname(self._slave_fd)
+        return self.port
+
+    def close(self):
+        self.stop()
+        for fd in (self._master_fd, self._slave_fd):
+            if fd is not None:
+                os.close(fd)
+        self._master_fd, self._slave_fd = None, None
+        self.port = None
+
+    def start(self):
+        if self.running:
+            self.logger.warning("Виртуальный фотометр уже запущен")
+            return self.port
+
+        self.open()
+        self.running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+        self.logger.info(f"Виртуальный фотометр на {self.port}: {self.rate:g} циклов/с, протокол {self.protocol}")
+        return self.port
+
+    def stop(self):
+        if self._thread is None:
+            return
+
+        self.running = False
+        self._stop_event.set()
+        self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def _write(self, data):
+        try:
+            written = os.write(self._master_fd, data)
+        except BlockingIOError:
+            written = 0
+        except OSError as e:
+            if e.errno != errno.EIO:
+                raise
+            written = 0
+
+        self.bytes_written += written
+        self.overrun_bytes += len(data) - written
+
+    def _write_loop(self):
+        start = time.monotonic()
+        emitted = 0
+
+        while self.running:
+            due = int((time.monotonic() - start) * self.rate) - emitted
+            if due > 0:
+                cycles = self.cycles
+                data = self.render(due)
+                if self.cycles == cycles:
+                    self.logger.info("Источник виртуального фотометра исчерпан")
+                    self.running = False
+                    break
+                emitted += due
+                if data:
+                    self._write(data)
+
+            delay = self.tick
+            if self.jitter:
+                delay += self._rng.uniform(0, self.jitter)
+            self._stop_event.wait(delay)
+
+    def get_stats(self):
+        return {
+            'cycles': self.cycles,
+            'frames': self.frames,
+            'dropped_frames': self.dropped_frames,
+            'garbage_bytes': self.garbage_bytes,
+            'bytes_written': self.bytes_written,
+            'overrun_bytes': self.overrun_bytes
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Виртуальный фотометр на псевдотерминале')
+    parser.add_argument('--replay', metavar='FILE', help='Воспроизвести записанный лог вместо синтетического сигнала')
+    parser.add_argument('--no-loop', action='store_true', help='Не повторять лог по кругу')
+    parser.add_argument('--rate', type=float, help='Частота циклов измерения, Гц (по умолчанию 100 или частота лога)')
+    parser.add_argument('--protocol', choices=['text', 'binary'], default='text')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Максимальная случайная задержка записи, с')
+    parser.add_argument('--drop', type=float, default=0.0, help='Доля потерянных строк/пакетов')
+    parser.add_argument('--garbage', type=float, default=0.0, help='Доля строк/пакетов с мусорными байтами')
+    parser.add_argument('--duration', type=float, help='Время работы, с (по умолчанию до Ctrl+C)')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    if args.replay:
+        source = ReplaySource(args.replay, loop=not args.no_loop)
+    else:
+        source = SyntheticSource(rate=args.rate or 100.0, seed=args.seed)
+
+    device = VirtualPhotometer(source, rate=args.rate, protocol=args.protocol, jitter=args.jitter,
+                               drop_probability=args.drop, garbage_probability=args.garbage,
+                               seed=args.seed)
+    print(f"Порт: {device.start()}", flush=True)
+
+    try:
+        deadline = None if args.duration is None else time.monotonic() + args.duration
+        while device.running and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        device.close()
+        print(device.get_stats())
+
+
+if __name__ == '__main__':
+    main()
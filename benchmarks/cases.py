@@ -0,0 +1,191 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from backend.analysis.data_processor import DataProcessor
+from backend.analysis.hb_calculations import calculate_hb_concentrations, calculate_saturation, filter_data
+from backend.analysis.log_parser import read_log_dataframe
+from backend.analysis.montage import Montage
+from backend.serial.serial_reader import SerialDataReader
+from backend.serial.virtual_device import SyntheticSource, VirtualPhotometer
+
+
+CASES = []
+
+
+def case(name, needs_gui=False):
+    """Регистрирует сценарий: ``setup(context, size)`` возвращает замеряемую функцию."""
+    def register(setup):
+        CASES.append({'name': name, 'setup': setup, 'needs_gui': needs_gui})
+        return setup
+    return register
+
+
+class BenchmarkContext:
+    """Общие входные данные сценариев, создаются один раз на размер.
+
+    Лог пишется во временный каталог в формате прошивки (синтетический
+    сигнал ``SyntheticSource`` с частотой 10 циклов/с), остальные стадии
+    получают результат предыдущей, как в ``DataProcessor``.
+    """
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.directory = tempfile.TemporaryDirectory(prefix='fnirs_bench_')
+        self._cache = {}
+
+    def close(self):
+        self.directory.cleanup()
+
+    def _cached(self, key, factory):
+        if key not in self._cache:
+            self._cache[key] = factory()
+        return self._cache[key]
+
+    def stream(self, size, protocol='text'):
+        def render():
+            device = VirtualPhotometer(SyntheticSource(rate=10.0, seed=self.seed), protocol=protocol)
+            return device.render(size)
+        return self._cached(('stream', size, protocol), render)
+
+    def log_file(self, size):
+        def write():
+            filename = os.path.join(self.directory.name, f'bench_{size}.log')
+            with open(filename, 'wb') as f:
+                f.write(self.stream(size))
+            return filename
+        return self._cached(('log_file', size), write)
+
+    def dataframe(self, size):
+        return self._cached(('dataframe', size), lambda: read_log_dataframe(self.log_file(size)))
+
+    def interpolated(self, size):
+        return self._cached(('interpolated', size), lambda: DataProcessor().interpolate_data(self.dataframe(size)))
+
+    def intensities(self, size):
+        data = self.interpolated(size)
+        return data['Intensity_780'].values, data['Intensity_850'].values
+
+    def concentrations(self, size):
+        def compute():
+            Hb, HbO2, _, _ = calculate_hb_concentrations(*self.intensities(size))
+            return Hb, HbO2
+        return self._cached(('concentrations', size), compute)
+
+    def results(self, size):
+        return self._cached(('results', size), lambda: DataProcessor().process_data(self.interpolated(size)))
+
+    def realtime(self, size):
+        def compute():
+            data = self.interpolated(size)
+            return {
+                'time': data['Time(s)'].values,
+                'intensity_780': data['Intensity_780'].values,
+                'intensity_850': data['Intensity_850'].values
+            }
+        return self._cached(('realtime', size), compute)
+
+
+@case('parse_log')
+def _parse_log(context, size):
+    filename = context.log_file(size)
+    return lambda: read_log_dataframe(filename)
+
+
+@case('interpolate')
+def _interpolate(context, size):
+    df = context.dataframe(size)
+    processor = DataProcessor()
+    return lambda: processor.interpolate_data(df)
+
+
+@case('read_and_interpolate_data')
+def _read_and_interpolate(context, size):
+    filename = context.log_file(size)
+    processor = DataProcessor()
+    return lambda: processor.read_and_interpolate_data(filename)
+
+
+@case('calculate_hb_concentrations')
+def _hb_concentrations(context, size):
+    intensity_780, intensity_850 = context.intensities(size)
+    return lambda: calculate_hb_concentrations(intensity_780, intensity_850)
+
+
+@case('calculate_saturation')
+def _saturation(context, size):
+    Hb, HbO2 = context.concentrations(size)
+    return lambda: calculate_saturation(Hb, HbO2)
+
+
+@case('filter_data')
+def _filter(context, size):
+    Hb, _ = context.concentrations(size)
+    return lambda: filter_data(Hb)
+
+
+@case('filter_data_multichannel')
+def _filter_multichannel(context, size):
+    Hb, HbO2 = context.concentrations(size)
+    channels = np.vstack([Hb, HbO2, Hb + HbO2])
+    return lambda: filter_data(channels)
+
+
+@case('process_data')
+def _process_data(context, size):
+    data = context.interpolated(size)
+    processor = DataProcessor()
+    return lambda: processor.process_data(data)
+
+
+@case('process_data_multichannel')
+def _process_data_multichannel(context, size):
+    # 16 пар источник-детектор по две длины волны: каналы пар — копии записи со сдвигом уровня
+    montage = Montage.build([(source, detector) for source in range(1, 5) for detector in range(1, 5)])
+    data = context.interpolated(size)
+    frame = np.vstack([data['Time(s)'].values] +
+                      [data[f'Intensity_{wavelength}'].values * (1 + 0.01 * pair)
+                       for pair in range(montage.n_pairs) for wavelength in montage.wavelengths])
+    channels = pd.DataFrame(frame.T, columns=['Time(s)'] + montage.channel_names(), copy=False)
+    processor = DataProcessor(montage)
+    return lambda: processor.process_data(channels)
+
+
+@case('process_realtime_data')
+def _process_realtime(context, size):
+    data = context.realtime(size)
+    processor = DataProcessor()
+    return lambda: processor.process_realtime_data(data)
+
+
+@case('serial_decode_text')
+def _serial_decode_text(context, size):
+    stream = context.stream(size, 'text')
+    return lambda: SerialDataReader('bench', buffer_size=size, protocol='text').feed_bytes(stream)
+
+
+@case('serial_decode_binary')
+def _serial_decode_binary(context, size):
+    stream = context.stream(size, 'binary')
+    return lambda: SerialDataReader('bench', buffer_size=size, protocol='binary').feed_bytes(stream)
+
+
+def _plot_canvas():
+    from frontend.widgets.plot_canvas import PlotCanvas
+    return PlotCanvas()
+
+
+@case('plot_results', needs_gui=True)
+def _plot_results(context, size):
+    canvas = _plot_canvas()
+    results = context.results(size)
+    return lambda: canvas.plot_results(results)
+
+
+@case('update_realtime_plot', needs_gui=True)
+def _update_realtime_plot(context, size):
+    canvas = _plot_canvas()
+    data = DataProcessor().process_realtime_data(context.realtime(size))
+    return lambda: canvas.update_realtime_plot(data)
@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+
+BENCHMARK_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCHMARK_DIR / 'baseline.json'
+DEFAULT_RESULTS_DIR = BENCHMARK_DIR / 'results'
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Разница меньше порога считается шумом измерения
+TIME_NOISE_FLOOR = 0.0005  # с
+MEMORY_NOISE_FLOOR = 64 * 1024  # байт
+
+
+def measure_time(func, repeat=5, max_time=10.0):
+    func()  # прогрев: кэши, ленивые импорты, первая отрисовка
+
+    times = []
+    started = time.perf_counter()
+    while len(times) < repeat:
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+        if time.perf_counter() - started > max_time:
+            break
+
+    return {
+        'median_s': statistics.median(times),
+        'min_s': min(times),
+        'mean_s': statistics.fmean(times),
+        'runs': len(times)
+    }
+
+
+def measure_memory(func):
+    """Пиковый объём памяти, выделенной за вызов (Python и NumPy через tracemalloc)."""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return max(0, peak - before)
+
+
+def _versions():
+    versions = {'python': platform.python_version()}
+    for module in ('numpy', 'scipy', 'pandas', 'matplotlib', 'PySide6'):
+        try:
+            versions[module] = __import__(module).__version__
+        except Exception:
+            versions[module] = None
+    return versions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _prepare_gui():
+    # Отрисовка без дисплея: Qt offscreen, matplotlib рендерит через Agg
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PySide6.QtWidgets import QApplication
+    except ImportError as e:
+        print(f"PySide6 недоступен, сценарии графиков пропущены: {e}")
+        return None
+    return QApplication.instance() or QApplication([])
+
+
+def run_benchmarks(sizes=None, only=None, repeat=5, max_time=10.0, memory=True, gui=True, seed=0):
+    from .cases import CASES, BenchmarkContext
+
+    cases = [c for c in CASES if not only or any(pattern in c['name'] for pattern in only)]
+    if gui and any(c['needs_gui'] for c in cases):
+        app = _prepare_gui()
+        gui = app is not None
+    if not gui:
+        cases = [c for c in cases if not c['needs_gui']]
+
+    context = BenchmarkContext(seed=seed)
+    results = []
+    try:
+        for size in sizes or DEFAULT_SIZES:
+            for bench_case in cases:
+                func = bench_case['setup'](context, size)
+                record = {'name': bench_case['name'], 'size': size}
+                record.update(measure_time(func, repeat=repeat, max_time=max_time))
+                record['peak_memory_bytes'] = measure_memory(func) if memory else None
+                record['throughput_per_s'] = size / record['median_s'] if record['median_s'] > 0 else None
+                results.append(record)
+                print(f"  {record['name']:<28} {size:>9}  {record['median_s'] * 1000:10.3f} мс", flush=True)
+    finally:
+        context.close()
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'versions': _versions(),
+            'repeat': repeat,
+            'seed': seed
+        },
+        'results': results
+    }
+
+
+def compare_results(baseline, current, threshold=0.25, memory_threshold=0.25):
+    """Сопоставляет прогоны по (сценарий, размер); регрессия — рост выше порога и шума."""
+    reference = {(r['name'], r['size']): r for r in baseline.get('results', [])}
+    rows = []
+
+    for record in current.get('results', []):
+        base = reference.get((record['name'], record['size']))
+        row = {'name': record['name'], 'size': record['size'],
+               'median_s': record['median_s'], 'peak_memory_bytes': record.get('peak_memory_bytes'),
+               'time_ratio': None, 'memory_ratio': None, 'regressions': []}
+
+        if base is not None:
+            row['time_ratio'] = record['median_s'] / base['median_s'] if base['median_s'] > 0 else None
+            if (record['median_s'] > base['median_s'] * (1 + threshold)
+                    and record['median_s'] - base['median_s'] > TIME_NOISE_FLOOR):
+                row['regressions'].append('time')
+
+            base_memory, memory = base.get('peak_memory_bytes'), record.get('peak_memory_bytes')
+            if base_memory and memory is not None:
+                row['memory_ratio'] = memory / base_memory
+                if memory > base_memory * (1 + memory_threshold) and memory - base_memory > MEMORY_NOISE_FLOOR:
+                    row['regressions'].append('memory')
+
+        rows.append(row)
+
+    return rows
+
+
+def print_report(rows):
+    print(f"\n{'Сценарий':<28} {'Размер':>9} {'Медиана, мс':>12} {'Пик, МБ':>9} {'Время':>8} {'Память':>8}")
+    for row in rows:
+        memory = row['peak_memory_bytes']
+        memory_text = f"{memory / 2**20:9.2f}" if memory is not None else f"{'—':>9}"
+        time_ratio = f"{row['time_ratio']:7.2f}x" if row['time_ratio'] is not None else f"{'—':>8}"
+        memory_ratio = f"{row['memory_ratio']:7.2f}x" if row['memory_ratio'] is not None else f"{'—':>8}"
+        flag = f"  РЕГРЕССИЯ ({', '.join(row['regressions'])})" if row['regressions'] else ''
+        print(f"{row['name']:<28} {row['size']:>9} {row['median_s'] * 1000:12.3f} {memory_text} "
+              f"{time_ratio} {memory_ratio}{flag}")
+
+
+def _load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save(data, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарки стадий обработки FNIRS')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Размеры входа (циклов измерения)')
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='Только сценарии, содержащие подстроку')
+    parser.add_argument('--repeat', type=int, default=5, help='Число замеров на сценарий')
+    parser.add_argument('--max-time', type=float, default=10.0, help='Ограничение времени замеров сценария, с')
+    parser.add_argument('--no-memory', action='store_true', help='Не измерять пиковую память')
+    parser.add_argument('--no-gui', action='store_true', help='Пропустить сценарии графиков')
+    parser.add_argument('--output', help='JSON с результатами (по умолчанию benchmarks/results/<время>.json)')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Базовый прогон для сравнения')
+    parser.add_argument('--save-baseline', action='store_true', help='Сохранить прогон как базовый')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Допустимый рост времени (доля)')
+    parser.add_argument('--memory-threshold', type=float, default=0.25, help='Допустимый рост памяти (доля)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                        help='Сравнить два сохранённых прогона без запуска')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        current = _load(args.compare[1])
+        rows = compare_results(_load(args.compare[0]), current, args.threshold, args.memory_threshold)
+    else:
+        current = run_benchmarks(sizes=args.sizes, only=args.only, repeat=args.repeat, max_time=args.max_time,
+                                 memory=not args.no_memory, gui=not args.no_gui)
+
+        output = args.output or DEFAULT_RESULTS_DIR / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        _save(current, output)
+        print(f"\nРезультаты сохранены в {output}")
+
+        baseline = _load(args.baseline) if os.path.exists(args.baseline) else {}
+        if not baseline:
+            print(f"Базовый прогон {args.baseline} не найден, сравнение пропущено")
+        rows = compare_results(baseline, current, args.threshold, args.memory_threshold)
+
+        if args.save_baseline:
+            _save(current, args.baseline)
+            print(f"Базовый прогон сохранён в {args.baseline}")
+
+    print_report(rows)
+
+    regressions = [row for row in rows if row['regressions']]
+    if regressions:
+        print(f"\nРегрессий: {len(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,12 +2,27 @@ SERIAL_CONFIG = {
     'default_port': '/dev/ttyUSB0',
     'default_baudrate': 9600,
     'timeout': 1,
-    'buffer_size': 1000
+    'buffer_size': 1000,
+    'processing_interval': 0.05,  # с, период потока обработки данных реального времени
+    'notify_interval': 0.02,  # с, не чаще одного пакета новых отсчётов (сигнал data_updated)
+    'notify_max_samples': None,  # отправлять пакет сразу по набору стольких отсчётов устройства
+    # Сопоставление отсчётов каналов в кадры: 850 нм приходит после 780 нм того же цикла
+    'alignment_tolerance': 0.25,  # макс. расхождение времени отсчётов одного кадра (с), не меньше сдвига 850 нм
+    'alignment_direction': 'forward',  # 'nearest', 'backward' или 'forward'
+    'protocol': 'text'  # 'text' — строки с:мс/пин/значение, 'binary' — пакеты с контрольной суммой
 }
 
 ANALYSIS_CONFIG = {
-    'cutoff_frequency': 0.5,
-    'sampling_rate': 10,
+    'cutoff_frequency': 0.5,  # верхняя частота среза фильтра (Гц)
+    'highpass_frequency': 0.01,  # нижняя частота среза для 'highpass' и 'bandpass' (Гц)
+    'filter_type': 'lowpass',  # 'lowpass', 'highpass' или 'bandpass'
+    'filter_order': 2,
+    'alignment_tolerance': 1.0,  # макс. расхождение времени каналов без общего диапазона (с)
+    'alignment_direction': 'nearest',  # 'nearest', 'backward' или 'forward'
+    'sampling_rate': 10,  # частота общей сетки, на которую приводятся каналы (Гц)
+    'resampling_method': 'linear',  # 'linear' или 'polyphase' (с фильтром против наложения спектров)
+    # Каналы: список (пин, источник, детектор, длина волны нм); None — пины 3 (780 нм) и 4 (850 нм)
+    'montage': None,
     'epsilon_hb_780': 0.15,
     'epsilon_hbo2_780': 0.08,
     'epsilon_hb_850': 0.06,
@@ -19,14 +34,22 @@ ANALYSIS_CONFIG = {
 UI_CONFIG = {
     'window_width': 1600,
     'window_height': 900,
-    'plot_update_interval': 500,  
+    'plot_update_interval': 40,  # мс, ~25 кадров/с
+    'lod_cache': True,  # кэш уровней детализации графиков в FILE_CONFIG['analysis_cache_dir'] (<хэш файла>.lod.npz)
     'autosave_enabled': True
 }
 
 FILE_CONFIG = {
     'supported_formats': ['.log', '.txt', '.csv'],
     'default_save_dir': 'data',
-    'autosave_prefix': 'fnirs_realtime_'
+    'autosave_prefix': 'fnirs_realtime_',
+    'session_recording': True,
+    'session_prefix': 'fnirs_session_',
+    'session_flush_interval': 0.2,  # период пакетной записи (с)
+    'session_fsync_interval': 1.0,  # период fsync (с)
+    'analysis_cache': True,  # кэш результатов анализа файлов
+    'analysis_cache_dir': '.fnirs_cache',
+    'analysis_cache_max_bytes': 512 * 1024 * 1024
 }
 
 LOGGING_CONFIG = {
@@ -34,3 +57,8 @@ LOGGING_CONFIG = {
     'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     'file': 'fnirs_analyzer.log'
 }
+
+METRICS_CONFIG = {
+    'dump_interval': None,  # с, период записи снимка метрик (None — не записывать)
+    'dump_file': None  # файл для строк JSON со снимками; None — в журнал
+}
@@ -2,24 +2,91 @@ const int analogInPin = A7;
 const int sensorPin1 = 3;
 const int sensorPin2 = 4;
 
-float intensity = 0;   
+// Протокол: false — текстовые строки "с:мс\t\tпин\t\tзначение",
+// true — двоичные пакеты (см. backend/serial/binary_protocol.py)
+const bool BINARY_PROTOCOL = false;
+
+const unsigned long TEXT_BAUDRATE = 9600;
+const unsigned long BINARY_BAUDRATE = 115200;
+const unsigned long TEXT_DELAY_MS = 300;
+const unsigned long BINARY_PERIOD_US = 10000;  // 100 Гц на длину волны
+const unsigned int SETTLE_US = 200;  // установление после переключения светодиода
+
+float intensity = 0;
 int sensorState = 0;
 unsigned long startTime = 0;
 
+uint16_t packetSeq = 0;
+unsigned long nextPacketUs = 0;
+
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(BINARY_PROTOCOL ? BINARY_BAUDRATE : TEXT_BAUDRATE);
   pinMode(sensorPin1, OUTPUT);
   pinMode(sensorPin2, OUTPUT);
   startTime = millis();
-  
+  nextPacketUs = micros();
 }
 
-void loop() {
+int readWavelength(int activePin) {
+  digitalWrite(sensorPin1, LOW);
+  digitalWrite(sensorPin2, LOW);
+  digitalWrite(activePin, HIGH);
+  delayMicroseconds(SETTLE_US);
+  int value = analogRead(analogInPin);
+  digitalWrite(activePin, LOW);
+  return value;
+}
+
+void putU16(uint8_t *buf, int offset, uint16_t value) {
+  buf[offset] = value & 0xFF;
+  buf[offset + 1] = (value >> 8) & 0xFF;
+}
+
+void putU32(uint8_t *buf, int offset, uint32_t value) {
+  for (int i = 0; i < 4; i++) {
+    buf[offset + i] = (value >> (8 * i)) & 0xFF;
+  }
+}
+
+void sendBinaryPacket() {
+  uint8_t packet[14];
+  unsigned long timestamp = micros();
+
+  uint16_t raw780 = readWavelength(sensorPin1);
+  uint16_t raw850 = readWavelength(sensorPin2);
+
+  packet[0] = 0xA5;
+  packet[1] = 0x5A;
+  putU16(packet, 2, packetSeq++);
+  putU32(packet, 4, timestamp);
+  putU16(packet, 8, raw780);
+  putU16(packet, 10, raw850);
+
+  // Fletcher-16 по байтам 2..11
+  uint16_t sum1 = 0;
+  uint16_t sum2 = 0;
+  for (int i = 2; i < 12; i++) {
+    sum1 = (sum1 + packet[i]) % 255;
+    sum2 = (sum2 + sum1) % 255;
+  }
+  putU16(packet, 12, (sum2 << 8) | sum1);
+
+  Serial.write(packet, sizeof(packet));
+}
+
+void loopBinary() {
+  while ((long)(micros() - nextPacketUs) < 0) {
+  }
+  nextPacketUs += BINARY_PERIOD_US;
+  sendBinaryPacket();
+}
+
+void loopText() {
   digitalWrite(sensorPin1, LOW);
   digitalWrite(sensorPin2, LOW);
-  
+
   int activePin = 0;
-  
+
   if (sensorState == 0) {
     digitalWrite(sensorPin1, HIGH);
     activePin = sensorPin1;
@@ -29,15 +96,15 @@ void loop() {
     activePin = sensorPin2;
     sensorState = 0;
   }
-  
+
   intensity = analogRead(analogInPin);
   intensity = (intensity / 1023.0) * 5.0;
-  
+
   // Вывод времени в формате с:мс
   unsigned long currentTime = millis() - startTime;
   unsigned long seconds = currentTime / 1000;
   unsigned long milliseconds = currentTime % 1000;
-  
+
   Serial.print(seconds);
   Serial.print(":");
   Serial.print(milliseconds);
@@ -45,6 +112,14 @@ void loop() {
   Serial.print(activePin);
   Serial.print("\t\t");
   Serial.println(intensity, 3);
-  
-  delay(300);
+
+  delay(TEXT_DELAY_MS);
+}
+
+void loop() {
+  if (BINARY_PROTOCOL) {
+    loopBinary();
+  } else {
+    loopText();
+  }
 }
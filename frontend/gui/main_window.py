@@ -1,44 +1,72 @@
 import sys
 import os
+import time
 from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout,
                                QWidget, QPushButton, QFileDialog, QLabel, QTextEdit,
                                QProgressBar, QSplitter, QGroupBox, QComboBox, QSpinBox,
                                QCheckBox, QMessageBox, QTabWidget)
-from PySide6.QtCore import Qt, QTimer, QThread, Signal
+from PySide6.QtCore import Qt, QObject, QTimer, Signal
 from PySide6.QtGui import QFont, QIcon
 
 # Добавляем путь к модулям проекта
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 
+from backend.core import metrics
 from backend.core.fnirs_analyzer import FNIRSAnalyzer
-from frontend.widgets.plot_canvas import PlotWidget
+from backend.core.startup import enabled as startup_profile_enabled, mark
+from config import UI_CONFIG
 
 
-class AnalysisWorker(QThread):
+class AnalysisWorker(QObject):
+    """Анализ файла в процессе-исполнителе с опросом его сообщений по таймеру.
+
+    Расчёт не занимает поток интерфейса; сигналы те же, что у прежнего
+    потока анализа, а ``cancel()`` останавливает процесс без ``terminate()`` потока.
+    """
 
     finished = Signal(object) 
     error = Signal(str)      
     progress = Signal(str)  
     
+    POLL_INTERVAL = 50  # мс
+    
     def __init__(self, analyzer, filename):
         super().__init__()
         self.analyzer = analyzer
         self.filename = filename
+        self.process = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll)
     
-    def run(self):
+    def start(self):
         try:
-            self.progress.emit("Чтение данных из файла...")
-            results = self.analyzer.analyze_file(self.filename)
-            
-            if results is None:
-                self.error.emit("Не удалось проанализировать данные")
-                return
-            
-            self.progress.emit("Анализ завершен")
-            self.finished.emit(results)
-            
+            self.process = self.analyzer.start_file_analysis(self.filename)
         except Exception as e:
-            self.error.emit(f"Ошибка при анализе: {str(e)}")
+            self.error.emit(f"Ошибка при запуске анализа: {str(e)}")
+            return
+        self.progress.emit("Запуск анализа...")
+        self.timer.start(self.POLL_INTERVAL)
+    
+    def isRunning(self):
+        return self.process is not None and self.process.is_running()
+    
+    def poll(self):
+        for kind, value in self.process.poll():
+            if kind == 'progress':
+                self.progress.emit(value)
+            elif kind == 'finished':
+                self.progress.emit("Анализ завершен")
+                self.finished.emit(value)
+            elif kind == 'error':
+                self.error.emit(f"Ошибка при анализе: {value}")
+        
+        if not self.process.is_running():
+            self.timer.stop()
+    
+    def cancel(self):
+        self.timer.stop()
+        if self.process is not None:
+            self.process.cancel()
 
 
 class FNIRSMainWindow(QMainWindow):
@@ -49,12 +77,14 @@ class FNIRSMainWindow(QMainWindow):
         self.current_file = None
         self.analysis_worker = None
         self.realtime_timer = None
+        self.realtime_version = 0
+        self.plot_frame_time = metrics.histogram('ui.plot_frame')
         self.is_realtime_mode = False
+        self._first_paint_done = False
         
 
         self.init_ui()
         
-        self.analyzer.data_updated.connect(self.on_analyzer_data_update)
         self.analyzer.status_updated.connect(self.on_analyzer_status_update)
         self.analyzer.error_occurred.connect(self.on_analyzer_error)
     
@@ -186,27 +216,79 @@ class FNIRSMainWindow(QMainWindow):
         
         self.tab_widget = QTabWidget()
         
-        self.plot_widget = PlotWidget()
-        self.tab_widget.addTab(self.plot_widget, "Графики")
-        
-        self.results_widget = self.create_results_widget()
-        self.tab_widget.addTab(self.results_widget, "Результаты")
-        
-        self.logs_widget = self.create_logs_widget()
-        self.tab_widget.addTab(self.logs_widget, "Логи")
+        # Вкладки создаются при первом показе или первом обращении к их виджетам;
+        # графики (matplotlib) — сразу после первой отрисовки окна
+        self._tab_builders = [
+            ('plots', "Графики", self.create_plot_widget),
+            ('results', "Результаты", self.create_results_widget),
+            ('logs', "Логи", self.create_logs_widget)
+        ]
+        self._tab_pages = {}
+        self._tab_widgets = {}
+        for name, title, _ in self._tab_builders:
+            page = QWidget()
+            page_layout = QVBoxLayout(page)
+            page_layout.setContentsMargins(0, 0, 0, 0)
+            self._tab_pages[name] = page
+            self.tab_widget.addTab(page, title)
+        self.tab_widget.currentChanged.connect(self._on_tab_changed)
         
         layout.addWidget(self.tab_widget)
         
         return panel
     
+    def _ensure_tab(self, name):
+        if name not in self._tab_widgets:
+            builder = next(builder for tab_name, _, builder in self._tab_builders if tab_name == name)
+            widget = builder()
+            self._tab_pages[name].layout().addWidget(widget)
+            self._tab_widgets[name] = widget
+        return self._tab_widgets[name]
+    
+    def _on_tab_changed(self, index):
+        if index >= 0:
+            self._ensure_tab(self._tab_builders[index][0])
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._first_paint_done:
+            self._first_paint_done = True
+            mark('первая отрисовка окна')
+            QTimer.singleShot(0, self._build_current_tab)
+    
+    def _build_current_tab(self):
+        self._on_tab_changed(self.tab_widget.currentIndex())
+        mark('видимая вкладка готова')
+        if startup_profile_enabled():
+            QApplication.instance().quit()
+    
+    @property
+    def plot_widget(self):
+        return self._ensure_tab('plots')
+    
+    @property
+    def results_text(self):
+        self._ensure_tab('results')
+        return self._results_text
+    
+    @property
+    def logs_text(self):
+        self._ensure_tab('logs')
+        return self._logs_text
+    
+    def create_plot_widget(self):
+        from frontend.widgets.plot_canvas import PlotWidget
+        
+        return PlotWidget()
+    
     def create_results_widget(self):
         widget = QWidget()
         layout = QVBoxLayout(widget)
         
-        self.results_text = QTextEdit()
-        self.results_text.setReadOnly(True)
-        self.results_text.setFont(QFont("Courier", 10))
-        layout.addWidget(self.results_text)
+        self._results_text = QTextEdit()
+        self._results_text.setReadOnly(True)
+        self._results_text.setFont(QFont("Courier", 10))
+        layout.addWidget(self._results_text)
         
         return widget
     
@@ -214,10 +296,10 @@ class FNIRSMainWindow(QMainWindow):
         widget = QWidget()
         layout = QVBoxLayout(widget)
         
-        self.logs_text = QTextEdit()
-        self.logs_text.setReadOnly(True)
-        self.logs_text.setFont(QFont("Courier", 9))
-        layout.addWidget(self.logs_text)
+        self._logs_text = QTextEdit()
+        self._logs_text.setReadOnly(True)
+        self._logs_text.setFont(QFont("Courier", 9))
+        layout.addWidget(self._logs_text)
         
         return widget
     
@@ -286,6 +368,7 @@ class FNIRSMainWindow(QMainWindow):
 Диапазон времени: {stats.get('time_range', 'N/A')}
 Длительность записи: {stats.get('duration', 'N/A')}
 Количество точек данных: {stats.get('data_points', 'N/A')}
+Каналов: {stats.get('channels', 'N/A')}
 
 Интенсивности:
 780 нм: {stats.get('intensity_780_range', 'N/A')}
@@ -303,7 +386,8 @@ class FNIRSMainWindow(QMainWindow):
         
         self.analyzer.start_realtime_analysis(port, baudrate)
         
-        self.realtime_timer.start(500)  
+        self.realtime_version = 0
+        self.realtime_timer.start(UI_CONFIG['plot_update_interval'])
         
         self.start_realtime_button.setEnabled(False)
         self.stop_realtime_button.setEnabled(True)
@@ -330,14 +414,17 @@ class FNIRSMainWindow(QMainWindow):
         self.add_log("Режим реального времени остановлен")
     
     def update_realtime_display(self):
-        data = self.analyzer.get_realtime_data()
+        # Обработка идёт в потоке анализатора; здесь только отрисовка последнего кадра
+        self.realtime_version, data = self.analyzer.get_realtime_frame(since=self.realtime_version)
         if data:
+            started = time.perf_counter()
             self.plot_widget.update_realtime_plot(data)
             
             stats = data.get('stats', {})
             if stats:
                 stats_text = self.format_realtime_stats(stats)
                 self.results_text.setText(stats_text)
+            self.plot_frame_time.observe(time.perf_counter() - started)
     
     def format_realtime_stats(self, stats):
         """Форматирование статистики реального времени"""
@@ -376,10 +463,6 @@ class FNIRSMainWindow(QMainWindow):
             else:
                 QMessageBox.warning(self, "Ошибка", "Не удалось сохранить график")
     
-    def on_analyzer_data_update(self, data):
-        print(f"Получены данные для обновления графиков: {data}")
-        
-   
     def on_analyzer_status_update(self, status):
         self.status_label.setText(status)
     
@@ -397,8 +480,7 @@ class FNIRSMainWindow(QMainWindow):
             self.stop_realtime_collection()
         
         if self.analysis_worker and self.analysis_worker.isRunning():
-            self.analysis_worker.terminate()
-            self.analysis_worker.wait()
+            self.analysis_worker.cancel()
         
         event.accept()
 
@@ -412,6 +494,7 @@ def main():
     app.setStyle('Fusion')
     
     window = FNIRSMainWindow()
+    mark('окно создано')
     window.show()
     
     sys.exit(app.exec())
@@ -1,9 +1,31 @@
 import numpy as np
 from PySide6.QtWidgets import QWidget, QVBoxLayout
-from PySide6.QtCore import Qt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
+from matplotlib import style as mpl_style
+
+from backend.analysis.lod import LODPyramid, load_or_build
+
+
+# Минимальное число корзин прореживания на ось (на случай ещё не размещённого холста)
+MIN_DECIMATION_BUCKETS = 200
+# Точек на графике интенсивности в реальном времени
+REALTIME_WINDOW = 50
+# Запас пределов осей в реальном времени, доля диапазона данных
+TIME_HEADROOM = 0.5
+LIMIT_HEADROOM = 0.25
+
+
+_style_applied = False
+
+
+def _apply_style():
+    # Стиль меняет глобальные rcParams: достаточно применить один раз, без импорта pyplot
+    global _style_applied
+    if not _style_applied:
+        mpl_style.use('seaborn-v0_8-whitegrid')
+        _style_applied = True
 
 
 class PlotCanvas(FigureCanvas):
@@ -13,11 +35,23 @@ class PlotCanvas(FigureCanvas):
         super().__init__(self.fig)
         self.setParent(parent)
         
-        plt.style.use('seaborn-v0_8-whitegrid')
+        _apply_style()
         
         self.axes = self.fig.subplots(2, 2)
         self.fig.tight_layout(pad=3.0)
         
+        # Режим реального времени: линии создаются один раз и обновляются через set_data,
+        # кадр — восстановление закэшированного фона и перерисовка только линий (blitting)
+        self._realtime_lines = None
+        self._realtime_axes = []
+        self._background = None
+        self._saving = False
+        # Анализ файла: ряды хранятся в пирамиде детализации, на оси — прореженные по ширине в пикселях
+        self._pyramid = None
+        self._offline_series = []
+        self.mpl_connect('draw_event', self._on_draw)
+        self.mpl_connect('resize_event', self._on_resize)
+        
         self._init_empty_plots()
     
     def _init_empty_plots(self):
@@ -48,49 +82,75 @@ class PlotCanvas(FigureCanvas):
         
         self.draw()
     
-    def plot_results(self, results):
-        time = results['time']
-        intensity_780 = results['intensity_780']
-        intensity_850 = results['intensity_850']
-        Hb = results['Hb']
-        HbO2 = results['HbO2']
-        saturation = results['saturation']
+    def _on_resize(self, event):
+        # Компоновка пересчитывается только при изменении размера холста
+        self.fig.tight_layout(pad=3.0)
+        self._redecimate()
+    
+    def _on_draw(self, event):
+        if self._saving:
+            return
+        if self._realtime_lines is None:
+            self._background = None
+            return
+        
+        # Полная перерисовка: фон без анимированных линий кэшируется, линии дорисовываются сверху
+        self._background = self.copy_from_bbox(self.fig.bbox)
+        self._draw_realtime_lines()
+    
+    def _draw_realtime_lines(self):
+        for ax, lines, _ in self._realtime_axes:
+            for line in lines:
+                ax.draw_artist(line)
+    
+    def _reset_realtime(self):
+        self._realtime_lines = None
+        self._realtime_axes = []
+        self._background = None
+    
+    def _decimation_buckets(self, ax, scale=1.0):
+        return max(int(ax.bbox.width * scale), MIN_DECIMATION_BUCKETS)
+    
+    def _plot_decimated(self, ax, key, *args, **kwargs):
+        x_display, y_display = self._pyramid.render(key, n_buckets=self._decimation_buckets(ax))
+        line, = ax.plot(x_display, y_display, *args, **kwargs)
+        self._offline_series.append((ax, line, key))
+        return line
+    
+    def _redecimate(self, axes=None, scale=1.0):
+        for ax, line, key in self._offline_series:
+            if axes is not None and ax not in axes:
+                continue
+            x_min, x_max = ax.get_xlim()
+            line.set_data(*self._pyramid.render(key, x_min, x_max, self._decimation_buckets(ax, scale)))
+    
+    def _on_xlim_changed(self, ax):
+        # Масштабирование и сдвиг: видимый диапазон прореживается заново
+        self._redecimate([ax])
+        self.draw_idle()
+    
+    def plot_results(self, results, pyramid=None):
+        self._reset_realtime()
+        self._offline_series = []
+        # Уровень детализации выбирается по видимому диапазону при каждой отрисовке
+        self._pyramid = pyramid if pyramid is not None else LODPyramid.from_results(results)
         
         for ax in self.axes.flat:
             ax.clear()
         
         ax1 = self.axes[0, 0]
-        ax1.plot(time, intensity_780, 'r-', label='780 нм (Pin 3)', alpha=0.8, linewidth=0.8)
-        ax1.plot(time, intensity_850, 'b-', label='850 нм (Pin 4)', alpha=0.8, linewidth=0.8)
+        self._plot_decimated(ax1, 'intensity_780', 'r-', label='780 нм (Pin 3)', alpha=0.8, linewidth=0.8)
+        self._plot_decimated(ax1, 'intensity_850', 'b-', label='850 нм (Pin 4)', alpha=0.8, linewidth=0.8)
         ax1.set_title('Интенсивность ИК излучения')
         ax1.set_xlabel('Время (с)')
         ax1.set_ylabel('Интенсивность')
         ax1.legend(fontsize=8)
         ax1.grid(True, alpha=0.3)
         
-        # Уменьшаем масштаб и ограничиваем количество отображаемых точек
-        if len(time) > 500:
-            step = max(1, len(time) // 200)  # Показываем примерно 200 точек
-            time_display = time[::step]
-            intensity_780_display = intensity_780[::step]
-            intensity_850_display = intensity_850[::step]
-            ax1.clear()
-            ax1.plot(time_display, intensity_780_display, 'r-', label='780 нм (Pin 3)', alpha=0.8, linewidth=0.8)
-            ax1.plot(time_display, intensity_850_display, 'b-', label='850 нм (Pin 4)', alpha=0.8, linewidth=0.8)
-            ax1.set_title('Интенсивность ИК излучения')
-            ax1.set_xlabel('Время (с)')
-            ax1.set_ylabel('Интенсивность')
-            ax1.legend(fontsize=8)
-            ax1.grid(True, alpha=0.3)
-            # Автоматическое масштабирование по Y
-            ax1.relim()
-            ax1.autoscale_view()
-        
         ax2 = self.axes[0, 1]
-        ax2.plot(time, Hb, 'b-', label='Деоксигенированный Hb', alpha=0.8, linewidth=1.5)
-        ax2.plot(time, HbO2, 'r-', label='Оксигенированный Hb', alpha=0.8, linewidth=1.5)
-        total_Hb = HbO2 + Hb
-        ax2.plot(time, total_Hb, 'purple', label='Общий Hb', alpha=0.8, linewidth=1.5)
+        self._plot_decimated(ax2, 'Hb', 'b-', label='Деоксигенированный Hb', alpha=0.8, linewidth=1.5)
+        self._plot_decimated(ax2, 'HbO2', 'r-', label='Оксигенированный Hb', alpha=0.8, linewidth=1.5)
+        self._plot_decimated(ax2, 'total_Hb', 'purple', label='Общий Hb', alpha=0.8, linewidth=1.5)
         ax2.set_title('Концентрации гемоглобина')
         ax2.set_xlabel('Время (с)')
         ax2.set_ylabel('Концентрация (усл. ед.)')
@@ -98,7 +158,7 @@ class PlotCanvas(FigureCanvas):
         ax2.grid(True, alpha=0.3)
         
         ax3 = self.axes[1, 0]
-        ax3.plot(time, saturation, 'g-', linewidth=2.0)
+        self._plot_decimated(ax3, 'saturation', 'g-', linewidth=2.0)
         ax3.set_title('Сатурация крови')
         ax3.set_xlabel('Время (с)')
         ax3.set_ylabel('Сатурация (%)')
@@ -106,86 +166,175 @@ class PlotCanvas(FigureCanvas):
         ax3.set_ylim([0, 100])
         
         ax4 = self.axes[1, 1]
-        ax4.plot(time, total_Hb, 'purple', linewidth=2.0)
+        self._plot_decimated(ax4, 'total_Hb', 'purple', linewidth=2.0)
         ax4.set_title('Общий гемоглобин')
         ax4.set_xlabel('Время (с)')
         ax4.set_ylabel('Концентрация (усл. ед.)')
         ax4.grid(True, alpha=0.3)
         
         self.fig.tight_layout(pad=3.0)
+        # Прореженные ряды содержат экстремумы, так что автомасштаб по ним совпадает с полным
+        self._redecimate()
+        for ax in self.axes.flat:
+            ax.get_xlim()
+            ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
         self.draw()
     
-    def update_realtime_plot(self, data):
-        if data is None or len(data['time']) < 5:
-            return
-            
-        time = data['time']
-        intensity_780 = data['intensity_780']
-        intensity_850 = data['intensity_850']
-        Hb = data['Hb']
-        HbO2 = data['HbO2']
-        saturation = data['saturation']
-        total_Hb = HbO2 + Hb
-        
+    def _setup_realtime_plot(self):
+        self._offline_series = []
+        self._pyramid = None
         for ax in self.axes.flat:
             ax.clear()
         
+        def line(ax, *args, **kwargs):
+            return ax.plot([], [], *args, animated=True, **kwargs)[0]
+        
         ax1 = self.axes[0, 0]
-        ax1.plot(time, intensity_780, 'r-', label='780 нм (Pin 3)', alpha=0.8, linewidth=0.8)
-        ax1.plot(time, intensity_850, 'b-', label='850 нм (Pin 4)', alpha=0.8, linewidth=0.8)
+        ax2 = self.axes[0, 1]
+        ax3 = self.axes[1, 0]
+        ax4 = self.axes[1, 1]
+        
+        self._realtime_lines = {
+            'intensity_780': line(ax1, 'r-', label='780 нм (Pin 3)', alpha=0.8, linewidth=0.8),
+            'intensity_850': line(ax1, 'b-', label='850 нм (Pin 4)', alpha=0.8, linewidth=0.8),
+            'Hb': line(ax2, 'b-', label='Деоксигенированный Hb', alpha=0.8, linewidth=1.5),
+            'HbO2': line(ax2, 'r-', label='Оксигенированный Hb', alpha=0.8, linewidth=1.5),
+            'total_Hb': line(ax2, 'purple', label='Общий Hb', alpha=0.8, linewidth=1.5),
+            'saturation': line(ax3, 'g-', linewidth=2.0),
+            'total_Hb_single': line(ax4, 'purple', linewidth=2.0)
+        }
+        lines = self._realtime_lines
+        
+        # (оси, линии, подбирать ли пределы по Y)
+        self._realtime_axes = [
+            (ax1, [lines['intensity_780'], lines['intensity_850']], True),
+            (ax2, [lines['Hb'], lines['HbO2'], lines['total_Hb']], True),
+            (ax3, [lines['saturation']], False),
+            (ax4, [lines['total_Hb_single']], True)
+        ]
+        
         ax1.set_title('Интенсивность ИК излучения')
         ax1.set_xlabel('Время (с)')
         ax1.set_ylabel('Интенсивность')
         ax1.legend(fontsize=8)
         ax1.grid(True, alpha=0.3)
         
-        # Для реального времени показываем только последние 50 точек
-        if len(time) > 50:
-            start_idx = len(time) - 50
-            time_display = time[start_idx:]
-            intensity_780_display = intensity_780[start_idx:]
-            intensity_850_display = intensity_850[start_idx:]
-            ax1.clear()
-            ax1.plot(time_display, intensity_780_display, 'r-', label='780 нм (Pin 3)', alpha=0.8, linewidth=0.8)
-            ax1.plot(time_display, intensity_850_display, 'b-', label='850 нм (Pin 4)', alpha=0.8, linewidth=0.8)
-            ax1.set_title('Интенсивность ИК излучения')
-            ax1.set_xlabel('Время (с)')
-            ax1.set_ylabel('Интенсивность')
-            ax1.legend(fontsize=8)
-            ax1.grid(True, alpha=0.3)
-            # Автоматическое масштабирование по Y
-            ax1.relim()
-            ax1.autoscale_view()
-        
-        ax2 = self.axes[0, 1]
-        ax2.plot(time, Hb, 'b-', label='Деоксигенированный Hb', alpha=0.8, linewidth=1.5)
-        ax2.plot(time, HbO2, 'r-', label='Оксигенированный Hb', alpha=0.8, linewidth=1.5)
-        ax2.plot(time, total_Hb, 'purple', label='Общий Hb', alpha=0.8, linewidth=1.5)
         ax2.set_title('Концентрации гемоглобина')
         ax2.set_xlabel('Время (с)')
         ax2.set_ylabel('Концентрация (усл. ед.)')
         ax2.legend()
         ax2.grid(True, alpha=0.3)
         
-        ax3 = self.axes[1, 0]
-        ax3.plot(time, saturation, 'g-', linewidth=2.0)
         ax3.set_title('Сатурация крови')
         ax3.set_xlabel('Время (с)')
         ax3.set_ylabel('Сатурация (%)')
         ax3.grid(True, alpha=0.3)
         ax3.set_ylim([0, 100])
         
-        ax4 = self.axes[1, 1]
-        ax4.plot(time, total_Hb, 'purple', linewidth=2.0)
         ax4.set_title('Общий гемоглобин (реальное время)')
         ax4.set_xlabel('Время (с)')
         ax4.set_ylabel('Концентрация (усл. ед.)')
         ax4.grid(True, alpha=0.3)
         
         self.fig.tight_layout(pad=3.0)
-        self.draw()
+    
+    @staticmethod
+    def _fit_limits(current, lo, hi, sliding):
+        """Новые пределы оси или None, если данные помещаются в текущие.
+        
+        Пределы берутся с запасом, чтобы смена масштаба (и полная перерисовка
+        с пересчётом делений) происходила редко: ось времени сдвигается
+        скачком вперёд, ось значений расширяется с полями и сужается, только
+        когда данные занимают меньше половины диапазона.
+        """
+        span = hi - lo
+        if span <= 0:
+            span = max(abs(hi), 1.0) * 0.01
+        current_lo, current_hi = current
+        inside = lo >= current_lo and hi <= current_hi
+        
+        if sliding:
+            return None if inside else (lo, hi + span * TIME_HEADROOM)
+        
+        if inside and span >= 0.5 * (current_hi - current_lo):
+            return None
+        return lo - span * LIMIT_HEADROOM / 2, hi + span * LIMIT_HEADROOM / 2
+    
+    def _update_limits(self):
+        changed = False
+        for ax, lines, fit_y in self._realtime_axes:
+            x = lines[0].get_xdata()
+            limits = self._fit_limits(ax.get_xlim(), x[0], x[-1], sliding=True)
+            if limits is not None:
+                ax.set_xlim(limits)
+                changed = True
+            
+            if not fit_y:
+                continue
+            y = np.concatenate([line.get_ydata() for line in lines])
+            y = y[np.isfinite(y)]
+            if len(y) == 0:
+                continue
+            limits = self._fit_limits(ax.get_ylim(), y.min(), y.max(), sliding=False)
+            if limits is not None:
+                ax.set_ylim(limits)
+                changed = True
+        return changed
+    
+    def update_realtime_plot(self, data):
+        if data is None or len(data['time']) < 5:
+            return
+        
+        if self._realtime_lines is None:
+            self._setup_realtime_plot()
+        
+        time = data['time']
+        Hb = data['Hb']
+        HbO2 = data['HbO2']
+        total_Hb = data['total_Hb']
+        
+        # Для реального времени интенсивность — только последние точки
+        lines = self._realtime_lines
+        lines['intensity_780'].set_data(time[-REALTIME_WINDOW:], data['intensity_780'][-REALTIME_WINDOW:])
+        lines['intensity_850'].set_data(time[-REALTIME_WINDOW:], data['intensity_850'][-REALTIME_WINDOW:])
+        lines['Hb'].set_data(time, Hb)
+        lines['HbO2'].set_data(time, HbO2)
+        lines['total_Hb'].set_data(time, total_Hb)
+        lines['saturation'].set_data(time, data['saturation'])
+        lines['total_Hb_single'].set_data(time, total_Hb)
+        
+        if self._update_limits() or self._background is None:
+            # Изменились деления осей — полная перерисовка, фон кэшируется в _on_draw
+            self.draw()
+            return
+        
+        self.restore_region(self._background)
+        self._draw_realtime_lines()
+        self.blit(self.fig.bbox)
+    
+    def save_figure(self, filename, **kwargs):
+        # Анимированные линии не попадают в savefig, пока не снят флаг
+        lines = list(self._realtime_lines.values()) if self._realtime_lines else []
+        for line in lines:
+            line.set_animated(False)
+        # Прореживание под разрешение файла, а не экрана
+        dpi = kwargs.get('dpi')
+        if isinstance(dpi, (int, float)):
+            self._redecimate(scale=dpi / self.fig.dpi)
+        self._saving = True
+        try:
+            self.fig.savefig(filename, **kwargs)
+        finally:
+            self._saving = False
+            for line in lines:
+                line.set_animated(True)
+            self._redecimate()
+            self.draw_idle()
     
     def clear_plots(self):
+        self._reset_realtime()
+        self._offline_series = []
+        self._pyramid = None
         for ax in self.axes.flat:
             ax.clear()
             ax.grid(True, alpha=0.3)
@@ -199,12 +348,20 @@ class PlotWidget(QWidget):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
         self.plot_canvas = PlotCanvas(self)
+        # Масштабирование и сдвиг графиков анализа файла
+        self.toolbar = NavigationToolbar(self.plot_canvas, self)
+        self.layout.addWidget(self.toolbar)
         self.layout.addWidget(self.plot_canvas)
         
         self.setMinimumSize(800, 600)
     
     def plot_results(self, results):
-        self.plot_canvas.plot_results(results)
+        from config import UI_CONFIG, FILE_CONFIG
+        
+        # Пирамида детализации строится один раз; для файла — с кэшем в каталоге кэша анализа
+        cache_dir = FILE_CONFIG['analysis_cache_dir'] if UI_CONFIG.get('lod_cache', True) else None
+        pyramid = load_or_build(results, results.get('source_key'), cache_dir=cache_dir)
+        self.plot_canvas.plot_results(results, pyramid)
     
     def update_realtime_plot(self, data):
         self.plot_canvas.update_realtime_plot(data)
@@ -214,7 +371,7 @@ class PlotWidget(QWidget):
     
     def save_plot(self, filename):
         try:
-            self.plot_canvas.fig.savefig(filename, dpi=300, bbox_inches='tight')
+            self.plot_canvas.save_figure(filename, dpi=300, bbox_inches='tight')
             return True
         except Exception as e:
             print(f"Ошибка при сохранении графика: {e}")
@@ -1,6 +1,7 @@
 import sys
 import os
 import argparse
+import time
 from pathlib import Path
 import logging
 
@@ -8,6 +9,8 @@ import logging
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
+from backend.core.startup import mark, run_profiled
+
 def setup_qt_environment():
     print("Библиотека libxcb-cursor0 установлена, используем стандартный плагин xcb")
 
@@ -32,9 +35,10 @@ def run_gui():
         print("pip install PySide6 matplotlib pandas numpy scipy pyserial")
         sys.exit(1)
 
-def run_console_analysis(filename):
+def run_console_analysis(filename, chunked=False):
     try:
         from backend.analysis.data_processor import DataProcessor
+        mark('модули анализа загружены')
         
         if not os.path.exists(filename):
             print(f"Файл {filename} не найден")
@@ -44,18 +48,29 @@ def run_console_analysis(filename):
         print(f"=== АНАЛИЗ FNIRS ДАННЫХ ===")
         print(f"Файл: {filename}")
         
-        data = processor.read_and_interpolate_data(filename)
-        if data is None:
-            print("Не удалось обработать данные")
-            return
+        output_file = f"analysis_results_{Path(filename).stem}.csv"
         
-        results = processor.process_data(data)
+        if chunked:
+            from backend.analysis.chunked import analyze_file_chunked
+            
+            print("Режим: потоковая обработка по блокам")
+            stats = analyze_file_chunked(filename, output_file)
+        else:
+            data = processor.read_and_interpolate_data(filename)
+            if data is None:
+                print("Не удалось обработать данные")
+                return
+            
+            results = processor.process_data(data)
+            processor.save_results(output_file)
+            
+            stats = results.get('stats', {})
         
-        stats = results.get('stats', {})
         print(f"\n=== РЕЗУЛЬТАТЫ АНАЛИЗА ===")
         print(f"Диапазон времени: {stats.get('time_range', 'N/A')}")
         print(f"Длительность записи: {stats.get('duration', 'N/A')}")
         print(f"Количество точек данных: {stats.get('data_points', 'N/A')}")
+        print(f"Каналов: {stats.get('channels', 'N/A')}")
         print(f"Интенсивность 780 нм: {stats.get('intensity_780_range', 'N/A')}")
         print(f"Интенсивность 850 нм: {stats.get('intensity_850_range', 'N/A')}")
         print(f"Средняя сатурация: {stats.get('mean_saturation', 'N/A')}")
@@ -63,26 +78,97 @@ def run_console_analysis(filename):
         print(f"Максимальная сатурация: {stats.get('max_saturation', 'N/A')}")
         print(f"Стандартное отклонение: {stats.get('std_saturation', 'N/A')}")
         
-        output_file = f"analysis_results_{Path(filename).stem}.csv"
-        processor.save_results(output_file)
         print(f"\nРезультаты сохранены в {output_file}")
+        mark('анализ завершён')
         
     except Exception as e:
         print(f"Ошибка при анализе: {e}")
         import traceback
         traceback.print_exc()
 
+def run_batch_analysis(inputs, workers=None, output_dir='.', chunked=False):
+    try:
+        from backend.analysis.batch import run_batch, summary_frame, write_summary, SUMMARY_FILE
+        
+        print(f"=== ПАКЕТНЫЙ АНАЛИЗ FNIRS ДАННЫХ ===")
+        
+        def report(done, total, record):
+            status = f"ошибка: {record['error']}" if record['error'] else f"{record['elapsed']:.2f} с"
+            print(f"[{done}/{total}] {record['file']} — {status}", flush=True)
+        
+        started = time.perf_counter()
+        records = run_batch(inputs, output_dir=output_dir, workers=workers, chunked=chunked, progress=report)
+        
+        if not records:
+            print("Файлы для анализа не найдены")
+            return
+        
+        summary_file = write_summary(records, os.path.join(output_dir, SUMMARY_FILE))
+        failed = sum(1 for record in records if record['error'])
+        
+        print(f"\n=== СВОДКА ===")
+        print(summary_frame(records).to_string(index=False))
+        print(f"\nФайлов: {len(records)}, с ошибками: {failed}, общее время: {time.perf_counter() - started:.2f} с")
+        print(f"Сводка сохранена в {summary_file}")
+        
+    except Exception as e:
+        print(f"Ошибка при пакетном анализе: {e}")
+        import traceback
+        traceback.print_exc()
+
 def main():
     parser = argparse.ArgumentParser(description='FNIRS Анализатор - Система мониторинга гемоглобина')
     parser.add_argument('--console', '-c', metavar='FILE', 
                        help='Запуск консольного анализа указанного файла')
     parser.add_argument('--gui', '-g', action='store_true',
                        help='Запуск GUI приложения (по умолчанию)')
+    parser.add_argument('--chunked', action='store_true',
+                       help='Потоковый анализ по блокам для файлов, не помещающихся в память')
+    parser.add_argument('--batch', '-b', metavar='PATH', nargs='+',
+                       help='Пакетный анализ файлов, масок (*.log) и каталогов')
+    parser.add_argument('--workers', '-j', type=int,
+                       help='Число процессов пакетного анализа (по умолчанию — число ядер)')
+    parser.add_argument('--output-dir', default='.',
+                       help='Каталог результатов пакетного анализа')
+    parser.add_argument('--startup-profile', action='store_true',
+                       help='Разбивка времени запуска по импортам и этапам')
+    parser.add_argument('--metrics', type=float, metavar='SECONDS',
+                       help='Записывать снимок метрик (счётчики, задержки, очереди) с этим периодом')
+    parser.add_argument('--metrics-file', metavar='FILE',
+                       help='Файл для снимков метрик (строки JSON) вместо журнала')
     
     args = parser.parse_args()
     
-    if args.console:
-        run_console_analysis(args.console)
+    if args.startup_profile:
+        argv = [arg for arg in sys.argv[1:] if arg != '--startup-profile']
+        sys.exit(run_profiled(str(Path(__file__).resolve()), argv))
+    
+    from config import METRICS_CONFIG
+    
+    if args.metrics:
+        METRICS_CONFIG['dump_interval'] = args.metrics
+    if args.metrics_file:
+        METRICS_CONFIG['dump_file'] = args.metrics_file
+    
+    dumper = None
+    if METRICS_CONFIG.get('dump_interval'):
+        from backend.core.metrics import MetricsDumper
+        
+        dumper = MetricsDumper(METRICS_CONFIG['dump_interval'], METRICS_CONFIG.get('dump_file'))
+        dumper.start()
+    
+    try:
+        run_mode(args)
+    finally:
+        if dumper is not None:
+            dumper.stop()
+            dumper.dump()
+
+def run_mode(args):
+    if args.batch:
+        run_batch_analysis(args.batch, workers=args.workers, output_dir=args.output_dir, chunked=args.chunked)
+    elif args.console:
+        run_console_analysis(args.console, chunked=args.chunked)
     else:
         run_gui()
 
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+
+def write_log(path, n_cycles, period=0.1, offset=0.05, seed=0):
+    """Журнал фотометра: 780 нм (пин 3), через ``offset`` — 850 нм (пин 4), цикл ``period`` с."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_cycles) * period
+    i780 = 2.0 + 0.1 * np.sin(2 * np.pi * 0.05 * t) + 0.01 * rng.standard_normal(n_cycles)
+    i850 = 2.5 + 0.1 * np.cos(2 * np.pi * 0.05 * t) + 0.01 * rng.standard_normal(n_cycles)
+
+    lines = []
+    for time_780, value_780, value_850 in zip(t.tolist(), i780.tolist(), i850.tolist()):
+        for time, pin, value in ((time_780, 3, value_780), (time_780 + offset, 4, value_850)):
+            ms = int(round(time * 1000))
+            lines.append(f"{ms // 1000}:{ms % 1000}\t\t{pin}\t\t{value:.3f}\r\n")
+    path.write_text(''.join(lines))
+    return path
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    return write_log(tmp_path / 'record.log', 3000)
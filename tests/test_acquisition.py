@@ -0,0 +1,22 @@
+import numpy as np
+
+from backend.serial.acquisition import AcquisitionCore
+from backend.serial.binary_protocol import encode_packets
+
+
+def test_batches_carry_channel_ids_of_their_device():
+    core = AcquisitionCore()
+    readers = [core.add_device(f'port{index}', protocol='binary') for index in range(2)]
+    batches = []
+    core.add_batch_callback(batches.append)
+
+    n = 10
+    readers[1].feed_bytes(encode_packets(np.arange(n), np.arange(n) * 10000, np.arange(n), np.arange(n)))
+
+    batch, = batches
+    assert batch['device_id'] == 1
+    # Каналы второго устройства идут за каналами первого
+    assert batch['channels'].tolist() == [2, 3] * n
+    assert core.channel_ids(1) == {name: 2 + row for row, name in enumerate(readers[1].montage.channel_names())}
+    np.testing.assert_array_equal(core.device_of(batch['channels']), 1)
+    assert core.device_of([0, 1, 2, 3, -1]).tolist() == [0, 0, 1, 1, -1]
@@ -0,0 +1,39 @@
+import pytest
+
+from backend.analysis.data_processor import DataProcessor
+from backend.analysis.result_cache import AnalysisCache
+from backend.core.analysis_process import AnalysisCancelled, run_analysis
+
+
+def test_cached_analysis_reports_every_stage(log_file, tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache'))
+    messages = []
+
+    results = run_analysis(str(log_file), DataProcessor(), cache, messages.append)
+
+    assert messages == ["Чтение данных из файла...", "Интерполяция данных...", "Обработка данных..."]
+    assert len(results['time']) > 0
+
+
+def test_cached_analysis_stops_at_cancel_checkpoint(log_file, tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache'))
+    processor = DataProcessor()
+
+    def progress(message):
+        if message == "Обработка данных...":
+            raise AnalysisCancelled()
+
+    with pytest.raises(AnalysisCancelled):
+        run_analysis(str(log_file), processor, cache, progress)
+    assert processor.results is None
+
+
+def test_results_carry_source_content_hash(log_file, tmp_path):
+    from backend.analysis.result_cache import content_hash
+
+    cache = AnalysisCache(str(tmp_path / 'cache'))
+    for _ in range(2):
+        # Расчёт и повторное чтение из кэша
+        results = run_analysis(str(log_file), DataProcessor(), cache)
+        assert results['source_key'] == content_hash(str(log_file))
+    assert cache.hits == 1
@@ -0,0 +1,65 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.analysis.chunked import ChunkedAnalysis
+from backend.analysis.data_processor import DataProcessor
+
+
+def _in_memory(log_file, tmp_path):
+    processor = DataProcessor()
+    results = processor.process_data(processor.read_and_interpolate_data(str(log_file)))
+    processor.save_results(str(tmp_path / 'memory.csv'))
+    return results['stats'], pd.read_csv(tmp_path / 'memory.csv')
+
+
+def _assert_same_results(chunked, expected):
+    assert list(chunked.columns) == list(expected.columns)
+    assert len(chunked) == len(expected)
+    for column in expected.columns:
+        # Перекрытие кусков скрывает краевые эффекты фильтра
+        scale = np.ptp(expected[column]) or 1.0
+        np.testing.assert_allclose(chunked[column], expected[column], rtol=0, atol=1e-6 * scale,
+                                   err_msg=column)
+
+
+def test_chunks_match_in_memory_processing(log_file, tmp_path):
+    stats, expected = _in_memory(log_file, tmp_path)
+
+    # Блоки чтения и куски фильтрации много меньше файла
+    analysis = ChunkedAnalysis(str(log_file), block_size=4096, chunk_size=400, overlap=300)
+    chunked_stats = analysis.run(str(tmp_path / 'chunked.csv'))
+
+    assert len(analysis.blocks) > 10
+    assert len(expected) > 2 * 400
+    _assert_same_results(pd.read_csv(tmp_path / 'chunked.csv'), expected)
+    assert chunked_stats.keys() == stats.keys()
+
+
+def test_filter_uses_analysis_config(log_file, tmp_path):
+    import config
+
+    analysis_config = dict(config.ANALYSIS_CONFIG, cutoff_frequency=0.2, filter_order=4)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(config, 'ANALYSIS_CONFIG', analysis_config)
+        _, expected = _in_memory(log_file, tmp_path)
+
+    ChunkedAnalysis(str(log_file), block_size=4096, chunk_size=400, overlap=300,
+                    config=analysis_config).run(str(tmp_path / 'chunked.csv'))
+
+    _assert_same_results(pd.read_csv(tmp_path / 'chunked.csv'), expected)
+
+
+def test_polyphase_falls_back_to_memory_with_log(log_file, tmp_path, monkeypatch, caplog):
+    import config
+
+    monkeypatch.setitem(config.ANALYSIS_CONFIG, 'resampling_method', 'polyphase')
+    _, expected = _in_memory(log_file, tmp_path)
+
+    with caplog.at_level(logging.INFO, logger='backend.analysis.chunked'):
+        ChunkedAnalysis(str(log_file), block_size=4096, chunk_size=400).run(str(tmp_path / 'chunked.csv'))
+
+    assert any('polyphase' in record.getMessage() for record in caplog.records)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'chunked.csv'), expected)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+from backend.analysis.filters import CausalFilter, design_filter, filtfilt_sos
+
+
+def _signals(n_samples, fs=10.0, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples) / fs
+    return np.vstack([
+        0.05 * np.sin(2 * np.pi * 0.1 * t) + 0.01 * rng.standard_normal(n_samples),
+        1.0 + 0.2 * np.cos(2 * np.pi * 0.03 * t) + 0.05 * rng.standard_normal(n_samples),
+        50 + 10 * np.sin(2 * np.pi * 2.0 * t)
+    ])
+
+
+def test_filtfilt_sos_matches_previous_filtfilt():
+    # Прежний filter_data: Баттерворт 2-го порядка 0,5 Гц при 10 Гц в форме (b, a)
+    b, a = signal.butter(2, 0.5 / (10 / 2), btype='low')
+
+    for n_samples in (12, 100, 3000):
+        data = _signals(n_samples)
+        expected = np.vstack([signal.filtfilt(b, a, row) for row in data])
+
+        np.testing.assert_allclose(filtfilt_sos(data, 0.5, 10), expected, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(filtfilt_sos(data[1], 0.5, 10), expected[1], rtol=1e-9, atol=1e-12)
+
+
+def test_causal_filter_matches_lfilter_across_blocks():
+    b, a = signal.butter(2, 0.5 / (10 / 2), btype='low')
+    data = _signals(1000)
+    # Установившееся состояние для первого отсчёта канала, как в CausalFilter
+    expected = np.vstack([signal.lfilter(b, a, row, zi=signal.lfilter_zi(b, a) * row[0])[0] for row in data])
+
+    causal = CausalFilter(0.5, 10)
+    bounds = [0, 1, 7, 250, 251, 600, 1000]
+    filtered = np.hstack([causal.process(data[:, start:end]) for start, end in zip(bounds[:-1], bounds[1:])])
+
+    np.testing.assert_allclose(filtered, expected, rtol=1e-9, atol=1e-12)
+
+    single = CausalFilter(0.5, 10)
+    np.testing.assert_allclose(single.process(data[1]), expected[1], rtol=1e-9, atol=1e-12)
+
+
+def test_cached_design_is_read_only():
+    sos = design_filter(0.5, 10)
+
+    assert design_filter(0.5, 10.0, order=2, btype='low') is sos
+    with pytest.raises(ValueError):
+        sos[0, 0] = 1.0
+
+    # Фильтры работают со своей копией и не меняют общий проект
+    expected = sos.copy()
+    CausalFilter(0.5, 10).process(_signals(50))
+    filtfilt_sos(_signals(50), 0.5, 10)
+    np.testing.assert_array_equal(design_filter(0.5, 10), expected)
@@ -0,0 +1,89 @@
+import numpy as np
+
+from backend.analysis.hb_calculations import calculate_hb_concentrations
+
+
+def _reference_concentrations(intensity_780, intensity_850, config):
+    # Прежний calculate_hb_concentrations: np.linalg.solve для каждого отсчёта
+    intensity_780 = np.maximum(np.array(intensity_780), 0.001)
+    intensity_850 = np.maximum(np.array(intensity_850), 0.001)
+
+    window_size = min(20, len(intensity_780) // 10)
+    if window_size > 1:
+        baseline_780 = np.mean(intensity_780[:window_size])
+        baseline_850 = np.mean(intensity_850[:window_size])
+    else:
+        baseline_780 = intensity_780[0]
+        baseline_850 = intensity_850[0]
+
+    pathlength = config['source_detector_distance'] * config['differential_pathlength_factor']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        OD_780 = -np.log(intensity_780 / baseline_780) / pathlength
+        OD_850 = -np.log(intensity_850 / baseline_850) / pathlength
+    OD_780 = np.clip(np.nan_to_num(OD_780, nan=0, posinf=0, neginf=0), -0.1, 0.1)
+    OD_850 = np.clip(np.nan_to_num(OD_850, nan=0, posinf=0, neginf=0), -0.1, 0.1)
+
+    epsilon_matrix = np.array([
+        [config['epsilon_hb_780'], config['epsilon_hbo2_780']],
+        [config['epsilon_hb_850'], config['epsilon_hbo2_850']]
+    ])
+    concentrations = []
+    for od_780, od_850 in zip(OD_780, OD_850):
+        OD_vector = np.array([od_780, od_850])
+        try:
+            concentrations.append(np.linalg.solve(epsilon_matrix, OD_vector))
+        except np.linalg.LinAlgError:
+            concentrations.append(np.linalg.pinv(epsilon_matrix) @ OD_vector)
+    concentrations = np.array(concentrations)
+    return concentrations[:, 0], concentrations[:, 1], OD_780, OD_850
+
+
+def _intensities(n_samples, seed):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples) / 10.0
+    intensity_780 = 2.0 + 0.1 * np.sin(2 * np.pi * 0.1 * t) + 0.01 * rng.standard_normal(n_samples)
+    intensity_850 = 2.5 + 0.1 * np.cos(2 * np.pi * 0.1 * t) + 0.01 * rng.standard_normal(n_samples)
+    # Провалы до нуля и ниже и выбросы, срезаемые ограничением OD
+    intensity_780[n_samples // 2] = 0.0
+    intensity_780[-1] = -1.0
+    intensity_850[n_samples // 3] = 50.0
+    intensity_850[-1] = 0.0
+    return intensity_780, intensity_850
+
+
+def test_concentrations_match_per_sample_solve():
+    import config
+
+    for n_samples in (1, 5, 15, 600):
+        intensity_780, intensity_850 = _intensities(n_samples, seed=n_samples)
+        expected = _reference_concentrations(intensity_780, intensity_850, config.ANALYSIS_CONFIG)
+
+        result = calculate_hb_concentrations(list(intensity_780), list(intensity_850))
+        for actual, reference in zip(result, expected):
+            np.testing.assert_allclose(actual, reference, rtol=1e-10, atol=1e-15)
+
+
+def test_channel_rows_match_single_channel():
+    intensity_780, intensity_850 = zip(*(_intensities(300, seed) for seed in range(3)))
+
+    Hb, HbO2, OD_780, OD_850 = calculate_hb_concentrations(np.array(intensity_780), np.array(intensity_850))
+
+    for row in range(3):
+        single = calculate_hb_concentrations(intensity_780[row], intensity_850[row])
+        for actual, reference in zip((Hb, HbO2, OD_780, OD_850), single):
+            np.testing.assert_allclose(actual[row], reference, rtol=1e-12, atol=0)
+
+
+def test_singular_extinction_matrix_uses_pseudo_inverse(monkeypatch):
+    import config
+
+    for key, value in (('epsilon_hb_850', 2.0), ('epsilon_hbo2_850', 4.0),
+                       ('epsilon_hb_780', 1.0), ('epsilon_hbo2_780', 2.0)):
+        monkeypatch.setitem(config.ANALYSIS_CONFIG, key, value)
+    intensity_780, intensity_850 = _intensities(200, seed=1)
+
+    expected = _reference_concentrations(intensity_780, intensity_850, config.ANALYSIS_CONFIG)
+    result = calculate_hb_concentrations(intensity_780, intensity_850)
+
+    for actual, reference in zip(result, expected):
+        np.testing.assert_allclose(actual, reference, rtol=1e-10, atol=1e-15)
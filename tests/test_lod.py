@@ -0,0 +1,45 @@
+import os
+import sys
+
+import numpy as np
+
+from backend.analysis.lod import CACHE_SUFFIX, load_or_build
+
+
+def _results(n=100000):
+    time = np.arange(n) * 0.01
+    return {'time': time, 'Hb': np.sin(time), 'HbO2': np.cos(time), 'saturation': 50 + np.sin(time)}
+
+
+def test_cached_pyramid_is_keyed_by_source_hash(tmp_path):
+    directory = str(tmp_path / 'cache')
+    results = _results()
+
+    built = load_or_build(results, 'abc', cache_dir=directory)
+    assert os.listdir(directory) == ['abc' + CACHE_SUFFIX]
+
+    loaded = load_or_build(results, 'abc', cache_dir=directory)
+    assert len(loaded.levels) == len(built.levels) > 0
+    for cached, fresh in zip(loaded.levels, built.levels):
+        np.testing.assert_array_equal(cached['min']['Hb'], fresh['min']['Hb'])
+
+    # Другие результаты того же файла (другие параметры анализа) — пирамида строится заново
+    changed = dict(results, Hb=results['Hb'] + 1)
+    rebuilt = load_or_build(changed, 'abc', cache_dir=directory)
+    np.testing.assert_array_equal(rebuilt.levels[0]['min']['Hb'], built.levels[0]['min']['Hb'] + 1)
+
+
+def test_pyramid_without_key_does_not_touch_disk(tmp_path):
+    directory = str(tmp_path / 'cache')
+    assert load_or_build(_results(), None, cache_dir=directory).levels
+    assert not os.path.exists(directory)
+
+
+def test_lod_does_not_load_pandas():
+    # Модуль загружается в процессе интерфейса, где pandas нужен только процессу анализа
+    import subprocess
+
+    code = "import sys; import backend.analysis.lod; print('pandas' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert output.stdout.strip() == 'False'
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from backend.analysis.log_parser import iter_raw_blocks, read_log_dataframe, read_log_file
+
+
+def _reference_dataframe(text):
+    # Построчный разбор прежнего read_and_interpolate_data; время "с:мс" —
+    # секунды и миллисекунды, как печатает прошивка (прежний parse_time читал его как мин:с)
+    rows = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or all(c == '\x00' for c in line) or line.startswith('---') or 'Time(s:ms)' in line:
+            continue
+        parts = line.split()
+        if len(parts) < 3:
+            continue
+        try:
+            pin = int(parts[1])
+            intensity = float(parts[2])
+            seconds, _, milliseconds = parts[0].partition(':')
+            time = float(seconds) + (float(milliseconds) / 1000.0 if milliseconds else 0.0)
+        except ValueError:
+            continue
+        rows.append((time, pin, intensity))
+    frame = pd.DataFrame(rows, columns=['Time(s)', 'Pin', 'Intensity'])
+    return frame.dropna().reset_index(drop=True)
+
+
+LOG = (
+    "--- Photometer log ---\r\n"
+    "Time(s:ms)\t\tPin\t\tIntensity\r\n"
+    "\r\n"
+    "0:152\t\t3\t\t2.103\r\n"
+    "0:302\t\t4\t\t2.514\r\n"
+    "0:452\t\t3\t\t-0.015\r\n"
+    "0:602\t\t4\t\t1e-3\r\n"
+    "0:752\t\t3\t\t2.5E+0\r\n"
+    "0:902\t\t4\t\t+2.498\r\n"
+    "1:52\t\t3\t\t2.110\r\n"
+    "1:202\t\t4\t\t2.520\t\textra\r\n"
+    "1:3"
+    "\x00\x00\x00\x00\x00\x00\x00\x00\r\n"
+    "1:352\t\t3\r\n"
+    "1:502\t\tx\t\t2.500\r\n"
+    "1:652\t\t3\t\tabc\r\n"
+    "1:802\t\t4\t\t2.5.1\r\n"
+    "1:952\t\t3.0\t\t2.500\r\n"
+    "2:52\t\t4\t\t2:5\r\n"
+    "2:\t\t4\t\t2.525\t\t0:1\r\n"
+    "sensor error\r\n"
+    "2:2\t\t3\t\t2.120\r\n"
+    "2.5\t\t4\t\t2.530\r\n"
+    "--- end ---\r\n"
+    "3:100\t\t3\t\t2.130"
+)
+
+
+def test_bulk_parser_matches_line_parser(tmp_path):
+    path = tmp_path / 'record.log'
+    path.write_bytes(LOG.encode())
+
+    expected = _reference_dataframe(LOG)
+    assert len(expected) == 12
+    parsed = read_log_dataframe(str(path))
+    pd.testing.assert_frame_equal(parsed, expected, check_dtype=False)
+
+    # Блоки разной длины: часть блоков разбирается быстрым путём, часть — терпимым
+    for block_size in (1, 16, 64, 256):
+        time, pin, intensity = read_log_file(str(path), block_size)
+        np.testing.assert_allclose(time, expected['Time(s)'])
+        np.testing.assert_array_equal(pin, expected['Pin'])
+        np.testing.assert_allclose(intensity, expected['Intensity'])
+
+
+def test_raw_blocks_keep_lines_whole(tmp_path):
+    # Блок меньше строки, строка на границе блоков и нет перевода строки в конце
+    raw = b"0:1\t\t3\t\t1.0\r\n0:2\t\t4\t\t2.0\r\n0:3\t\t3\t\t3.0"
+    path = tmp_path / 'record.log'
+    path.write_bytes(raw)
+
+    for block_size in (1, 3, 7, 16, len(raw)):
+        blocks = list(iter_raw_blocks(str(path), block_size))
+        assert b''.join(block for _, block in blocks) == raw
+        offsets = [offset for offset, _ in blocks]
+        assert offsets == [0] + list(np.cumsum([len(block) for _, block in blocks[:-1]]))
+        assert all(block.endswith(b'\n') for _, block in blocks[:-1])
+        assert blocks[-1][1].endswith(b'3.0')
+
+        time, pin, intensity = read_log_file(str(path), block_size)
+        np.testing.assert_allclose(time, [0.001, 0.002, 0.003])
+        np.testing.assert_array_equal(pin, [3, 4, 3])
+        np.testing.assert_allclose(intensity, [1.0, 2.0, 3.0])
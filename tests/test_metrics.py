@@ -0,0 +1,54 @@
+import threading
+
+from backend.core.metrics import MetricsRegistry
+
+
+def _run_threads(n_threads, target):
+    start = threading.Barrier(n_threads)
+
+    def run():
+        start.wait()
+        target()
+
+    threads = [threading.Thread(target=run) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_counts_are_not_lost():
+    registry = MetricsRegistry()
+    counter = registry.counter('samples')
+    histogram = registry.histogram('latency')
+
+    def work():
+        for _ in range(20000):
+            counter.add()
+            histogram.observe(0.003)
+
+    _run_threads(8, work)
+
+    snapshot = registry.snapshot()
+    assert snapshot['counters']['samples'] == 8 * 20000
+    assert snapshot['histograms']['latency']['count'] == 8 * 20000
+    assert snapshot['histograms']['latency']['buckets'] == [[0.005, 8 * 20000]]
+
+
+def test_finished_threads_are_folded_into_totals():
+    registry = MetricsRegistry()
+    counter = registry.counter('samples')
+    counter.add(5)
+
+    # Много коротких потоков: их ячейки не копятся, а значения сохраняются
+    for _ in range(50):
+        _run_threads(4, lambda: counter.add(10))
+        assert len(counter._cells._cells) <= 5
+    assert counter.value == 5 + 50 * 4 * 10
+    assert len(counter._cells._cells) == 1
+
+    counter.reset()
+    _run_threads(3, lambda: counter.add(2))
+    assert counter.value == 6
+    counter.add()
+    assert counter.value == 7
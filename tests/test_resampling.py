@@ -0,0 +1,66 @@
+import numpy as np
+from scipy.interpolate import interp1d
+
+from backend.analysis.resampling import resample_samples
+
+
+def _channels(rate=50.0, duration=60.0, seed=0):
+    # Два канала со своими неравномерными моментами отсчётов, вперемешку
+    rng = np.random.default_rng(seed)
+    times = []
+    for offset in (0.0, 0.5 / rate):
+        step = (1 + 0.2 * rng.uniform(-1, 1, int(duration * rate))) / rate
+        times.append(offset + np.cumsum(step))
+    values = [np.sin(2 * np.pi * 0.2 * t) + 0.5 * np.cos(2 * np.pi * 0.05 * t) for t in times]
+    rows = np.concatenate([np.full(len(t), row) for row, t in enumerate(times)])
+    order = np.argsort(np.concatenate(times), kind='stable')
+    return times, values, np.concatenate(times)[order], rows[order], np.concatenate(values)[order]
+
+
+def test_linear_grid_matches_interp1d():
+    times, values, time, rows, samples = _channels()
+
+    grid, resampled = resample_samples(time, rows, samples, 2, 10.0)
+
+    np.testing.assert_allclose(np.diff(grid), 0.1)
+    for row, (channel_time, channel_values) in enumerate(zip(times, values)):
+        expected = interp1d(channel_time, channel_values, kind='linear')(grid)
+        np.testing.assert_allclose(resampled[row], expected, rtol=0, atol=1e-12)
+
+
+def test_polyphase_matches_linear_for_slow_signals():
+    _, _, time, rows, samples = _channels()
+
+    grid, linear = resample_samples(time, rows, samples, 2, 10.0)
+    polyphase_grid, polyphase = resample_samples(time, rows, samples, 2, 10.0, method='polyphase')
+
+    np.testing.assert_allclose(polyphase_grid, grid[:len(polyphase_grid)])
+    assert len(polyphase_grid) >= len(grid) - 1
+    # Края КИХ-фильтра отбрасываются; сигнал много ниже частоты Найквиста сетки
+    inner = slice(20, -20)
+    np.testing.assert_allclose(polyphase[:, inner], linear[:, inner], atol=1e-2)
+
+
+def test_polyphase_is_selected_by_config(monkeypatch, tmp_path):
+    import config
+    from backend.analysis.data_processor import DataProcessor
+    from conftest import write_log
+
+    # 50 Гц на сетку 10 Гц: полифазный режим понижает частоту с фильтром
+    log_file = write_log(tmp_path / 'record.log', 15000, period=0.02, offset=0.01)
+
+    monkeypatch.setitem(config.ANALYSIS_CONFIG, 'resampling_method', 'linear')
+    linear = DataProcessor().read_and_interpolate_data(str(log_file))
+    monkeypatch.setitem(config.ANALYSIS_CONFIG, 'resampling_method', 'polyphase')
+    polyphase = DataProcessor().read_and_interpolate_data(str(log_file))
+
+    # Фильтр против наложения спектров усредняет шум отсчётов: ряд ближе к исходному сигналу
+    n = min(len(linear), len(polyphase))
+    inner = slice(20, n - 20)
+    for frame in (linear, polyphase):
+        time = frame['Time(s)'].to_numpy()[inner]
+        np.testing.assert_allclose(time, linear['Time(s)'].to_numpy()[inner])
+    clean = 2.0 + 0.1 * np.sin(2 * np.pi * 0.05 * linear['Time(s)'].to_numpy()[inner])
+    error_linear = np.std(linear['Intensity_780'].to_numpy()[inner] - clean)
+    error_polyphase = np.std(polyphase['Intensity_780'].to_numpy()[inner] - clean)
+    assert error_polyphase < 0.75 * error_linear
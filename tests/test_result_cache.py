@@ -0,0 +1,52 @@
+import os
+import threading
+
+import numpy as np
+
+from backend.analysis.result_cache import AnalysisCache, INDEX_FILE
+
+
+def test_concurrent_writers_share_cache_directory(tmp_path):
+    directory = str(tmp_path / 'cache')
+    files = []
+    for index in range(4):
+        path = tmp_path / f'{index}.log'
+        path.write_bytes(os.urandom(1024))
+        files.append(str(path))
+    errors = []
+
+    def writer(filename):
+        # Отдельный экземпляр кэша, как в отдельном процессе анализа
+        cache = AnalysisCache(directory)
+        try:
+            for _ in range(20):
+                key = cache.file_key(filename)
+                cache._write('shared.npz', {'value': np.arange(1000)})
+                cache._write(f'{key}.data.npz', {'value': np.arange(10)})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(filename,)) for filename in files]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert not [name for name in os.listdir(directory) if name.endswith('.tmp')]
+    np.testing.assert_array_equal(AnalysisCache(directory)._read('shared.npz')['value'], np.arange(1000))
+
+
+def test_eviction_prunes_index(tmp_path):
+    directory = str(tmp_path / 'cache')
+    cache = AnalysisCache(directory, max_bytes=0)
+    source = tmp_path / 'record.log'
+    source.write_bytes(b'0:100\t\t3\t\t1.0\r\n')
+
+    key = cache.file_key(str(source))
+    assert key in {entry['hash'] for entry in AnalysisCache(directory)._load_index().values()}
+
+    # При нулевом пределе запись сразу вытесняется, и файл пропадает из индекса
+    cache._write(f'{key}.data.npz', {'value': np.arange(10)})
+    assert AnalysisCache(directory)._load_index() == {}
+    assert os.listdir(directory) == [INDEX_FILE]
@@ -0,0 +1,49 @@
+import numpy as np
+
+from backend.serial.serial_reader import SerialDataReader
+
+
+def _text_stream(n_cycles, missing_pin4=()):
+    # Как в прошивке: 780 нм (пин 3), через 150 мс — 850 нм (пин 4); период цикла 300 мс
+    lines = []
+    for cycle in range(n_cycles):
+        ms = 152 + 300 * cycle
+        lines.append(f"{ms // 1000}:{ms % 1000}\t\t3\t\t{cycle}.100\r\n")
+        if cycle not in missing_pin4:
+            ms += 150
+            lines.append(f"{ms // 1000}:{ms % 1000}\t\t4\t\t{cycle}.200\r\n")
+    return ''.join(lines).encode()
+
+
+def test_missing_line_does_not_shift_later_frames():
+    reader = SerialDataReader(port='test', protocol='text')
+    stream = _text_stream(10, missing_pin4={4})
+    # Порциями, разрезающими строки, как при чтении из порта
+    for start in range(0, len(stream), 37):
+        reader.feed_bytes(stream[start:start + 37])
+
+    data = reader.get_current_data()
+    cycles_780 = np.floor(data['intensity_780'])
+    cycles_850 = np.floor(data['intensity_850'])
+
+    # Кадр цикла без 850 нм отброшен, остальные — из отсчётов одного цикла
+    np.testing.assert_array_equal(cycles_780, cycles_850)
+    assert 4 not in cycles_780
+    assert list(cycles_780) == [0, 1, 2, 3, 5, 6, 7, 8]
+    # Последний цикл ждёт следующих отсчётов; отсчёт без пары не копится
+    assert len(reader._unpaired[0]) == 2
+
+
+def test_binary_frames_are_written_without_pairing():
+    from backend.serial.binary_protocol import ADC_MAX, ADC_REFERENCE, encode_packets
+
+    n = 50
+    reader = SerialDataReader(port='test', protocol='binary')
+    reader.feed_bytes(encode_packets(np.arange(n), np.arange(n) * 10000, np.arange(n) * 10, np.arange(n) * 10 + 5))
+
+    # Пакет уже содержит оба канала: кадр записывается сразу, последний не ждёт следующего пакета
+    data = reader.get_current_data()
+    assert len(data['time']) == n
+    np.testing.assert_allclose(data['time'], np.arange(n) * 0.01)
+    np.testing.assert_allclose(data['intensity_780'], np.arange(n) * 10 / ADC_MAX * ADC_REFERENCE)
+    np.testing.assert_allclose(data['intensity_850'], (np.arange(n) * 10 + 5) / ADC_MAX * ADC_REFERENCE)